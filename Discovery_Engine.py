@@ -15,7 +15,6 @@ import pandas as pd
 import random
 import time
 import json
-import requests
 import re
 import os
 from datetime import datetime, timedelta
@@ -23,6 +22,10 @@ from playwright.sync_api import sync_playwright
 from collections import Counter
 import winsound  # Windows系统蜂鸣声（macOS需要替换为其他方案）
 
+from sentiment_index import get_sentiment_index, discovery_posts
+from deepseek_client import get_deepseek_client
+from prompt_packer import PromptPacker, load_prompt_budget_config
+
 
 class DiscoveryEngine:
     """全网热点发现引擎"""
@@ -48,6 +51,22 @@ class DiscoveryEngine:
             self.api_key = api_key
             self.api_base = "https://api.deepseek.com/v1"
         
+        # 共享连接池的DeepSeek客户端
+        self.deepseek = get_deepseek_client(self.api_key, self.api_base)
+        
+        # 按token预算打包今日/昨日讨论文本
+        budget_config = load_prompt_budget_config()
+        self.today_packer = PromptPacker(
+            budget_config['discovery_today_tokens'],
+            dedup_threshold=budget_config['near_duplicate_threshold'],
+            min_item_tokens=budget_config['min_item_tokens']
+        )
+        self.yesterday_packer = PromptPacker(
+            budget_config['discovery_yesterday_tokens'],
+            dedup_threshold=budget_config['near_duplicate_threshold'],
+            min_item_tokens=budget_config['min_item_tokens']
+        )
+        
         # 真实的User-Agent列表（用于随机切换）
         self.user_agents = [
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -581,6 +600,13 @@ class DiscoveryEngine:
             }, f, ensure_ascii=False, indent=2)
         
         print(f"\n✓ 今日数据已保存: {filename}")
+        
+        # 增量写入舆情索引
+        try:
+            added = get_sentiment_index().add_posts(discovery_posts(all_text))
+            print(f"✓ 舆情索引新增 {added} 条")
+        except Exception as e:
+            print(f"⚠️  写入舆情索引失败: {e}")
     
     def load_yesterday_data(self):
         """
@@ -621,12 +647,21 @@ class DiscoveryEngine:
         print("开始AI智能发现分析")
         print("=" * 60)
         
-        # 合并文本
-        today_combined = "\n".join(today_texts[:200])  # 限制长度
-        yesterday_combined = "\n".join(yesterday_texts[:200]) if yesterday_texts else "无昨日数据"
+        # 按token预算合并文本（去除近似重复，保持抓取顺序）
+        today_packed = self.today_packer.pack(today_texts)
+        today_combined = today_packed['text']
+        
+        if yesterday_texts:
+            yesterday_packed = self.yesterday_packer.pack(yesterday_texts)
+            yesterday_combined = yesterday_packed['text']
+        else:
+            yesterday_combined = "无昨日数据"
         
-        print(f"今日文本: {len(today_texts)} 条")
-        print(f"昨日文本: {len(yesterday_texts)} 条")
+        print(f"今日文本: {len(today_texts)} 条，{PromptPacker.describe(today_packed)}")
+        if yesterday_texts:
+            print(f"昨日文本: {len(yesterday_texts)} 条，{PromptPacker.describe(yesterday_packed)}")
+        else:
+            print("昨日文本: 0 条")
         
         # 构建用户输入
         user_input = f"""今日讨论内容（共{len(today_texts)}条）:
@@ -661,52 +696,18 @@ class DiscoveryEngine:
         返回:
             dict: 分析结果
         """
-        url = f"{self.api_base}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 2000
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0]['message']['content']
-                
-                # 尝试解析JSON
-                try:
-                    json_match = re.search(r'\{[\s\S]*\}', content)
-                    if json_match:
-                        json_str = json_match.group()
-                        analysis_result = json.loads(json_str)
-                        return analysis_result
-                    else:
-                        print("  警告: 无法从响应中提取JSON")
-                        return None
-                except json.JSONDecodeError:
-                    print(f"  警告: JSON解析失败")
-                    print(f"  原始响应: {content[:200]}...")
-                    return None
-            
-            return None
-            
-        except Exception as e:
-            print(f"  API调用失败: {e}")
-            return None
+        # 流式接收：热点板块逐个到达即打印，输出格式异常时提前中止
+        def on_item(key, item):
+            if key == 'hot_sectors' and isinstance(item, dict):
+                print(f"  ← 热点板块: {item.get('sector_name', '')} (增长 {item.get('growth_rate', '?')}%)")
+        
+        return self.deepseek.chat_json(
+            self.system_prompt, user_input,
+            stream=True,
+            on_item=on_item,
+            temperature=0.3,
+            max_tokens=2000
+        )
     
     def generate_report(self, analysis_result, all_data):
         """
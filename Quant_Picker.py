@@ -15,11 +15,18 @@ import akshare as ak
 import pandas as pd
 import numpy as np
 import json
-import requests
-import re
 from datetime import datetime
 import warnings
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from market_snapshot import get_market_snapshot
+from deepseek_client import get_deepseek_client
+from fetch_executor import get_fetch_executor
+from stock_data_cache import get_stock_data_cache
+from multi_pattern_matcher import AhoCorasick
+from sentiment_index import SENTIMENT_KEYWORDS
 
 warnings.filterwarnings('ignore')
 
@@ -48,16 +55,28 @@ class QuantPicker:
             self.api_key = api_key
             self.api_base = "https://api.deepseek.com/v1"
         
+        # 共享连接池的DeepSeek客户端
+        self.deepseek = get_deepseek_client(self.api_key, self.api_base)
+        
         # 舆情关键词配置
-        self.sentiment_keywords = {
-            'high_priority': ['重组', '并购', '收购', '入股', '利好', '涨停', '突破'],
-            'medium_priority': ['增持', '回购', '业绩', '盈利', '分红'],
-            'low_priority': ['关注', '看好', '推荐']
-        }
+        self.sentiment_keywords = {tier: list(keywords) for tier, keywords in SENTIMENT_KEYWORDS.items()}
+        
+        # 关键词层级及加分（按优先级从高到低，每条舆情只取最高一级）
+        self.keyword_tiers = [('high_priority', 30), ('medium_priority', 20), ('low_priority', 10)]
         
         # 历史数据目录
         self.history_dir = "discovery_history"
         
+        # 共享全市场行情快照
+        self.market_snapshot = get_market_snapshot()
+        
+        # 个股新闻：限流获取 + 按股票缓存，后台线程池预取
+        self.fetcher = get_fetch_executor()
+        self.data_cache = get_stock_data_cache()
+        self._news_pool = None   # 首次预取时创建，close()时关闭
+        self._news_futures = {}
+        self._news_lock = threading.Lock()
+        
         print("✓ 量化选股器初始化完成")
     
     def step1_akshare_screening(self):
@@ -77,9 +96,13 @@ class QuantPicker:
         print("=" * 60)
         
         try:
-            # 获取全A股实时行情
+            # 获取全A股实时行情（共享快照，同一进程内只下载一次）
             print("\n正在获取全A股实时行情...")
-            df = ak.stock_zh_a_spot_em()
+            df = self.market_snapshot.get()
+            
+            if df.empty:
+                print("× 未获取到行情数据")
+                return pd.DataFrame()
             
             print(f"✓ 获取成功，共 {len(df)} 只股票")
             
@@ -143,7 +166,7 @@ class QuantPicker:
             traceback.print_exc()
             return pd.DataFrame()
     
-    def step2_sentiment_match(self, df_stocks):
+    def step2_sentiment_match(self, df_stocks, prefetch_top_n=10):
         """
         Step 2: 舆情碰撞
         
@@ -151,6 +174,7 @@ class QuantPicker:
         
         参数:
             df_stocks: 初选股票DataFrame
+            prefetch_top_n: 后台预取新闻的候选数量（与Step 3的top_n一致），0表示不预取
             
         返回:
             DataFrame: 添加舆情评分的股票列表
@@ -163,6 +187,11 @@ class QuantPicker:
             print("× 无初选股票，跳过舆情碰撞")
             return df_stocks
         
+        # 舆情数据加载期间，先按行情得分预取最可能入选的股票新闻
+        if prefetch_top_n:
+            market_score = df_stocks['涨跌幅'] * 0.3 + df_stocks['换手率'] * 0.2
+            self.prefetch_news(df_stocks.loc[market_score.nlargest(prefetch_top_n).index, '代码'])
+        
         # 加载舆情数据
         sentiment_data = self._load_sentiment_data()
         
@@ -176,33 +205,19 @@ class QuantPicker:
         
         print(f"\n✓ 加载舆情数据: {len(sentiment_data)} 条")
         
-        # 为每只股票计算舆情评分
+        # 构建多模式匹配自动机，每条舆情只扫描一遍
         print("\n正在匹配舆情数据...")
         
-        sentiment_scores = []
-        sentiment_sources = []
-        matched_keywords = []
-        influencer_weights = []
-        
-        for _, stock in df_stocks.iterrows():
-            stock_name = stock['名称']
-            stock_code = stock['代码']
-            
-            # 匹配舆情数据
-            score, source, keywords, weight = self._match_sentiment(
-                stock_name, stock_code, sentiment_data
-            )
-            
-            sentiment_scores.append(score)
-            sentiment_sources.append(source)
-            matched_keywords.append(keywords)
-            influencer_weights.append(weight)
+        matcher = self._build_sentiment_matcher(df_stocks)
+        matches = self._match_sentiment(df_stocks, sentiment_data, matcher)
         
-        # 添加舆情字段
-        df_stocks['舆情评分'] = sentiment_scores
-        df_stocks['舆情来源'] = sentiment_sources
-        df_stocks['匹配关键词'] = matched_keywords
-        df_stocks['博主影响力'] = influencer_weights
+        # 候选股票与命中结果按代码连接（未被提及的股票舆情评分为0）
+        matched = matches.reindex(df_stocks['代码'].astype(str)).fillna(
+            {'舆情评分': 0, '舆情来源': '无', '匹配关键词': '', '博主影响力': 1}
+        )
+        for column in matched.columns:
+            df_stocks[column] = matched[column].values
+        df_stocks['博主影响力'] = df_stocks['博主影响力'].astype(int)
         
         # 计算综合得分
         # 综合得分 = 涨幅权重(30%) + 换手率权重(20%) + 舆情评分(50%)
@@ -239,9 +254,9 @@ class QuantPicker:
         加载舆情数据（微博+小红书）
         
         返回:
-            list: 舆情数据列表
+            list: 舆情数据列表，每条为 {'text', 'source', 'followers', 'platform'}
         """
-        sentiment_data = []
+        frames = []
         
         # 1. 加载最新的discovery数据
         try:
@@ -258,13 +273,12 @@ class QuantPicker:
                         data = json.load(f)
                         texts = data.get('texts', [])
                         
-                        for text in texts:
-                            sentiment_data.append({
-                                'text': text,
-                                'source': '全网雷达',
-                                'followers': 10000,  # 默认粉丝数
-                                'platform': '小红书+微博'
-                            })
+                        frames.append(pd.DataFrame({
+                            'text': pd.Series(texts, dtype=object),
+                            'source': '全网雷达',
+                            'followers': 10000,  # 默认粉丝数
+                            'platform': '小红书+微博'
+                        }))
                     
                     print(f"  ✓ 加载全网雷达数据: {len(texts)} 条")
         except Exception as e:
@@ -278,95 +292,125 @@ class QuantPicker:
                 latest_weibo = sorted(csv_files)[-1]
                 df_weibo = pd.read_csv(latest_weibo, encoding='utf-8-sig')
                 
-                for _, row in df_weibo.iterrows():
-                    sentiment_data.append({
-                        'text': str(row.get('博文内容', '')),
-                        'source': '微博',
-                        'followers': row.get('粉丝数', 1000),
-                        'platform': '微博'
-                    })
+                frames.append(pd.DataFrame({
+                    'text': df_weibo.get('博文内容', pd.Series('', index=df_weibo.index)).astype(str),
+                    'source': '微博',
+                    'followers': df_weibo.get('粉丝数', pd.Series(1000, index=df_weibo.index)),
+                    'platform': '微博'
+                }))
                 
                 print(f"  ✓ 加载微博数据: {len(df_weibo)} 条")
         except Exception as e:
             print(f"  ⚠️  加载微博数据失败: {e}")
         
-        return sentiment_data
+        if not frames:
+            return []
+        
+        return pd.concat(frames, ignore_index=True).to_dict('records')
     
-    def _match_sentiment(self, stock_name, stock_code, sentiment_data):
+    def _build_sentiment_matcher(self, df_stocks):
         """
-        匹配单只股票的舆情数据
+        构建舆情碰撞自动机（候选股票名称/代码 + 各层级关键词）
         
         参数:
-            stock_name: 股票名称
-            stock_code: 股票代码
+            df_stocks: 初选股票DataFrame
+        
+        返回:
+            AhoCorasick: 命中值为 ('stock', 代码) 或 ('keyword', 层级序号, 关键词序号)
+        """
+        matcher = AhoCorasick()
+        
+        for code, name in zip(df_stocks['代码'].astype(str), df_stocks['名称'].astype(str)):
+            matcher.add(code, ('stock', code))
+            matcher.add(name, ('stock', code))
+        
+        for tier_rank, (tier, _) in enumerate(self.keyword_tiers):
+            for keyword_rank, keyword in enumerate(self.sentiment_keywords[tier]):
+                matcher.add(keyword, ('keyword', tier_rank, keyword_rank))
+        
+        return matcher.build()
+    
+    def _influence_weights(self, followers):
+        """
+        博主影响力权重: 100万+粉丝×10，10万+粉丝×3，其余（含缺失）×1
+        
+        参数:
+            followers: 粉丝数Series
+        
+        返回:
+            ndarray: 整数权重
+        """
+        followers = pd.to_numeric(followers, errors='coerce').to_numpy(dtype=float)
+        return np.select([followers >= 1000000, followers >= 100000], [10, 3], default=1)
+    
+    def _match_sentiment(self, df_stocks, sentiment_data, matcher):
+        """
+        舆情碰撞：每条舆情扫描一次，按股票分组取最高加权评分
+        
+        单条舆情评分 = 50 + 最高一级命中关键词加分，再乘以博主影响力权重；
+        每只股票取加权评分最高的一条（同分取靠前的舆情），归一化到0-100
+        
+        参数:
+            df_stocks: 初选股票DataFrame
             sentiment_data: 舆情数据列表
-            
+            matcher: _build_sentiment_matcher构建的自动机
+        
         返回:
-            tuple: (舆情评分, 来源, 匹配关键词, 博主影响力权重)
+            DataFrame: 以股票代码为索引，列为 舆情评分/舆情来源/匹配关键词/博主影响力，
+                       只包含被提及的股票
         """
         base_score = 50  # 基础分
-        max_score = 0
-        best_source = '无'
-        best_keywords = ''
-        max_weight = 1
-        
-        for item in sentiment_data:
-            text = item['text']
-            source = item['source']
-            followers = item.get('followers', 1000)
-            
-            # 检查是否提及该股票
-            if stock_name in text or stock_code in text:
-                # 计算影响力权重
-                if followers >= 1000000:  # 100万+
-                    weight = 10
-                elif followers >= 100000:  # 10万+
-                    weight = 3
-                else:
-                    weight = 1
-                
-                # 检查关键词
-                score = base_score
-                matched_kw = []
-                
-                # 高优先级关键词 (+30分)
-                for kw in self.sentiment_keywords['high_priority']:
-                    if kw in text:
-                        score += 30
-                        matched_kw.append(kw)
-                        break
-                
-                # 中优先级关键词 (+20分)
-                if not matched_kw:
-                    for kw in self.sentiment_keywords['medium_priority']:
-                        if kw in text:
-                            score += 20
-                            matched_kw.append(kw)
-                            break
-                
-                # 低优先级关键词 (+10分)
-                if not matched_kw:
-                    for kw in self.sentiment_keywords['low_priority']:
-                        if kw in text:
-                            score += 10
-                            matched_kw.append(kw)
-                            break
-                
-                # 应用影响力权重
-                weighted_score = score * weight
-                
-                # 保留最高分
-                if weighted_score > max_score:
-                    max_score = weighted_score
-                    best_source = source
-                    best_keywords = ','.join(matched_kw)
-                    max_weight = weight
+        columns = ['舆情评分', '舆情来源', '匹配关键词', '博主影响力']
+        
+        corpus = pd.DataFrame(sentiment_data, columns=['text', 'source', 'followers'])
+        corpus['followers'] = corpus['followers'].fillna(1000)
+        corpus['博主影响力'] = self._influence_weights(corpus['followers'])
+        
+        # 每条舆情扫描一次，命中结果展开为 (text_id, 命中值) 长表
+        hits = corpus['text'].astype(str).map(lambda text: list(matcher.find_values(text))).explode().dropna()
+        if hits.empty:
+            return pd.DataFrame(columns=columns)
+        
+        hits = pd.DataFrame(hits.tolist(), index=hits.index.rename('text_id'),
+                            columns=['kind', 'value', 'keyword_rank']).reset_index()
+        
+        mentions = (hits.loc[hits['kind'] == 'stock', ['text_id', 'value']]
+                    .rename(columns={'value': '代码'}))
+        if mentions.empty:
+            return pd.DataFrame(columns=columns)
+        
+        # 每条舆情命中的最高一级关键词（同级取关键词表中靠前的）
+        keyword_table = pd.DataFrame(
+            [(tier_rank, keyword_rank, keyword, bonus)
+             for tier_rank, (tier, bonus) in enumerate(self.keyword_tiers)
+             for keyword_rank, keyword in enumerate(self.sentiment_keywords[tier])],
+            columns=['tier_rank', 'keyword_rank', '匹配关键词', '关键词加分']
+        )
+        best_keywords = (hits.loc[hits['kind'] == 'keyword', ['text_id', 'value', 'keyword_rank']]
+                         .rename(columns={'value': 'tier_rank'})
+                         .astype({'tier_rank': int, 'keyword_rank': int})
+                         .sort_values(['text_id', 'tier_rank', 'keyword_rank'])
+                         .drop_duplicates('text_id')
+                         .merge(keyword_table, on=['tier_rank', 'keyword_rank']))
+        
+        mentions = (mentions
+                    .merge(corpus[['source', '博主影响力']].rename(columns={'source': '舆情来源'}),
+                           left_on='text_id', right_index=True)
+                    .merge(best_keywords[['text_id', '匹配关键词', '关键词加分']], on='text_id', how='left'))
+        
+        mentions['匹配关键词'] = mentions['匹配关键词'].fillna('')
+        mentions['加权评分'] = (base_score + mentions['关键词加分'].fillna(0)) * mentions['博主影响力']
+        
+        # 按股票分组取最高加权评分
+        best = (mentions.sort_values(['代码', '加权评分', 'text_id'], ascending=[True, False, True])
+                .drop_duplicates('代码')
+                .set_index('代码'))
         
         # 归一化到0-100
-        final_score = min(100, max_score / 10)
+        best['舆情评分'] = (best['加权评分'] / 10).clip(upper=100)
         
-        return final_score, best_source, best_keywords, max_weight
-
+        return best[columns]
+    
     
     def step3_deepseek_selection(self, df_stocks, top_n=10):
         """
@@ -415,9 +459,71 @@ class QuantPicker:
             print("× AI筛选失败")
             return None
     
+    def prefetch_news(self, stock_codes):
+        """
+        在后台线程池中预取个股新闻（不阻塞），已提交的股票不重复提交
+        
+        参数:
+            stock_codes: 股票代码列表
+        """
+        with self._news_lock:
+            if self._news_pool is None:
+                self._news_pool = ThreadPoolExecutor(max_workers=self.fetcher.max_workers)
+            
+            for stock_code in stock_codes:
+                stock_code = str(stock_code)
+                if stock_code not in self._news_futures:
+                    self._news_futures[stock_code] = self._news_pool.submit(self._get_news_summary, stock_code)
+    
+    def _discard_news_prefetch(self):
+        """取消未入选股票的预取任务（已在执行的任务完成后只写入新闻缓存）"""
+        with self._news_lock:
+            futures, self._news_futures = self._news_futures, {}
+        
+        for future in futures.values():
+            future.cancel()
+    
+    def close(self):
+        """关闭新闻预取线程池，并丢弃排队中的新闻缓存后台刷新"""
+        self._discard_news_prefetch()
+        
+        with self._news_lock:
+            pool, self._news_pool = self._news_pool, None
+        
+        if pool is not None:
+            pool.shutdown(wait=True)
+        
+        self.data_cache.close()
+    
+    def _get_news_summary(self, stock_code):
+        """
+        获取单只股票最新3条新闻标题（经新闻缓存）
+        
+        参数:
+            stock_code: 股票代码
+            
+        返回:
+            str: 新闻摘要
+        """
+        try:
+            news_df = self.data_cache.get_or_fetch(
+                'stock_news_em', stock_code,
+                lambda: self.fetcher.call('stock_news_em', lambda: ak.stock_news_em(symbol=stock_code))
+            )
+            
+            if not news_df.empty:
+                # 取最新3条新闻标题
+                latest_news = news_df.head(3)['新闻标题'].tolist()
+                return '; '.join(latest_news)
+        
+        except Exception:
+            pass
+        
+        return '暂无最新新闻'
+    
     def _fetch_stock_news(self, df_stocks):
         """
-        获取股票最新新闻
+        获取股票最新新闻（并发获取，已预取的直接取结果）
         
         参数:
             df_stocks: 股票DataFrame
@@ -425,27 +531,17 @@ class QuantPicker:
         返回:
             DataFrame: 添加新闻字段的股票数据
         """
+        stock_codes = df_stocks['代码'].astype(str).tolist()
+        self.prefetch_news(stock_codes)
+        
         news_list = []
+        for stock_code in stock_codes:
+            with self._news_lock:
+                future = self._news_futures.get(stock_code)
+            news_list.append(future.result())
         
-        for _, stock in df_stocks.iterrows():
-            stock_code = stock['代码']
-            stock_name = stock['名称']
-            
-            try:
-                # 尝试获取个股新闻
-                news_df = ak.stock_news_em(symbol=stock_code)
-                
-                if not news_df.empty:
-                    # 取最新3条新闻标题
-                    latest_news = news_df.head(3)['新闻标题'].tolist()
-                    news_summary = '; '.join(latest_news)
-                else:
-                    news_summary = '暂无最新新闻'
-            
-            except:
-                news_summary = '暂无最新新闻'
-            
-            news_list.append(news_summary)
+        # 取出结果后丢弃全部任务（含未进入TOP N的预取），下次运行重新经过缓存有效期判断
+        self._discard_news_prefetch()
         
         df_stocks['最新新闻'] = news_list
         
@@ -542,52 +638,18 @@ class QuantPicker:
 
 注意：只返回JSON格式，不要包含其他文字。严禁编造任何数据。"""
         
-        url = f"{self.api_base}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": input_text}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 2000
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0]['message']['content']
-                
-                # 尝试解析JSON
-                try:
-                    json_match = re.search(r'\{[\s\S]*\}', content)
-                    if json_match:
-                        json_str = json_match.group()
-                        ai_result = json.loads(json_str)
-                        return ai_result
-                    else:
-                        print("  警告: 无法从响应中提取JSON")
-                        return None
-                except json.JSONDecodeError:
-                    print(f"  警告: JSON解析失败")
-                    print(f"  原始响应: {content[:200]}...")
-                    return None
-            
-            return None
-            
-        except Exception as e:
-            print(f"  API调用失败: {e}")
-            return None
+        # 流式接收：推荐股票逐只到达即打印，输出格式异常时提前中止
+        def on_item(key, item):
+            if key == 'recommendations' and isinstance(item, dict):
+                print(f"  ← 推荐 {item.get('rank', '?')}: {item.get('stock_name', '')}({item.get('stock_code', '')})")
+        
+        return self.deepseek.chat_json(
+            system_prompt, input_text,
+            stream=True,
+            on_item=on_item,
+            temperature=0.3,
+            max_tokens=2000
+        )
     
     def step4_generate_report(self, df_stocks, ai_result):
         """
@@ -780,11 +842,15 @@ class QuantPicker:
             print("\n× 初选无结果，程序结束")
             return
         
-        # Step 2: 舆情碰撞
-        df_stocks = self.step2_sentiment_match(df_stocks)
-        
-        # Step 3: DeepSeek终极筛选
-        ai_result = self.step3_deepseek_selection(df_stocks, top_n=10)
+        # Step 2: 舆情碰撞（同时后台预取TOP N新闻）；Step 3结束后关闭预取线程池
+        top_n = 10
+        try:
+            df_stocks = self.step2_sentiment_match(df_stocks, prefetch_top_n=top_n)
+            
+            # Step 3: DeepSeek终极筛选
+            ai_result = self.step3_deepseek_selection(df_stocks, top_n=top_n)
+        finally:
+            self.close()
         
         # Step 4: 生成报告
         report_file = self.step4_generate_report(df_stocks, ai_result)
@@ -13,6 +13,9 @@ DEEPSEEK_CONFIG = {
     # API基础URL
     'api_base': 'https://api.deepseek.com/v1',
     
+    # 覆盖所有模块的API地址（如本地模拟服务器 http://127.0.0.1:8765/v1），None表示不覆盖
+    'api_base_override': None,
+    
     # 使用的模型
     'model': 'deepseek-chat',
     
@@ -23,7 +26,31 @@ DEEPSEEK_CONFIG = {
     'max_tokens': 500,
     
     # 请求超时时间(秒)
-    'timeout': 30
+    'timeout': 30,
+    
+    # 长输出（选股、简报、情绪汇总）的请求超时时间(秒)
+    'report_timeout': 60,
+    
+    # 建立连接超时时间(秒)
+    'connect_timeout': 10,
+    
+    # 429限流和5xx错误的最大尝试次数
+    'max_retries': 3,
+    
+    # 重试退避基础间隔(秒)
+    'retry_base_delay': 1,
+    
+    # 流式输出两段内容之间的最长等待(秒)，超时即中止，不必等满整个请求超时
+    'stream_idle_timeout': 20,
+    
+    # 连接池大小（所有模块共享长连接）
+    'pool_size': 8,
+    
+    # 是否缓存AI回复（重跑时相同请求不再调用API）
+    'response_cache': True,
+    
+    # AI回复缓存大小上限(MB)，超出后淘汰最久未使用的回复
+    'response_cache_max_mb': 100
 }
 
 # 分析参数配置
@@ -44,6 +71,73 @@ ANALYSIS_CONFIG = {
     'enable_traditional_analysis': True
 }
 
+# 股吧情报分析配置
+INTELLIGENCE_CONFIG = {
+    # 并行分析的进程数，0表示CPU核数，1表示只用当前进程
+    'workers': 0,
+    
+    # 帖子数少于该值时不启用多进程
+    'parallel_min_posts': 5000,
+    
+    # 每个进程分到的分片数（分片越多负载越均衡）
+    'shards_per_worker': 4
+}
+
+# 提示词token预算配置（本地估算token数，按优先级填满预算）
+PROMPT_BUDGET_CONFIG = {
+    # 微博情绪分析送入AI的帖子预算(tokens)
+    'weibo_sentiment_tokens': 4000,
+    
+    # 全网雷达今日讨论的预算(tokens)
+    'discovery_today_tokens': 6000,
+    
+    # 全网雷达昨日讨论的预算(tokens)
+    'discovery_yesterday_tokens': 3000,
+    
+    # 近似重复判定阈值(0-1)，与已选文本相似度不低于该值的帖子跳过
+    'near_duplicate_threshold': 0.8,
+    
+    # 剩余预算不少于该值(tokens)时截断下一条帖子补齐预算
+    'min_item_tokens': 30,
+    
+    # 微博map-reduce分析的最多分片数（每个分片使用weibo_sentiment_tokens预算）
+    'weibo_max_shards': 20
+}
+
+# 本地模拟DeepSeek服务器配置（python mock_deepseek_server.py 启动，离线压测和回归测试用）
+MOCK_DEEPSEEK_CONFIG = {
+    # 监听地址和端口
+    'host': '127.0.0.1',
+    'port': 8765,
+    
+    # 录制文件路径（JSON Lines），None表示缓存目录下的deepseek_recordings.jsonl
+    'recordings_path': None,
+    
+    # 录制模式转发的真实API地址
+    'upstream': 'https://api.deepseek.com/v1',
+    
+    # 每次请求的固定延迟和随机抖动(秒)
+    'latency': 0.5,
+    'latency_jitter': 0.5,
+    
+    # 注入429限流和格式错误JSON的概率(0-1)
+    'rate_429': 0.0,
+    'rate_malformed': 0.0,
+    
+    # 注入429时返回的Retry-After(秒)
+    'retry_after': 1,
+    
+    # 流式输出每段的字符数和间隔(秒)
+    'stream_chunk_chars': 20,
+    'stream_chunk_delay': 0.02,
+    
+    # 回放模式下没有录制时返回的内容，None表示返回404
+    'fallback_content': '[]',
+    
+    # 故障注入的随机种子（同一请求的第N次尝试结果固定，便于复现）
+    'seed': 0
+}
+
 # 输出配置
 OUTPUT_CONFIG = {
     # 输出目录
@@ -57,6 +151,73 @@ OUTPUT_CONFIG = {
 }
 
 
+# 缓存配置
+CACHE_CONFIG = {
+    # 缓存目录
+    'cache_dir': 'cache',
+    
+    # 全市场行情快照有效期（秒）
+    'snapshot_ttl': 300,
+    
+    # 筛选断点续跑检查点目录
+    'checkpoint_dir': 'cache/checkpoints',
+    
+    # 逐只股票慢变数据缓存：同时排队的后台刷新上限，超出时继续使用旧值
+    'max_pending_refresh': 64,
+    
+    # 逐只股票慢变数据缓存：有效期和过期后先返回旧值的宽限期（秒）
+    'datasets': {
+        'stock_zh_a_gdhs': {'ttl': 7 * 24 * 3600, 'stale_ttl': 30 * 24 * 3600},
+        'stock_zh_a_dividend': {'ttl': 7 * 24 * 3600, 'stale_ttl': 90 * 24 * 3600},
+        'stock_zh_a_hist_notice': {'ttl': 12 * 3600, 'stale_ttl': 2 * 24 * 3600},
+        'stock_news_em': {'ttl': 1800, 'stale_ttl': 1800}
+    }
+}
+
+
+# 并发数据获取配置
+FETCH_CONFIG = {
+    # 并发线程数
+    'max_workers': 8,
+    
+    # 未单独配置的akshare接口每秒请求数
+    'default_rate': 2,
+    
+    # 按akshare接口配置每秒请求数
+    'rate_limits': {
+        'stock_individual_info_em': 2,
+        'stock_zh_a_gdhs': 1,
+        'stock_zh_a_hist_notice': 1,
+        'stock_zh_a_dividend': 1,
+        'stock_news_em': 2,
+        'stock_guba_sina': 2
+    },
+    
+    # 最大尝试次数
+    'max_retries': 3,
+    
+    # 重试退避基础间隔（秒），实际间隔为指数退避加随机抖动
+    'retry_base_delay': 1,
+    
+    # 重试退避最大间隔（秒）
+    'retry_max_delay': 30
+}
+
+
+# 全市场股票简称字典配置（来自stock_info_a_code_name，每天刷新一次）
+STOCK_NAME_CONFIG = {
+    # 短于该长度的简称不参与识别，避免误判
+    'min_name_length': 3,
+    
+    # 额外的别名 {别名: 代码}，不受最短长度限制
+    'aliases': {},
+    
+    # 与常用词相同的简称：帖子中同时出现股票代码才算提及（避免板块讨论被归到这些股票上）
+    'ambiguous_names': ['机器人', '太阳能', '新希望', '农产品', '好想你', '老百姓', '金融街',
+                        '人民网', '新华网', '我爱我家', '中国医药', '中国软件']
+}
+
+
 # 邮件配置
 EMAIL_CONFIG = {
     # SMTP服务器配置
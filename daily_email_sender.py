@@ -64,20 +64,27 @@ class DailyEmailSender:
         
         results = {}
         
-        # 1. 黄金股票筛选
+        # 1. 黄金股票筛选（失败或超时后断点续跑一次，只处理未完成的股票）
         print("\n【1/5】运行黄金股票筛选...")
-        try:
-            result = subprocess.run(
-                ['python3', 'gold_stock_screener.py'],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            results['gold_stocks'] = result.returncode == 0
-            print("✓ 黄金股票筛选完成" if results['gold_stocks'] else "× 黄金股票筛选失败")
-        except Exception as e:
-            print(f"× 黄金股票筛选失败: {e}")
-            results['gold_stocks'] = False
+        results['gold_stocks'] = False
+        for attempt, command in enumerate([['python3', 'gold_stock_screener.py'],
+                                           ['python3', 'gold_stock_screener.py', '--resume']]):
+            try:
+                result = subprocess.run(
+                    command,
+                    capture_output=True,
+                    text=True,
+                    timeout=300
+                )
+                results['gold_stocks'] = result.returncode == 0
+            except Exception as e:
+                print(f"× 黄金股票筛选失败: {e}")
+            
+            if results['gold_stocks']:
+                break
+            if attempt == 0:
+                print("⚠️  黄金股票筛选未完成，断点续跑...")
+        print("✓ 黄金股票筛选完成" if results['gold_stocks'] else "× 黄金股票筛选失败")
         
         # 2. 微博情绪分析（加权版）
         print("\n【2/5】运行微博情绪分析...")
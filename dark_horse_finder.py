@@ -7,12 +7,15 @@
 
 import pandas as pd
 import numpy as np
-import akshare as ak
 import re
 from datetime import datetime
 from collections import Counter
 import warnings
 
+from market_snapshot import get_market_snapshot
+from stock_fundamentals import get_fundamentals_provider
+from stock_names import get_stock_name_dictionary
+
 warnings.filterwarnings('ignore')
 
 
@@ -57,6 +60,19 @@ class DarkHorseFinder:
             'PB': (0, 5),           # PB < 5
         }
         
+        # 共享全市场行情快照和批量基本面数据
+        self.market_snapshot = get_market_snapshot()
+        self.fundamentals = get_fundamentals_provider()
+        
+        # 全市场股票简称字典（首次使用时加载）
+        self._stock_dictionary = None
+    
+    def _get_stock_dictionary(self):
+        """获取全市场股票简称字典（合并常用股票映射）"""
+        if self._stock_dictionary is None:
+            self._stock_dictionary = get_stock_name_dictionary().merged(self.stock_mapping)
+        return self._stock_dictionary
+        
     def generate_dark_horse_report(self, intelligence_df, stock_screener_df=None):
         """
         生成黑马发现报告
@@ -82,7 +98,9 @@ class DarkHorseFinder:
         if not candidates:
             return "未发现符合条件的黑马股票"
         
-        # 3. 验证硬指标
+        # 3. 验证硬指标（先批量预取候选股基本面数据）
+        self.fundamentals.get_fundamentals([info['股票代码'] for info in candidates])
+        
         dark_horses = []
         for stock_info in candidates:
             verified = self._verify_hard_indicators(stock_info)
@@ -117,8 +135,9 @@ class DarkHorseFinder:
                     name = stock.split('(')[0]
                     code = stock.split('(')[1].rstrip(')')
                 else:
+                    # 只有代码时从全市场简称字典补全名称
                     code = stock
-                    name = stock
+                    name = self._get_stock_dictionary().name_of(code) or stock
                 
                 if code not in stock_signals:
                     stock_signals[code] = {
@@ -224,11 +243,11 @@ class DarkHorseFinder:
     def _get_stock_basic_info(self, code):
         """获取股票基本信息"""
         try:
-            stock_info = ak.stock_individual_info_em(symbol=code)
+            info_dict = self.fundamentals.get_basic_info(code)
             
-            info_dict = {}
-            for _, row in stock_info.iterrows():
-                info_dict[row['item']] = row['value']
+            if not info_dict:
+                print(f"    未获取到 {code} 的基本面数据")
+                return {}
             
             # 解析数据 - 修正单位
             total_shares_str = str(info_dict.get('总股本', '0'))
@@ -244,9 +263,12 @@ class DarkHorseFinder:
             circulating_market_cap_str = str(info_dict.get('流通市值', '0'))
             circulating_market_cap = float(circulating_market_cap_str) / 1e8
             
-            # PE和PB可能不在基本信息中，给默认值
-            pe = 25.0  # 默认合理PE
-            pb = 2.0   # 默认合理PB
+            # PE和PB不在基本信息中，从共享行情快照读取，缺失时给默认值
+            snapshot_row = self.market_snapshot.get_stock(code)
+            pe = snapshot_row.get('市盈率-动态')
+            pb = snapshot_row.get('市净率')
+            pe = 25.0 if pd.isna(pe) else float(pe)  # 默认合理PE
+            pb = 2.0 if pd.isna(pb) else float(pb)   # 默认合理PB
             
             print(f"    流通股: {circulating_shares:.2f}亿股")
             print(f"    流通市值: {circulating_market_cap:.2f}亿元")
@@ -6,12 +6,14 @@ DeepSeek AI 文本分析模块
 """
 
 import pandas as pd
-import json
-import requests
+import asyncio
 import time
 from datetime import datetime
 import warnings
 
+from deepseek_client import get_deepseek_client, extract_json
+from fetch_executor import TokenBucket
+
 warnings.filterwarnings('ignore')
 
 
@@ -30,6 +32,9 @@ class DeepSeekAnalyzer:
         self.api_base = api_base
         self.model = "deepseek-chat"  # 使用DeepSeek Chat模型
         
+        # 共享连接池的DeepSeek客户端
+        self.deepseek = get_deepseek_client(self.api_key, self.api_base)
+        
         # 系统提示词
         self.system_prompt = """你现在是一个资深金融博弈专家。请分析以下文本内容，并按要求输出。
 
@@ -48,26 +53,50 @@ class DeepSeekAnalyzer:
 
 如果文本中提到多只股票，请为每只股票输出一个JSON对象，用数组包裹。
 如果无法识别股票或文本质量太低，返回空数组 []。"""
+        
+        # 多帖合并请求的系统提示词（每条帖子带ID，按ID返回结果）
+        self.batch_system_prompt = self.system_prompt.replace(
+            "如果文本中提到多只股票，请为每只股票输出一个JSON对象，用数组包裹。\n如果无法识别股票或文本质量太低，返回空数组 []。",
+            """本次输入包含多条帖子，每条帖子以"【帖子ID】"开头。
+请把所有结果放在一个JSON数组中输出，每个对象额外包含字段：
+- post_id: 该结果所属帖子的ID（与输入中的ID完全一致）
+
+同一条帖子提到多只股票时，为每只股票输出一个对象，post_id相同。
+无法识别股票或文本质量太低的帖子不输出任何对象；所有帖子都无效时返回空数组 []。"""
+        )
     
-    def analyze_posts(self, posts_df, batch_size=10, delay=1):
+    def analyze_posts(self, posts_df, batch_size=10, delay=1, concurrency=1, requests_per_minute=60,
+                      posts_per_request=1):
         """
         分析股吧帖子
         
         参数:
             posts_df: 包含帖子的DataFrame
-            batch_size: 每批处理的帖子数量
-            delay: 请求间隔（秒）
+            batch_size: 每批处理的帖子数量（逐条模式）
+            delay: 请求间隔（秒，逐条模式）
+            concurrency: 并发请求数，大于1时使用asyncio并发模式
+            requests_per_minute: 并发模式下每分钟最多发起的API请求数
+            posts_per_request: 每次API请求合并的帖子数，大于1时多条帖子打包成一次请求
             
         返回:
-            DataFrame: 包含AI分析结果的数据
+            DataFrame: 包含AI分析结果的数据（顺序与输入帖子一致）
         """
         if posts_df.empty:
             print("输入数据为空")
             return pd.DataFrame()
         
+        if concurrency > 1:
+            all_results = asyncio.run(
+                self.analyze_posts_async(posts_df, concurrency, requests_per_minute, posts_per_request)
+            )
+            return self._finish_analysis(all_results)
+        
         print(f"开始使用DeepSeek AI分析 {len(posts_df)} 条帖子...")
         print(f"批次大小: {batch_size}, 请求间隔: {delay}秒")
         
+        if posts_per_request > 1:
+            print(f"合并请求: 每次请求 {posts_per_request} 条帖子")
+        
         all_results = []
         
         # 分批处理
@@ -78,35 +107,191 @@ class DeepSeekAnalyzer:
             
             print(f"\n处理批次 {batch_num}/{total_batches}...")
             
-            for idx, row in batch.iterrows():
+            for rows in self._chunk_rows(batch, posts_per_request):
                 try:
-                    # 准备输入文本
-                    title = str(row.get('标题', ''))
-                    content = str(row.get('内容', ''))
-                    
-                    # 调用DeepSeek API
-                    result = self._analyze_single_post(title, content)
-                    
-                    if result:
-                        # 添加原始信息
-                        for item in result:
-                            item['原始标题'] = title
-                            item['原始内容'] = content[:100] + '...' if len(content) > 100 else content
-                            item['帖子链接'] = row.get('帖子链接', '')
-                            item['发布时间'] = row.get('发布时间', '')
-                            all_results.append(item)
-                        
-                        print(f"  ✓ 第 {idx+1} 条: 识别到 {len(result)} 个标的")
-                    else:
-                        print(f"  × 第 {idx+1} 条: 未识别到有效信息")
+                    # 调用DeepSeek API（记录请求数，命中回复缓存时不需要等待）
+                    requests_before = self.deepseek.stats['request']
+                    all_results.extend(self._analyze_rows(rows))
                     
                     # 延时避免请求过快
-                    time.sleep(delay)
+                    if self.deepseek.stats['request'] > requests_before:
+                        time.sleep(delay)
                     
                 except Exception as e:
-                    print(f"  × 第 {idx+1} 条分析失败: {e}")
+                    print(f"  × 第 {rows[0][0]+1}-{rows[-1][0]+1} 条分析失败: {e}")
                     continue
         
+        return self._finish_analysis(all_results)
+    
+    async def analyze_posts_async(self, posts_df, concurrency=5, requests_per_minute=60, posts_per_request=1):
+        """
+        并发分析股吧帖子
+        
+        同时最多concurrency条请求在途，所有请求共用每分钟requests_per_minute次的令牌桶；
+        命中回复缓存的帖子不占用请求配额。单条帖子（或单个合并请求）失败不影响其他帖子
+        
+        参数:
+            posts_df: 包含帖子的DataFrame
+            concurrency: 并发请求数
+            requests_per_minute: 每分钟最多发起的API请求数
+            posts_per_request: 每次API请求合并的帖子数
+            
+        返回:
+            list: 分析结果字典列表（按输入帖子顺序）
+        """
+        print(f"开始使用DeepSeek AI并发分析 {len(posts_df)} 条帖子...")
+        print(f"并发数: {concurrency}, 每分钟最多 {requests_per_minute} 次请求")
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        bucket = TokenBucket(requests_per_minute / 60)
+        
+        async def analyze_one(rows):
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self._analyze_rows, rows, bucket.acquire)
+                except Exception as e:
+                    print(f"  × 第 {rows[0][0]+1}-{rows[-1][0]+1} 条分析失败: {e}")
+                    return []
+        
+        chunks = self._chunk_rows(posts_df, posts_per_request)
+        results = await asyncio.gather(*(analyze_one(rows) for rows in chunks))
+        
+        return [item for items in results for item in items]
+    
+    def _post_text(self, row):
+        """帖子的标题和内容"""
+        return str(row.get('标题', '')), str(row.get('内容', ''))
+    
+    def _build_user_input(self, title, content):
+        """构建单条帖子的用户输入"""
+        return f"标题: {title}\n内容: {content}"
+    
+    def _chunk_rows(self, posts_df, size):
+        """把帖子按每次请求的条数切分为 [(idx, row), ...] 列表"""
+        rows = list(posts_df.iterrows())
+        size = max(1, size)
+        return [rows[i:i+size] for i in range(0, len(rows), size)]
+    
+    def _build_batch_input(self, rows):
+        """构建多条帖子合并请求的用户输入（帖子ID取DataFrame索引，拆分重试时保持不变）"""
+        blocks = []
+        for idx, row in rows:
+            title, content = self._post_text(row)
+            blocks.append(f"【P{idx}】\n{self._build_user_input(title, content)}")
+        return "\n\n".join(blocks)
+    
+    def _analyze_rows(self, rows, before_request=None):
+        """
+        分析一组帖子：一条时走单帖请求，多条时合并为一次请求
+        
+        参数:
+            rows: [(idx, row), ...]
+            before_request: 发起未缓存请求前调用的函数（如令牌桶acquire）
+            
+        返回:
+            list: 分析结果字典列表（按输入帖子顺序）
+        """
+        if len(rows) == 1:
+            idx, row = rows[0]
+            title, content = self._post_text(row)
+            if before_request and not self.deepseek.is_cached(
+                    self.system_prompt, self._build_user_input(title, content), 0.3):
+                before_request()
+            return self._analyze_row(idx, row)
+        
+        return self._analyze_batch(rows, before_request)
+    
+    def _analyze_batch(self, rows, before_request=None):
+        """
+        多条帖子合并为一次请求，按post_id拆回各帖子
+        
+        回复无法解析为JSON数组（如输出被截断）时，把批次对半拆分后分别重试，
+        直到单条帖子回退为单帖请求
+        
+        参数:
+            rows: [(idx, row), ...]
+            before_request: 发起未缓存请求前调用的函数
+            
+        返回:
+            list: 分析结果字典列表（按输入帖子顺序）
+        """
+        user_input = self._build_batch_input(rows)
+        
+        if before_request and not self.deepseek.is_cached(self.batch_system_prompt, user_input, 0.3):
+            before_request()
+        
+        response = self.deepseek.chat(
+            self.batch_system_prompt, user_input,
+            temperature=0.3,
+            max_tokens=min(8000, 500 * len(rows))
+        )
+        if not response:
+            print(f"  × 第 {rows[0][0]+1}-{rows[-1][0]+1} 条: 合并请求失败")
+            return []
+        
+        result = extract_json(response, list)
+        
+        if result is None:
+            self.deepseek.forget(self.batch_system_prompt, user_input, 0.3)
+            
+            mid = len(rows) // 2
+            print(f"  ⚠️  第 {rows[0][0]+1}-{rows[-1][0]+1} 条合并请求解析失败，拆分为 {mid} + {len(rows) - mid} 条重试")
+            return self._analyze_rows(rows[:mid], before_request) + self._analyze_rows(rows[mid:], before_request)
+        
+        # 按帖子ID分组，丢弃格式不合法或ID不在本批次中的对象
+        grouped = {f"P{idx}": [] for idx, _ in rows}
+        for item in result:
+            if not isinstance(item, dict):
+                continue
+            post_id = str(item.pop('post_id', '')).strip('【】 ')
+            if post_id in grouped and self._validate_result(item):
+                grouped[post_id].append(item)
+        
+        all_results = []
+        for idx, row in rows:
+            title, content = self._post_text(row)
+            all_results.extend(self._attach_post_info(grouped[f"P{idx}"], idx, row, title, content))
+        
+        return all_results
+    
+    def _analyze_row(self, idx, row):
+        """
+        分析一条帖子并附加原始信息
+        
+        参数:
+            idx: 帖子索引（用于打印）
+            row: 帖子数据行
+            
+        返回:
+            list: 分析结果字典列表
+        """
+        title, content = self._post_text(row)
+        result = self._analyze_single_post(title, content)
+        
+        return self._attach_post_info(result, idx, row, title, content)
+    
+    def _attach_post_info(self, result, idx, row, title, content):
+        """为一条帖子的分析结果添加原始信息"""
+        if not result:
+            print(f"  × 第 {idx+1} 条: 未识别到有效信息")
+            return []
+        
+        # 添加原始信息
+        for item in result:
+            item['原始标题'] = title
+            item['原始内容'] = content[:100] + '...' if len(content) > 100 else content
+            item['帖子链接'] = row.get('帖子链接', '')
+            item['发布时间'] = row.get('发布时间', '')
+        
+        print(f"  ✓ 第 {idx+1} 条: 识别到 {len(result)} 个标的")
+        return result
+    
+    def _finish_analysis(self, all_results):
+        """打印缓存统计并汇总分析结果"""
+        cache_summary = self.deepseek.cache_summary()
+        if cache_summary:
+            print(f"\n{cache_summary}")
+        
         if all_results:
             result_df = pd.DataFrame(all_results)
             print(f"\n✓ 分析完成，共识别 {len(result_df)} 条有效信息")
@@ -127,34 +312,32 @@ class DeepSeekAnalyzer:
             list: 分析结果列表
         """
         # 构建用户输入
-        user_input = f"标题: {title}\n内容: {content}"
+        user_input = self._build_user_input(title, content)
         
         # 调用API
         try:
             response = self._call_deepseek_api(user_input)
             
             if response:
-                # 解析JSON结果
-                try:
-                    # 尝试直接解析
-                    result = json.loads(response)
-                    
-                    # 如果返回的是单个对象，转为数组
-                    if isinstance(result, dict):
-                        result = [result]
-                    
-                    # 验证结果格式
-                    validated_results = []
-                    for item in result:
-                        if self._validate_result(item):
-                            validated_results.append(item)
-                    
-                    return validated_results
-                    
-                except json.JSONDecodeError:
-                    # 如果不是标准JSON，尝试提取
+                # 解析JSON结果（兼容markdown代码块和前后说明文字）
+                result = extract_json(response, (list, dict))
+                
+                if result is None:
                     print(f"    警告: JSON解析失败，原始响应: {response[:100]}...")
+                    self.deepseek.forget(self.system_prompt, user_input, 0.3)
                     return []
+                
+                # 如果返回的是单个对象，转为数组
+                if isinstance(result, dict):
+                    result = [result]
+                
+                # 验证结果格式
+                validated_results = []
+                for item in result:
+                    if isinstance(item, dict) and self._validate_result(item):
+                        validated_results.append(item)
+                
+                return validated_results
             
             return []
             
@@ -172,39 +355,11 @@ class DeepSeekAnalyzer:
         返回:
             str: API响应内容
         """
-        url = f"{self.api_base}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            "temperature": 0.3,  # 降低温度以获得更稳定的输出
-            "max_tokens": 500
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # 提取响应内容
-            if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0]['message']['content']
-                return content.strip()
-            
-            return None
-            
-        except requests.exceptions.RequestException as e:
-            print(f"    API请求错误: {e}")
-            return None
+        return self.deepseek.chat(
+            self.system_prompt, user_input,
+            temperature=0.3,  # 降低温度以获得更稳定的输出
+            max_tokens=500
+        )
     
     def _validate_result(self, item):
         """验证结果格式"""
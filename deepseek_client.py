@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DeepSeek API 统一客户端
+所有模块共用连接池化的requests.Session（保持长连接，避免每次调用重新TLS握手），
+统一超时配置、429/5xx抖动退避重试，以及从模型回复中提取JSON的逻辑
+
+成功的回复按请求内容写入磁盘缓存（见llm_response_cache），重跑时相同请求不再调用API
+
+长输出可流式接收（chat_stream / chat_json(stream=True)），边接收边增量解析JSON（见json_stream），
+数组元素到达即回调，输出格式异常时提前中止并改用一次非流式请求
+
+用法:
+    client = get_deepseek_client()
+    result = client.chat_json(system_prompt, user_input, max_tokens=2000)
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from json_stream import JSONStreamParser, MalformedStreamError
+from llm_response_cache import get_llm_response_cache, make_cache_key
+
+
+# 默认配置（可在config.py的DEEPSEEK_CONFIG中覆盖）
+DEFAULT_DEEPSEEK_CONFIG = {
+    'api_key': 'YOUR_API_KEY',
+    'api_base': 'https://api.deepseek.com/v1',
+    'api_base_override': None,  # 非空时所有模块都使用该地址（如本地模拟服务器）
+    'model': 'deepseek-chat',
+    'temperature': 0.3,
+    'max_tokens': 500,
+    'timeout': 30,             # 读取超时（秒）
+    'report_timeout': 60,      # 长输出（选股、简报、情绪汇总）的读取超时（秒）
+    'connect_timeout': 10,     # 建立连接超时（秒）
+    'max_retries': 3,          # 最大尝试次数
+    'retry_base_delay': 1,     # 退避基础间隔（秒）
+    'retry_max_delay': 30,     # 退避最大间隔（秒）
+    'stream_idle_timeout': 20,  # 流式输出两段内容之间的最长等待（秒）
+    'pool_size': 8,            # 连接池大小
+    'response_cache': True,    # 是否缓存回复
+    'response_cache_max_mb': 100  # 回复缓存大小上限（MB）
+}
+
+# 需要重试的HTTP状态码（限流和服务端错误）
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# markdown代码块
+_CODE_FENCE_PATTERN = re.compile(r'```(?:json)?\s*([\s\S]*?)```', re.IGNORECASE)
+
+
+# 进程内覆盖所有模块的API地址（如指向本地模拟服务器），None表示不覆盖
+_api_base_override = None
+
+
+def set_api_base_override(api_base):
+    """
+    让之后创建的所有DeepSeek客户端都使用指定地址（忽略各模块传入的api_base）
+    
+    参数:
+        api_base: API基础URL（如本地模拟服务器的地址），None表示取消覆盖
+    """
+    global _api_base_override
+    _api_base_override = api_base.rstrip('/') if api_base else None
+
+
+def resolve_api_base(api_base=None, deepseek_config=None):
+    """
+    实际使用的API地址：进程内覆盖 > 配置中的api_base_override > 传入的api_base > 配置中的api_base
+    
+    返回:
+        str: 去掉末尾'/'的API基础URL
+    """
+    deepseek_config = deepseek_config or load_deepseek_config()
+    override = _api_base_override or deepseek_config.get('api_base_override')
+    return (override or api_base or deepseek_config['api_base']).rstrip('/')
+
+
+def load_deepseek_config():
+    """读取DeepSeek配置，config.py中的DEEPSEEK_CONFIG覆盖默认值"""
+    deepseek_config = dict(DEFAULT_DEEPSEEK_CONFIG)
+    
+    try:
+        from config import DEEPSEEK_CONFIG
+        deepseek_config.update(DEEPSEEK_CONFIG)
+    except ImportError:
+        pass
+    
+    return deepseek_config
+
+
+def extract_json(content, expect=None):
+    """
+    从模型回复中提取JSON
+    
+    依次尝试: 整段解析 → markdown代码块 → 从每个'{'/'['起逐个解码，
+    返回第一个类型符合要求的JSON值
+    
+    参数:
+        content: 模型回复文本
+        expect: 期望的类型（dict、list或二者的元组），None表示不限
+    
+    返回:
+        dict/list: 解析结果，提取失败时为None
+    """
+    if not content:
+        return None
+    
+    expect = expect or (dict, list)
+    decoder = json.JSONDecoder()
+    
+    candidates = [content.strip()]
+    candidates.extend(block.strip() for block in _CODE_FENCE_PATTERN.findall(content))
+    
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, expect):
+            return value
+    
+    for match in re.finditer(r'[\[{]', content):
+        try:
+            value, _ = decoder.raw_decode(content, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, expect):
+            return value
+    
+    return None
+
+
+class DeepSeekClient:
+    """DeepSeek Chat Completions客户端（线程安全）"""
+    
+    def __init__(self, api_key=None, api_base=None, **overrides):
+        """
+        初始化客户端
+        
+        参数:
+            api_key: API密钥，默认读取配置
+            api_base: API基础URL，默认读取配置
+            overrides: 覆盖DEEPSEEK_CONFIG中的其他字段（如timeout、max_retries）
+        """
+        deepseek_config = load_deepseek_config()
+        deepseek_config.update(overrides)
+        
+        self.api_key = api_key or deepseek_config['api_key']
+        self.api_base = resolve_api_base(api_base, deepseek_config)
+        self.model = deepseek_config['model']
+        self.temperature = deepseek_config['temperature']
+        self.max_tokens = deepseek_config['max_tokens']
+        self.timeout = deepseek_config['timeout']
+        self.report_timeout = deepseek_config['report_timeout']
+        self.connect_timeout = deepseek_config['connect_timeout']
+        self.max_retries = deepseek_config['max_retries']
+        self.retry_base_delay = deepseek_config['retry_base_delay']
+        self.retry_max_delay = deepseek_config['retry_max_delay']
+        self.stream_idle_timeout = deepseek_config['stream_idle_timeout']
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=deepseek_config['pool_size'])
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        })
+        
+        # 回复缓存（所有客户端共用）
+        self.cache = None
+        if deepseek_config['response_cache']:
+            self.cache = get_llm_response_cache(int(deepseek_config['response_cache_max_mb'] * 1024 * 1024))
+        
+        self.stats = {'request': 0, 'retry': 0, 'error': 0, 'abort': 0}
+        self._lock = threading.Lock()
+    
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+    
+    def _retry_delay(self, attempt, response=None):
+        """退避间隔：优先使用429响应的Retry-After，否则full jitter指数退避"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                return min(self.retry_max_delay, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+        
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+    
+    def _cache_key(self, system_prompt, user_input, temperature=None):
+        """请求对应的回复缓存键（含实际使用的API地址，模拟服务器的回复不会被真实运行读到）"""
+        temperature = self.temperature if temperature is None else temperature
+        return make_cache_key(self.model, system_prompt, user_input, temperature, self.api_base)
+    
+    def is_cached(self, system_prompt, user_input, temperature=None):
+        """
+        请求的回复是否已在缓存中（不计入命中统计）
+        
+        返回:
+            bool: 已缓存时为True，未启用缓存时为False
+        """
+        if self.cache is None:
+            return False
+        return self.cache.contains(self._cache_key(system_prompt, user_input, temperature))
+    
+    def _payload(self, system_prompt, user_input, temperature=None, max_tokens=None):
+        """Chat Completions请求体"""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_input}
+            ],
+            "temperature": self.temperature if temperature is None else temperature,
+            "max_tokens": max_tokens or self.max_tokens
+        }
+    
+    def _post(self, payload, timeout=None, stream=False):
+        """
+        发送请求，429/5xx和连接错误时退避重试
+        
+        参数:
+            payload: 请求体
+            timeout: 读取超时（秒），默认读取配置
+            stream: 是否流式接收响应
+        
+        返回:
+            requests.Response: 成功的响应，失败时为None
+        """
+        url = f"{self.api_base}/chat/completions"
+        request_timeout = (self.connect_timeout, timeout or self.timeout)
+        extra = {'stream': True} if stream else {}
+        
+        for attempt in range(self.max_retries):
+            self._count('request')
+            response = None
+            
+            try:
+                response = self.session.post(url, json=payload, timeout=request_timeout, **extra)
+                
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                
+                error = f"HTTP {response.status_code}"
+            
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            
+            except Exception as e:
+                self._count('error')
+                print(f"  API调用失败: {e}")
+                return None
+            
+            if attempt == self.max_retries - 1:
+                self._count('error')
+                print(f"  API调用失败: {error}")
+                return None
+            
+            self._count('retry')
+            delay = self._retry_delay(attempt, response)
+            print(f"  API请求失败（{error}），{delay:.1f}秒后重试... (尝试 {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+        
+        return None
+    
+    def chat(self, system_prompt, user_input, temperature=None, max_tokens=None, timeout=None, use_cache=True):
+        """
+        调用Chat Completions接口
+        
+        参数:
+            system_prompt: 系统提示词
+            user_input: 用户输入
+            temperature: 温度，默认读取配置
+            max_tokens: 最大输出token数，默认读取配置
+            timeout: 读取超时（秒），默认读取配置
+            use_cache: 是否读写回复缓存
+        
+        返回:
+            str: 回复内容，失败时为None
+        """
+        use_cache = use_cache and self.cache is not None
+        cache_key = self._cache_key(system_prompt, user_input, temperature)
+        
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        payload = self._payload(system_prompt, user_input, temperature, max_tokens)
+        response = self._post(payload, timeout)
+        
+        if response is None:
+            return None
+        
+        try:
+            result = response.json()
+        except Exception as e:
+            self._count('error')
+            print(f"  API调用失败: {e}")
+            return None
+        
+        if 'choices' in result and len(result['choices']) > 0:
+            content = result['choices'][0]['message']['content'].strip()
+            if use_cache:
+                self.cache.put(cache_key, content)
+            return content
+        return None
+    
+    def chat_stream(self, system_prompt, user_input, on_item=None, temperature=None, max_tokens=None,
+                    timeout=None, use_cache=True, expect=None):
+        """
+        流式调用Chat Completions接口，边接收边增量解析JSON
+        
+        回复中数组的元素（顶层数组或顶层对象的数组字段）一旦完整即回调on_item；
+        输出一旦不可能构成合法JSON，或超过stream_idle_timeout秒没有新内容，立即中止请求。
+        中止或连接中断时改用非流式请求重试一次（回复用extract_json提取，与非流式的chat_json一致）
+        
+        参数:
+            system_prompt: 系统提示词
+            user_input: 用户输入
+            on_item: 回调函数 on_item(字段名, 元素)，顶层数组的字段名为None
+            temperature: 温度，默认读取配置
+            max_tokens: 最大输出token数，默认读取配置
+            timeout: 两段输出之间的最长等待（秒），默认为stream_idle_timeout
+            use_cache: 是否读写回复缓存（命中缓存时按同样方式回放）
+            expect: 期望的JSON类型（dict、list或二者的元组），None表示不限
+        
+        返回:
+            dict/list: 完整的JSON结果，请求失败或输出格式异常时为None
+        """
+        use_cache = use_cache and self.cache is not None
+        cache_key = self._cache_key(system_prompt, user_input, temperature)
+        parser = JSONStreamParser(expect=expect)
+        
+        def consume(text):
+            for key, item in parser.feed(text):
+                if on_item:
+                    on_item(key, item)
+        
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                try:
+                    consume(cached)
+                    return parser.result()
+                except MalformedStreamError:
+                    result = extract_json(cached, expect)
+                    if result is not None:
+                        self._replay_items(result, parser.emitted, on_item)
+                        return result
+                    self.cache.invalidate(cache_key)
+                    parser = JSONStreamParser(expect=expect)
+        
+        payload = self._payload(system_prompt, user_input, temperature, max_tokens)
+        payload['stream'] = True
+        response = self._post(payload, timeout or self.stream_idle_timeout, stream=True)
+        
+        if response is None:
+            return None
+        
+        try:
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        break
+                    
+                    choices = json.loads(data).get('choices') or []
+                    delta = choices[0].get('delta', {}).get('content') if choices else None
+                    if delta:
+                        consume(delta)
+                    
+                    if parser.done:
+                        break
+            
+            result = parser.result()
+        
+        except MalformedStreamError as e:
+            self._count('abort')
+            print(f"  ⚠️  流式输出格式异常，已中止（已接收 {len(parser.text)} 字）: {e}")
+            print(f"  原始响应: {parser.text[:200]}...")
+            return self._recover_stream(parser, system_prompt, user_input, on_item, temperature, max_tokens,
+                                        use_cache, expect)
+        
+        except Exception as e:
+            self._count('error')
+            print(f"  API流式接收失败: {e}")
+            return self._recover_stream(parser, system_prompt, user_input, on_item, temperature, max_tokens,
+                                        use_cache, expect)
+        
+        if use_cache:
+            self.cache.put(cache_key, parser.text.strip())
+        return result
+    
+    def _recover_stream(self, parser, system_prompt, user_input, on_item, temperature, max_tokens,
+                        use_cache, expect):
+        """
+        流式接收中止后改用非流式请求重试一次，按chat_json的方式用extract_json提取
+        
+        已接收的内容不完整，直接对其extract_json可能取到数组中的某个元素，因此不作为结果
+        
+        返回:
+            dict/list: 解析结果，仍失败时为None
+        """
+        print("  改用非流式请求重试一次...")
+        content = self.chat(system_prompt, user_input, temperature=temperature, max_tokens=max_tokens,
+                            use_cache=use_cache)
+        
+        result = extract_json(content, expect)
+        if result is None:
+            if content is not None:
+                print(f"  原始响应: {content[:200]}...")
+            self.forget(system_prompt, user_input, temperature)
+            return None
+        
+        self._replay_items(result, parser.emitted, on_item)
+        return result
+    
+    def _replay_items(self, result, skip, on_item):
+        """补救得到的结果中，按流式解析的规则回调尚未回调过的数组元素（跳过前skip个）"""
+        if not on_item:
+            return
+        
+        replay = JSONStreamParser()
+        for key, item in replay.feed(json.dumps(result, ensure_ascii=False))[skip:]:
+            on_item(key, item)
+    
+    def chat_json(self, system_prompt, user_input, expect=dict, stream=False, on_item=None, **kwargs):
+        """
+        调用接口并从回复中提取JSON
+        
+        参数:
+            system_prompt: 系统提示词
+            user_input: 用户输入
+            expect: 期望的JSON类型（dict、list或二者的元组）
+            stream: 是否流式接收（边接收边解析，格式异常时提前中止）
+            on_item: 流式模式下数组元素到达时的回调 on_item(字段名, 元素)
+            kwargs: 传给chat/chat_stream的参数
+        
+        返回:
+            dict/list: 解析结果，调用或解析失败时为None
+        """
+        if stream:
+            result = self.chat_stream(system_prompt, user_input, on_item=on_item, expect=expect, **kwargs)
+            if result is not None and not isinstance(result, expect):
+                print(f"  警告: 响应的JSON类型不符: {type(result).__name__}")
+                self.forget(system_prompt, user_input, kwargs.get('temperature'))
+                return None
+            return result
+        
+        content = self.chat(system_prompt, user_input, **kwargs)
+        
+        if content is None:
+            return None
+        
+        result = extract_json(content, expect)
+        if result is None:
+            print("  警告: 无法从响应中提取JSON")
+            print(f"  原始响应: {content[:200]}...")
+            
+            self.forget(system_prompt, user_input, kwargs.get('temperature'))
+        
+        return result
+    
+    def forget(self, system_prompt, user_input, temperature=None):
+        """从回复缓存中删除一次请求的回复（回复不可用时调用，下次重新请求）"""
+        if self.cache is not None:
+            self.cache.invalidate(self._cache_key(system_prompt, user_input, temperature))
+    
+    def cache_summary(self):
+        """回复缓存统计摘要，未启用缓存时为空字符串"""
+        return self.cache.summary() if self.cache is not None else ""
+
+
+# 进程内共享实例（按API密钥和地址区分）
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def get_deepseek_client(api_key=None, api_base=None):
+    """
+    获取进程内共享的DeepSeek客户端（同一密钥和地址共用一个连接池）
+    
+    参数:
+        api_key: API密钥，默认读取配置
+        api_base: API基础URL，默认读取配置
+    
+    返回:
+        DeepSeekClient: 共享客户端
+    """
+    deepseek_config = load_deepseek_config()
+    key = (api_key or deepseek_config['api_key'], resolve_api_base(api_base, deepseek_config))
+    
+    with _shared_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = DeepSeekClient(api_key=key[0], api_base=key[1])
+        return _shared_clients[key]
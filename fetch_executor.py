@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发限流数据获取执行器
+为逐只股票的akshare查询提供线程池并发、按接口令牌桶限流和抖动退避重试
+
+用法:
+    fetcher = get_fetch_executor()
+    holders = fetcher.call('stock_zh_a_gdhs', lambda: ak.stock_zh_a_gdhs(symbol=code))
+    results = fetcher.map(analyze_one_stock, stock_rows)   # 结果顺序与输入一致
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# 默认配置（可在config.py的FETCH_CONFIG中覆盖）
+DEFAULT_FETCH_CONFIG = {
+    'max_workers': 8,          # 并发线程数
+    'default_rate': 2,         # 未单独配置的接口每秒请求数
+    'rate_limits': {},         # 按akshare接口名配置每秒请求数
+    'max_retries': 3,          # 最大尝试次数
+    'retry_base_delay': 1,     # 退避基础间隔（秒）
+    'retry_max_delay': 30      # 退避最大间隔（秒）
+}
+
+
+def load_fetch_config():
+    """读取并发获取配置，config.py中的FETCH_CONFIG覆盖默认值"""
+    fetch_config = dict(DEFAULT_FETCH_CONFIG)
+    
+    try:
+        from config import FETCH_CONFIG
+        fetch_config.update(FETCH_CONFIG)
+    except ImportError:
+        pass
+    
+    return fetch_config
+
+
+def retry_with_backoff(func, max_retries=3, base_delay=1, max_delay=30):
+    """
+    带抖动指数退避的重试
+    
+    第n次失败后等待 random(0, min(max_delay, base_delay × 2^n)) 秒（full jitter），
+    避免并发线程在同一时刻集中重试
+    
+    参数:
+        func: 无参调用函数
+        max_retries: 最大尝试次数
+        base_delay: 退避基础间隔（秒）
+        max_delay: 退避最大间隔（秒）
+    
+    返回:
+        func的返回值，最后一次仍失败时抛出原异常
+    """
+    for attempt in range(max_retries):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise e
+            
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            print(f"    请求失败，{delay:.1f}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+    
+    return None
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全）"""
+    
+    def __init__(self, rate, capacity=None):
+        """
+        参数:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数），默认等于rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait = (1 - self._tokens) / self.rate
+            
+            time.sleep(wait)
+
+
+class FetchExecutor:
+    """并发限流获取执行器"""
+    
+    def __init__(self, max_workers=None, rate_limits=None, default_rate=None,
+                 max_retries=None, retry_base_delay=None):
+        """
+        初始化执行器
+        
+        参数:
+            max_workers: 并发线程数
+            rate_limits: {接口名: 每秒请求数}
+            default_rate: 未单独配置的接口每秒请求数
+            max_retries: 默认最大尝试次数
+            retry_base_delay: 默认退避基础间隔（秒）
+        """
+        fetch_config = load_fetch_config()
+        
+        self.max_workers = max_workers or fetch_config['max_workers']
+        self.rate_limits = dict(fetch_config['rate_limits'])
+        self.rate_limits.update(rate_limits or {})
+        self.default_rate = default_rate or fetch_config['default_rate']
+        self.max_retries = max_retries or fetch_config['max_retries']
+        self.retry_base_delay = retry_base_delay if retry_base_delay is not None else fetch_config['retry_base_delay']
+        self.retry_max_delay = fetch_config['retry_max_delay']
+        
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+    
+    def _bucket(self, endpoint):
+        """获取接口对应的令牌桶"""
+        with self._buckets_lock:
+            if endpoint not in self._buckets:
+                rate = self.rate_limits.get(endpoint, self.default_rate)
+                self._buckets[endpoint] = TokenBucket(rate)
+            return self._buckets[endpoint]
+    
+    def call(self, endpoint, func, max_retries=None, base_delay=None):
+        """
+        限流并重试地调用一次接口
+        
+        参数:
+            endpoint: 接口名（通常为akshare函数名），用于选择令牌桶
+            func: 无参调用函数
+            max_retries: 最大尝试次数，默认读取配置
+            base_delay: 退避基础间隔（秒），默认读取配置
+        
+        返回:
+            func的返回值，全部尝试失败时抛出最后一次的异常
+        """
+        bucket = self._bucket(endpoint)
+        
+        def limited_call():
+            bucket.acquire()
+            return func()
+        
+        return retry_with_backoff(
+            limited_call,
+            max_retries=max_retries or self.max_retries,
+            base_delay=base_delay if base_delay is not None else self.retry_base_delay,
+            max_delay=self.retry_max_delay
+        )
+    
+    def map(self, func, items, progress_every=10):
+        """
+        并发处理多个任务，结果按输入顺序返回
+        
+        参数:
+            func: 单个任务的处理函数
+            items: 任务参数列表
+            progress_every: 每完成多少个任务打印一次进度，0表示不打印
+        
+        返回:
+            list: 与items一一对应的结果，处理失败的任务为None
+        """
+        items = list(items)
+        results = [None] * len(items)
+        
+        if not items:
+            return results
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(func, item): i for i, item in enumerate(items)}
+            
+            completed = 0
+            for future in as_completed(futures):
+                index = futures[future]
+                
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"  × 第 {index + 1} 个任务处理失败: {e}")
+                
+                completed += 1
+                if progress_every and completed % progress_every == 0:
+                    print(f"--- 进度: {completed}/{len(items)} ---")
+        
+        return results
+
+
+# 进程内共享实例
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+
+def get_fetch_executor():
+    """
+    获取进程内共享的获取执行器（所有模块共用同一组接口限流）
+    
+    返回:
+        FetchExecutor: 共享执行器
+    """
+    global _shared_executor
+    
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = FetchExecutor()
+        return _shared_executor
@@ -12,6 +12,8 @@ import time
 import warnings
 from datetime import datetime
 
+from stock_fundamentals import get_fundamentals_provider
+
 warnings.filterwarnings('ignore')
 
 class GoldStockFinalScreener:
@@ -22,6 +24,9 @@ class GoldStockFinalScreener:
             '中央汇金', '证金公司', '国有资产', '国投', '中投'
         ]
         
+        # 共享批量基本面数据
+        self.fundamentals = get_fundamentals_provider()
+        
     def get_gold_stocks(self):
         """获取黄金行业股票列表"""
         print("正在获取黄金行业股票...")
@@ -77,13 +82,9 @@ class GoldStockFinalScreener:
         return pd.DataFrame()
     
     def get_stock_basic_info(self, stock_code):
-        """获取股票基本信息"""
+        """获取股票基本信息（批量基本面数据，缺失时回退单只查询）"""
         try:
-            stock_info = ak.stock_individual_info_em(symbol=stock_code)
-            info_dict = {}
-            for _, row in stock_info.iterrows():
-                info_dict[row['item']] = row['value']
-            return info_dict
+            return self.fundamentals.get_basic_info(stock_code)
         except Exception as e:
             print(f"    获取基本信息失败: {e}")
             return {}
@@ -257,6 +258,10 @@ class GoldStockFinalScreener:
         
         print(f"\n找到 {len(gold_stocks)} 只黄金相关股票，开始分析...\n")
         
+        # 批量预取基本面数据，替代逐只查询
+        code_column = '代码' if '代码' in gold_stocks.columns else 'code'
+        self.fundamentals.get_fundamentals(gold_stocks[code_column])
+        
         results = []
         for idx, row in gold_stocks.iterrows():
             # 处理列名差异
@@ -8,12 +8,28 @@
 import akshare as ak
 import pandas as pd
 import numpy as np
-import time
+import sys
 import warnings
 from datetime import datetime, timedelta
 
+from market_snapshot import get_market_snapshot
+from stock_fundamentals import get_fundamentals_provider
+from scoring_engine import score_candidates, GOLD_SCORE_RULES
+from fetch_executor import get_fetch_executor, retry_with_backoff
+from stock_data_cache import get_stock_data_cache
+from screen_checkpoint import ScreenCheckpoint, StockFetchError
+
 warnings.filterwarnings('ignore')
 
+
+# 评分结果列
+GOLD_RESULT_COLUMNS = [
+    '股票代码', '股票名称', '所属行业', '总股本(亿股)', '流通市值(亿元)', '当前价格',
+    '股本匹配分', '官方背书分', '增持动向分', '题材热度分', '分红预期分', '黄金行业分',
+    '总分', '符合条件数', '进入筛选池'
+]
+
+
 class GoldStockScreener:
     def __init__(self):
         """初始化黄金股票筛选器"""
@@ -27,18 +43,19 @@ class GoldStockScreener:
             '中央汇金', '证金公司', '国有资产', '国投', '中投'
         ]
         
-    def retry_request(self, func, max_retries=3, delay=1):
-        """重试机制"""
-        for attempt in range(max_retries):
-            try:
-                result = func()
-                return result
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                print(f"    请求失败，{delay}秒后重试... (尝试 {attempt + 1}/{max_retries})")
-                time.sleep(delay)
-        return None
+        # 共享全市场行情快照和批量基本面数据
+        self.market_snapshot = get_market_snapshot()
+        self.fundamentals = get_fundamentals_provider()
+        
+        # 共享并发限流获取执行器和慢变数据磁盘缓存
+        self.fetcher = get_fetch_executor()
+        self.data_cache = get_stock_data_cache()
+        
+    def retry_request(self, func, max_retries=3, delay=1, endpoint=None):
+        """重试机制（抖动指数退避，指定endpoint时按接口限流）"""
+        if endpoint:
+            return self.fetcher.call(endpoint, func, max_retries=max_retries, base_delay=delay)
+        return retry_with_backoff(func, max_retries=max_retries, base_delay=delay)
     
     def get_gold_stocks(self):
         """获取黄金行业股票列表"""
@@ -83,9 +100,13 @@ class GoldStockScreener:
             except Exception as e:
                 print(f"通过行业分类获取失败: {e}")
             
-            # 方法2: 通过股票名称关键词筛选
+            # 方法2: 通过股票名称关键词筛选（优先使用共享行情快照）
             print("尝试通过股票名称关键词筛选...")
-            all_stocks = self.retry_request(lambda: ak.stock_info_a_code_name())
+            snapshot = self.market_snapshot.get()
+            if not snapshot.empty:
+                all_stocks = snapshot[['代码', '名称']].rename(columns={'代码': 'code', '名称': 'name'})
+            else:
+                all_stocks = self.retry_request(lambda: ak.stock_info_a_code_name())
             
             gold_stocks = all_stocks[
                 all_stocks['name'].str.contains('|'.join(self.gold_keywords), na=False)
@@ -104,17 +125,11 @@ class GoldStockScreener:
             return pd.DataFrame()
     
     def get_stock_basic_info(self, stock_code):
-        """获取股票基本信息"""
+        """获取股票基本信息（批量基本面数据，缺失时回退单只查询）"""
         try:
-            stock_individual_info = self.retry_request(
-                lambda: ak.stock_individual_info_em(symbol=stock_code)
+            info_dict = self.retry_request(
+                lambda: self.fundamentals.get_basic_info(stock_code)
             )
-            
-            # 转换为字典格式便于处理
-            info_dict = {}
-            for _, row in stock_individual_info.iterrows():
-                info_dict[row['item']] = row['value']
-            
             return info_dict
         except Exception as e:
             print(f"    获取基本信息失败: {e}")
@@ -123,10 +138,14 @@ class GoldStockScreener:
     def get_stock_holders(self, stock_code):
         """获取股票十大股东信息"""
         try:
-            holders = self.retry_request(
-                lambda: ak.stock_zh_a_gdhs(symbol=stock_code),
-                max_retries=2,
-                delay=2
+            holders = self.data_cache.get_or_fetch(
+                'stock_zh_a_gdhs', stock_code,
+                lambda: self.retry_request(
+                    lambda: ak.stock_zh_a_gdhs(symbol=stock_code),
+                    max_retries=2,
+                    delay=2,
+                    endpoint='stock_zh_a_gdhs'
+                )
             )
             return holders
         except Exception as e:
@@ -187,25 +206,18 @@ class GoldStockScreener:
         return len(found_officials) > 0, found_officials
     
     def get_stock_price_info(self, stock_code):
-        """获取股票价格相关信息"""
-        try:
-            # 获取最近的价格数据
-            price_data = self.retry_request(
-                lambda: ak.stock_zh_a_hist(symbol=stock_code, period="daily", 
-                                         start_date="20240101", end_date="20241231", adjust="")
-            )
-            
-            if not price_data.empty:
-                latest_data = price_data.iloc[-1]
-                return {
-                    '最新价格': latest_data['收盘'],
-                    '涨跌幅': latest_data.get('涨跌幅', 0),
-                    '成交量': latest_data.get('成交量', 0),
-                    '成交额': latest_data.get('成交额', 0)
-                }
-        except Exception as e:
-            print(f"    获取价格信息失败: {e}")
-        
+        """获取股票价格相关信息（来自共享行情快照）"""
+        stock = self.market_snapshot.get_stock(stock_code)
+        
+        if stock:
+            return {
+                '最新价格': stock.get('最新价', 0),
+                '涨跌幅': stock.get('涨跌幅', 0),
+                '成交量': stock.get('成交量', 0),
+                '成交额': stock.get('成交额', 0)
+            }
+        
+        print(f"    获取价格信息失败: 行情快照中无 {stock_code}")
         return {}
     
     def get_stock_announcements(self, stock_code, days=90):
@@ -214,13 +226,17 @@ class GoldStockScreener:
             end_date = datetime.now().strftime('%Y%m%d')
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
             
-            announcements = self.retry_request(
-                lambda: ak.stock_zh_a_hist_notice(
-                    symbol=stock_code,
-                    start_date=start_date,
-                    end_date=end_date
-                ),
-                max_retries=2
+            announcements = self.data_cache.get_or_fetch(
+                'stock_zh_a_hist_notice', f"{stock_code}_{days}",
+                lambda: self.retry_request(
+                    lambda: ak.stock_zh_a_hist_notice(
+                        symbol=stock_code,
+                        start_date=start_date,
+                        end_date=end_date
+                    ),
+                    max_retries=2,
+                    endpoint='stock_zh_a_hist_notice'
+                )
             )
             return announcements if announcements is not None else pd.DataFrame()
         except Exception as e:
@@ -230,9 +246,13 @@ class GoldStockScreener:
     def get_dividend_info(self, stock_code):
         """获取股票分红信息"""
         try:
-            dividend_info = self.retry_request(
-                lambda: ak.stock_zh_a_dividend(symbol=stock_code),
-                max_retries=2
+            dividend_info = self.data_cache.get_or_fetch(
+                'stock_zh_a_dividend', stock_code,
+                lambda: self.retry_request(
+                    lambda: ak.stock_zh_a_dividend(symbol=stock_code),
+                    max_retries=2,
+                    endpoint='stock_zh_a_dividend'
+                )
             )
             return dividend_info if dividend_info is not None else pd.DataFrame()
         except Exception as e:
@@ -323,134 +343,132 @@ class GoldStockScreener:
         except:
             return 0, 0
 
-    def calculate_gold_stock_score(self, stock_code, stock_name, industry):
-        """计算黄金股票的综合评分 - 满足任一条件即可进入筛选池"""
+    def collect_gold_stock_features(self, stock_code, stock_name, industry):
+        """获取黄金股票的评分特征 - 满足任一条件即可进入筛选池（基本信息获取失败时抛出StockFetchError）"""
         print(f"正在分析黄金股票: {stock_code} - {stock_name} ({industry})")
         
         # 获取基本信息
         basic_info = self.get_stock_basic_info(stock_code)
         if not basic_info:
-            print(f"    跳过：无法获取基本信息")
-            return None
+            raise StockFetchError(f"无法获取 {stock_code} 基本信息")
         
         # 检查市值和股本条件
         shares_ok, market_cap_ok, total_shares, circulating_market_cap = self.check_market_cap_criteria(basic_info)
         
-        # 初始化评分详情
-        score_details = {
+        features = {
             '股票代码': stock_code,
             '股票名称': stock_name,
             '所属行业': industry,
-            '总股本(亿股)': round(total_shares, 2),
-            '流通市值(亿元)': round(circulating_market_cap, 2),
+            '总股本(亿股)': total_shares,
+            '流通市值(亿元)': circulating_market_cap,
             '当前价格': float(basic_info.get('最新', 0)),
-            '股本匹配分': 0,
-            '官方背书分': 0,
-            '增持动向分': 0,
-            '题材热度分': 0,
-            '分红预期分': 0,
-            '黄金行业分': 15,  # 黄金行业固定加分
-            '总分': 0,
-            '符合条件数': 0,
-            '进入筛选池': '是'  # 黄金行业股票都进入筛选池
+            '市值匹配': market_cap_ok
         }
         
         print(f"    总股本: {total_shares:.2f}亿股, 流通市值: {circulating_market_cap:.2f}亿元")
         
-        # 统计符合的条件数量
-        conditions_met = []
-        
-        # 1. 股本匹配评分 (25分)
+        # 1. 股本条件 (8-15亿股)
         if shares_ok:
-            if 8 <= total_shares <= 12:
-                score_details['股本匹配分'] = 25
-            elif 12 < total_shares <= 15:
-                score_details['股本匹配分'] = 20
-            conditions_met.append('股本匹配')
             print(f"    ✓ 股本符合条件 (8-15亿股)")
         else:
             print(f"    × 股本不符合条件 ({total_shares:.2f}亿股)")
         
-        # 2. 流通市值评分 (额外加分，不在原评分体系内)
+        # 2. 流通市值条件 (额外加分，不在原评分体系内)
         if market_cap_ok:
-            score_details['股本匹配分'] += 5  # 市值符合额外加5分
-            conditions_met.append('市值匹配')
             print(f"    ✓ 流通市值符合条件 (105-195亿元)")
         else:
             print(f"    × 流通市值不符合条件 ({circulating_market_cap:.2f}亿元)")
         
-        # 3. 获取股东信息并评分 (30分)
+        # 3. 股东信息
         holders_df = self.get_stock_holders(stock_code)
         has_official, official_list = self.check_official_capital(holders_df)
+        features['官方背书'] = has_official
         if has_official:
-            score_details['官方背书分'] = 30
-            conditions_met.append('官方背书')
             print(f"    ✓ 发现官方资本: {official_list[:2]}...")
         else:
             print(f"    × 未发现官方资本")
         
-        # 4. 获取公告信息
+        # 4. 公告信息：增持公告和题材关键词
         announcements_df = self.get_stock_announcements(stock_code)
         
-        # 检查增持公告 (20分)
         has_buyback, buyback_list = self.check_recent_buyback(announcements_df)
+        features['增持动向'] = has_buyback
         if has_buyback:
-            score_details['增持动向分'] = 20
-            conditions_met.append('增持动向')
             print(f"    ✓ 发现增持公告: {len(buyback_list)}条")
         else:
             print(f"    × 未发现增持公告")
         
-        # 检查关键词匹配 (15分)
         keyword_matches = self.check_keywords_in_announcements(announcements_df)
-        keyword_score = 0
-        matched_categories = []
-        for category, matches in keyword_matches.items():
-            if matches:
-                keyword_score += 3  # 每个类别3分，最多15分
-                matched_categories.append(category)
-        
-        score_details['题材热度分'] = min(keyword_score, 15)
+        matched_categories = [category for category, matches in keyword_matches.items() if matches]
+        features['题材类别数'] = len(matched_categories)
         if matched_categories:
-            conditions_met.append('题材热度')
             print(f"    ✓ 发现题材关键词: {matched_categories}")
         else:
             print(f"    × 未发现题材关键词")
         
-        # 5. 分红评分 (10分)
+        # 5. 分红信息
         dividend_df = self.get_dividend_info(stock_code)
-        dividend_score, avg_dividend_rate = self.calculate_dividend_score(dividend_df)
-        score_details['分红预期分'] = dividend_score
-        if dividend_score > 0:
-            conditions_met.append('分红预期')
+        _, avg_dividend_rate = self.calculate_dividend_score(dividend_df)
+        features['平均股息率'] = avg_dividend_rate
+        if avg_dividend_rate > 0:
             print(f"    ✓ 平均股息率: {avg_dividend_rate:.2%}")
         else:
             print(f"    × 无分红数据或股息率较低")
         
-        # 黄金行业本身就是一个条件
-        conditions_met.append('黄金行业')
+        return features
+    
+    def score_gold_features(self, features_df):
+        """
+        向量化计算黄金股票评分
         
-        # 记录符合条件数
-        score_details['符合条件数'] = len(conditions_met)
+        参数:
+            features_df: collect_gold_stock_features结果组成的DataFrame
+            
+        返回:
+            DataFrame: 评分结果（列与原逐只评分结果一致）
+        """
+        scored = score_candidates(features_df, GOLD_SCORE_RULES)
+        
+        # 符合条件数：股本、市值、官方背书、增持、题材、分红，加上黄金行业本身
+        conditions = pd.DataFrame({
+            '股本匹配': scored['总股本(亿股)'].between(8, 15),
+            '市值匹配': scored['市值匹配'].astype(bool),
+            '官方背书': scored['官方背书分'] > 0,
+            '增持动向': scored['增持动向分'] > 0,
+            '题材热度': scored['题材热度分'] > 0,
+            '分红预期': scored['分红预期分'] > 0
+        })
+        scored['符合条件数'] = conditions.sum(axis=1) + 1
+        scored['进入筛选池'] = '是'  # 黄金行业股票都进入筛选池
+        
+        scored[['总股本(亿股)', '流通市值(亿元)']] = scored[['总股本(亿股)', '流通市值(亿元)']].round(2)
+        
+        return scored[GOLD_RESULT_COLUMNS]
+    
+    def calculate_gold_stock_score(self, stock_code, stock_name, industry):
+        """计算黄金股票的综合评分 - 满足任一条件即可进入筛选池"""
+        try:
+            features = self.collect_gold_stock_features(stock_code, stock_name, industry)
+        except StockFetchError as e:
+            print(f"    {e}")
+            return None
+        if features is None:
+            return None
         
-        # 计算总分
-        score_details['总分'] = (score_details['股本匹配分'] + 
-                               score_details['官方背书分'] + 
-                               score_details['增持动向分'] + 
-                               score_details['题材热度分'] + 
-                               score_details['分红预期分'] + 
-                               score_details['黄金行业分'])
+        score_details = self.score_gold_features(pd.DataFrame([features])).iloc[0].to_dict()
         
-        print(f"    符合条件: {', '.join(conditions_met)}")
+        print(f"    符合条件数: {score_details['符合条件数']}")
         print(f"    综合评分: {score_details['总分']}分")
         
-        # 添加延时
-        time.sleep(1)
-        
         return score_details
     
-    def screen_gold_stocks(self):
-        """筛选黄金股票并评分"""
+    def screen_gold_stocks(self, resume=False):
+        """
+        筛选黄金股票并评分
+        
+        参数:
+            resume: 是否断点续跑（跳过今天检查点中已完成的股票）
+        """
         print("开始筛选黄金行业股票...")
         print("筛选条件: 黄金行业 + 股本/市值/官方资本等综合评分")
         print("=" * 60)
@@ -463,31 +481,30 @@ class GoldStockScreener:
         
         print(f"\n找到 {len(gold_stocks)} 只黄金相关股票，开始详细分析...\n")
         
-        results = []
+        # 批量预取基本面数据，替代逐只查询
+        code_column = '代码' if '代码' in gold_stocks.columns else 'code'
+        self.fundamentals.get_fundamentals(gold_stocks[code_column])
         
-        for idx, row in gold_stocks.iterrows():
-            # 检查列名并获取股票代码和名称
-            if '代码' in gold_stocks.columns:
-                stock_code = row['代码']
-                stock_name = row['名称']
-            else:
-                stock_code = row['code']
-                stock_name = row['name']
-            industry = row.get('行业', '黄金相关')
-            
-            try:
-                score_result = self.calculate_gold_stock_score(stock_code, stock_name, industry)
-                if score_result:
-                    results.append(score_result)
-                    
-                print(f"    已完成分析 ({idx + 1}/{len(gold_stocks)})\n")
-                    
-            except Exception as e:
-                print(f"    处理股票 {stock_code} 时出错: {e}\n")
-                continue
+        # 检查列名并获取股票代码和名称
+        name_column = '名称' if '代码' in gold_stocks.columns else 'name'
+        stocks = [
+            (row[code_column], row[name_column], row.get('行业', '黄金相关'))
+            for _, row in gold_stocks.iterrows()
+        ]
         
-        if results:
-            results_df = pd.DataFrame(results)
+        # 并发获取各股票特征（按接口限流，结果顺序与输入一致），每只完成后写入检查点
+        checkpoint = ScreenCheckpoint('gold_stock_screener')
+        try:
+            features_list = checkpoint.map(self.fetcher, self.collect_gold_stock_features, stocks, resume=resume)
+        finally:
+            # 丢弃排队中的缓存后台刷新，避免进程退出时等待
+            self.data_cache.close()
+        features_list = [features for features in features_list if features]
+        print(self.data_cache.summary())
+        
+        if features_list:
+            # 所有候选股票一次性向量化评分
+            results_df = self.score_gold_features(pd.DataFrame(features_list))
             # 按总分排序
             results_df = results_df.sort_values('总分', ascending=False)
             return results_df
@@ -592,8 +609,11 @@ def main():
     # 创建筛选器实例
     screener = GoldStockScreener()
     
+    # --resume: 跳过今天已完成的股票（失败或超时后重跑）
+    resume = '--resume' in sys.argv
+    
     # 开始筛选
-    results = screener.screen_gold_stocks()
+    results = screener.screen_gold_stocks(resume=resume)
     
     if not results.empty:
         # 打印摘要
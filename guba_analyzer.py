@@ -8,18 +8,70 @@
 import akshare as ak
 import pandas as pd
 import numpy as np
+import inspect
 import re
+import threading
+import time
 import warnings
 from datetime import datetime
+from functools import lru_cache
+
+from fetch_executor import get_fetch_executor
+from guba_watermark import get_guba_watermark_store, post_ids
 
 warnings.filterwarnings('ignore')
 
 
+# 置顶帖标题（如"置顶：股吧用户公约"、"【置顶】..."），不参与增量判断
+PINNED_PATTERN = re.compile(r'\s*[\[【(（]?置顶')
+
+
+@lru_cache(maxsize=32)
+def _compile_alternation(phrases, flags=0):
+    """
+    把短语列表编译成一个交替正则（长短语在前，同一位置优先匹配较长的短语）
+    
+    参数:
+        phrases: 短语元组
+        flags: 正则标志
+    
+    返回:
+        re.Pattern: 短语为空时返回None
+    """
+    phrases = sorted(set(phrase for phrase in phrases if phrase), key=len, reverse=True)
+    if not phrases:
+        return None
+    return re.compile('|'.join(re.escape(phrase) for phrase in phrases), flags)
+
+
+def _text_column(posts_df, name):
+    """取文本列（与逐行 str(row.get(name, '')) 一致：缺列为空串，缺失值为'nan'）"""
+    if name not in posts_df.columns:
+        return pd.Series('', index=posts_df.index)
+    return posts_df[name].map(str).astype(object)
+
+
 class GubaAnalyzer:
     """股吧帖子分析器"""
     
-    def __init__(self):
-        """初始化分析器"""
+    def __init__(self, watermark_store=None, fetch_executor=None):
+        """
+        初始化分析器
+        
+        参数:
+            watermark_store: 增量抓取的高水位存储（GubaWatermarkStore），默认使用共享存储
+            fetch_executor: 个股股吧请求的并发限流执行器（FetchExecutor），默认使用共享执行器
+        """
+        # 最近一次筛选各阶段的行数和耗时
+        self.filter_stats = []
+        
+        self.watermark_store = watermark_store
+        self.fetch_executor = fetch_executor
+        
+        # 已抓取、等待commit_watermarks()推进高水位的帖子 {股票代码: DataFrame}
+        self._pending_watermarks = {}
+        self._pending_lock = threading.Lock()
+        
         # 广告和垃圾内容关键词
         self.spam_keywords = [
             '加微信', '加V', '加vx', '带盘', '荐股', '老师', '群',
@@ -34,7 +86,7 @@ class GubaAnalyzer:
             '呵呵', '涨涨涨', '跌跌跌', '完了', '凉了'
         ]
     
-    def get_guba_trends(self, stock_code=None, symbol='全部', max_pages=5):
+    def get_guba_trends(self, stock_code=None, symbol='全部', max_pages=5, incremental=True, watchlist=None):
         """
         获取股吧帖子并进行筛选
         
@@ -42,6 +94,8 @@ class GubaAnalyzer:
             stock_code: 股票代码（可选，如 '600519'）
             symbol: 股吧类型，默认'全部'，可选'沪深'、'港股'等
             max_pages: 最多抓取页数
+            incremental: 个股股吧是否只抓取上次之后的新帖子（处理完结果后调用commit_watermarks()推进高水位）
+            watchlist: 自选股代码列表（可选），并发抓取所有个股股吧，优先于stock_code
             
         返回:
             DataFrame: 包含筛选后的帖子信息
@@ -49,9 +103,12 @@ class GubaAnalyzer:
         print(f"开始抓取股吧帖子...")
         
         try:
-            if stock_code:
+            if watchlist:
+                # 并发获取自选股的股吧帖子
+                posts_df = self.get_watchlist_posts(watchlist, max_pages, incremental)
+            elif stock_code:
                 # 获取特定股票的股吧帖子
-                posts_df = self._get_stock_guba_posts(stock_code, max_pages)
+                posts_df = self._get_stock_guba_posts(stock_code, max_pages, incremental)
             else:
                 # 获取股吧广场的热门帖子
                 posts_df = self._get_guba_hot_posts(symbol, max_pages)
@@ -74,40 +131,175 @@ class GubaAnalyzer:
             print("可能的原因: 网络问题、接口变更或访问限制")
             return pd.DataFrame()
     
-    def _get_stock_guba_posts(self, stock_code, max_pages=5):
-        """获取特定股票的股吧帖子"""
+    def _get_stock_guba_posts(self, stock_code, max_pages=5, incremental=True):
+        """
+        获取特定股票的股吧帖子（增量抓取）
+        
+        逐页抓取，跳过上次已抓取过的帖子（帖子ID已记录，或发布时间早于高水位；与高水位同一分钟的
+        帖子按ID判断），本页最后一条帖子已抓取过时停止翻页；置顶帖不参与判断也不返回。
+        同一次抓取中重复出现的帖子只保留一条
+        
+        高水位不会在抓取时推进：调用方处理完返回的帖子后调用commit_watermarks()，
+        处理失败时这些帖子下次仍会被抓取
+        
+        参数:
+            stock_code: 股票代码
+            max_pages: 最多抓取页数
+            incremental: False时不读取也不记录高水位（仍按帖子ID去重）
+        
+        返回:
+            DataFrame: 新帖子（标准化格式），含股票代码列和所属股吧列
+        """
         try:
             print(f"正在获取股票 {stock_code} 的股吧帖子...")
             
-            # 使用akshare获取股吧帖子
+            latest_time, known_ids = None, set()
+            if incremental:
+                latest_time, known_ids = self._get_watermark_store().get(stock_code)
+            
             posts_list = []
+            seen_ids = set(known_ids)
             
             for page in range(1, max_pages + 1):
                 try:
-                    # 获取股吧帖子列表
-                    posts = ak.stock_guba_sina(symbol=stock_code)
-                    
-                    if not posts.empty:
-                        posts['页码'] = page
-                        posts_list.append(posts)
-                        print(f"  第 {page} 页: {len(posts)} 条帖子")
-                    else:
-                        break
-                        
+                    posts, paginated = self._fetch_guba_page(stock_code, page)
                 except Exception as e:
                     print(f"  第 {page} 页获取失败: {e}")
                     break
+                
+                if posts is None or posts.empty:
+                    break
+                
+                # 所属股吧只由个股股吧抓取设置，情报分析在正文未提及股票时以其作为标的
+                posts = self._normalize_posts_format(posts).assign(股票代码=stock_code, 所属股吧=stock_code)
+                posts = posts[~_text_column(posts, '标题').str.match(PINNED_PATTERN).to_numpy()]
+                if posts.empty:
+                    if not paginated:
+                        break
+                    continue
+                
+                ids = post_ids(posts)
+                times = pd.to_datetime(posts['发布时间'], errors='coerce')
+                
+                # 上次已抓取过的帖子：ID已记录，或早于高水位（同一分钟内可能有新帖子，只按ID判断）
+                known = [
+                    post_id in known_ids or (latest_time is not None and pd.notna(post_time) and post_time < latest_time)
+                    for post_id, post_time in zip(ids, times)
+                ]
+                fresh = [not is_known and post_id not in seen_ids for is_known, post_id in zip(known, ids)]
+                seen_ids.update(ids)
+                
+                new_posts = posts[fresh]
+                if not new_posts.empty:
+                    posts_list.append(new_posts)
+                print(f"  第 {page} 页: {len(posts)} 条帖子，其中新帖子 {len(new_posts)} 条")
+                
+                # 帖子从新到旧排列：本页最后一条已抓取过，后面的页都是旧帖子
+                if known[-1]:
+                    print("  遇到已抓取过的帖子，停止翻页")
+                    break
+                if new_posts.empty:
+                    print("  本页帖子均已获取，停止翻页")
+                    break
+                if not paginated:
+                    break
             
-            if posts_list:
-                all_posts = pd.concat(posts_list, ignore_index=True)
-                return self._normalize_posts_format(all_posts)
-            else:
+            if not posts_list:
+                print("  没有新帖子")
                 return pd.DataFrame()
+            
+            all_posts = pd.concat(posts_list, ignore_index=True)
+            if incremental:
+                with self._pending_lock:
+                    self._pending_watermarks[stock_code] = all_posts
+            return all_posts
                 
         except Exception as e:
             print(f"获取股票股吧失败: {e}")
             return pd.DataFrame()
     
+    def _get_watermark_store(self):
+        return self.watermark_store or get_guba_watermark_store()
+    
+    def commit_watermarks(self, stock_codes=None):
+        """
+        推进增量抓取的高水位（在抓取到的帖子处理完成后调用）
+        
+        参数:
+            stock_codes: 要推进的股票代码列表，None表示所有已抓取但未推进的股票
+        
+        返回:
+            int: 推进了高水位的股票数
+        """
+        with self._pending_lock:
+            codes = list(self._pending_watermarks) if stock_codes is None else [str(code) for code in stock_codes]
+            pending = [(code, self._pending_watermarks.pop(code)) for code in codes if code in self._pending_watermarks]
+        
+        store = self._get_watermark_store()
+        for code, posts in pending:
+            store.update(code, posts)
+        
+        return len(pending)
+    
+    def get_watchlist_posts(self, watchlist, max_pages=5, incremental=True, on_posts=None):
+        """
+        并发抓取自选股的股吧帖子，合并为一个去重后的DataFrame
+        
+        所有请求经共享执行器的 stock_guba_sina 令牌桶限流（FETCH_CONFIG['rate_limits']），
+        并发数由 FETCH_CONFIG['max_workers'] 控制；结果可直接交给 IntelligenceAnalyzer.analyze_intelligence
+        
+        参数:
+            watchlist: 股票代码列表
+            max_pages: 每只股票最多抓取页数
+            incremental: 是否只抓取上次之后的新帖子（处理完结果后调用commit_watermarks()推进高水位）
+            on_posts: 回调 on_posts(股票代码, 新帖子DataFrame)，每只股票抓取完成时立即调用
+        
+        返回:
+            DataFrame: 标准化格式的帖子（按自选股顺序，同一帖子只保留一条），含股票代码列和所属股吧列
+        """
+        codes = list(dict.fromkeys(str(code).strip().zfill(6) for code in watchlist if str(code).strip()))
+        if not codes:
+            return pd.DataFrame()
+        
+        print(f"开始并发抓取 {len(codes)} 只自选股的股吧帖子...")
+        
+        def fetch_one(code):
+            posts = self._get_stock_guba_posts(code, max_pages, incremental)
+            if on_posts is not None and not posts.empty:
+                on_posts(code, posts)
+            return posts
+        
+        results = (self.fetch_executor or get_fetch_executor()).map(fetch_one, codes)
+        frames = [posts for posts in results if posts is not None and not posts.empty]
+        
+        if not frames:
+            return pd.DataFrame()
+        
+        all_posts = pd.concat(frames, ignore_index=True)
+        is_duplicate = pd.Series(post_ids(all_posts)).duplicated().to_numpy()
+        all_posts = all_posts[~is_duplicate].reset_index(drop=True)
+        
+        with_posts = sum(1 for posts in results if posts is not None and not posts.empty)
+        print(f"✓ {with_posts}/{len(codes)} 只股票有新帖子，共 {len(all_posts)} 条（去除重复 {int(is_duplicate.sum())} 条）")
+        
+        return all_posts
+    
+    def _fetch_guba_page(self, stock_code, page):
+        """
+        获取一页个股股吧帖子（经并发执行器限流和重试）
+        
+        返回:
+            tuple: (原始DataFrame, 接口是否支持翻页)；不支持翻页时只能获取第一页
+        """
+        fetch = getattr(ak, 'stock_guba_sina', None)
+        if fetch is None:
+            raise AttributeError("当前akshare版本没有stock_guba_sina接口")
+        
+        fetcher = self.fetch_executor or get_fetch_executor()
+        if 'page' in inspect.signature(fetch).parameters:
+            return fetcher.call('stock_guba_sina', lambda: fetch(symbol=stock_code, page=page)), True
+        return fetcher.call('stock_guba_sina', lambda: fetch(symbol=stock_code)), False
+    
     def _get_guba_hot_posts(self, symbol='全部', max_pages=5):
         """获取股吧广场热门帖子"""
         try:
@@ -254,26 +446,33 @@ class GubaAnalyzer:
             return posts_df
     
     def _apply_filters(self, posts_df):
-        """应用筛选规则"""
-        if posts_df.empty:
-            return posts_df
-        
-        original_count = len(posts_df)
+        """
+        应用筛选规则：长度 → 互动 → 垃圾内容 → 质量评分，各阶段均为列式运算
         
-        # 规则A: 长度筛选（正文大于15个字）
-        posts_df = self._filter_by_length(posts_df)
-        print(f"  规则A(长度筛选): {original_count} -> {len(posts_df)} 条")
+        每个阶段的行数和耗时打印出来，并记录在 self.filter_stats 中
+        """
+        self.filter_stats = []
         
-        # 规则B: 互动筛选（阅读量前30%或评论数>5）
-        posts_df = self._filter_by_engagement(posts_df)
-        print(f"  规则B(互动筛选): 保留 {len(posts_df)} 条")
+        if posts_df.empty:
+            return posts_df
         
-        # 规则C: 排除垃圾内容
-        posts_df = self._filter_spam_content(posts_df)
-        print(f"  规则C(排除垃圾): 保留 {len(posts_df)} 条")
+        stages = [
+            ('规则A(长度筛选)', self._filter_by_length),       # 正文大于10个字
+            ('规则B(互动筛选)', self._filter_by_engagement),   # 阅读量前30%或评论数>5
+            ('规则C(排除垃圾)', self._filter_spam_content),
+            ('质量评分', self._calculate_quality_score)
+        ]
         
-        # 添加质量评分
-        posts_df = self._calculate_quality_score(posts_df)
+        for name, stage in stages:
+            rows_in = len(posts_df)
+            start = time.perf_counter()
+            posts_df = posts_df.pipe(stage)
+            elapsed = time.perf_counter() - start
+            
+            self.filter_stats.append({
+                '阶段': name, '输入': rows_in, '输出': len(posts_df), '耗时(秒)': round(elapsed, 4)
+            })
+            print(f"  {name}: {rows_in} -> {len(posts_df)} 条 ({elapsed * 1000:.1f}ms)")
         
         # 按质量评分排序
         posts_df = posts_df.sort_values('质量评分', ascending=False)
@@ -281,26 +480,22 @@ class GubaAnalyzer:
         return posts_df.reset_index(drop=True)
     
     def _filter_by_length(self, posts_df):
-        """规则A: 长度筛选"""
-        def get_content_length(row):
-            content = str(row.get('内容', ''))
-            title = str(row.get('标题', ''))
-            
-            # 如果内容为空或无效，使用标题
-            if not content or content == 'nan' or len(content.strip()) == 0:
-                full_text = title
-            else:
-                full_text = content
-            
-            # 移除短语后计算长度
-            for phrase in self.low_quality_phrases:
-                full_text = full_text.replace(phrase, '')
-            
-            return len(full_text.strip())
+        """规则A: 长度筛选（去除低质量短语后的正文长度，正文为空时使用标题）"""
+        content = _text_column(posts_df, '内容')
+        title = _text_column(posts_df, '标题')
+        
+        # 如果内容为空或无效，使用标题
+        use_title = (content == 'nan') | (content.str.strip() == '')
+        full_text = content.mask(use_title, title)
         
-        posts_df['内容长度'] = posts_df.apply(get_content_length, axis=1)
+        # 一次正则替换移除全部短语后计算长度
+        pattern = _compile_alternation(tuple(self.low_quality_phrases))
+        if pattern is not None:
+            full_text = full_text.str.replace(pattern, '', regex=True)
+        
+        posts_df = posts_df.assign(内容长度=full_text.str.strip().str.len())
         # 对于新闻类数据，降低长度要求到10个字
-        return posts_df[posts_df['内容长度'] > 10].copy()
+        return posts_df[posts_df['内容长度'] > 10]
     
     def _filter_by_engagement(self, posts_df):
         """规则B: 互动筛选"""
@@ -318,36 +513,26 @@ class GubaAnalyzer:
         # 筛选条件: 阅读量前30% 或 评论数>5
         mask = (posts_df['阅读量'] >= read_threshold) | (posts_df['评论数'] > 5)
         
-        return posts_df[mask].copy()
+        return posts_df[mask]
     
     def _filter_spam_content(self, posts_df):
-        """规则C: 排除垃圾内容"""
+        """规则C: 排除垃圾内容（标题或正文包含垃圾关键词，不区分大小写）"""
         if len(posts_df) == 0:
             return posts_df
-            
-        def is_spam(row):
-            content = str(row.get('内容', ''))
-            title = str(row.get('标题', ''))
-            full_text = (title + ' ' + content).lower()
-            
-            # 检查是否包含垃圾关键词
-            for keyword in self.spam_keywords:
-                if keyword in full_text:
-                    return True
-            
-            return False
         
-        posts_df['是否垃圾'] = posts_df.apply(is_spam, axis=1)
-        filtered_df = posts_df[~posts_df['是否垃圾']].copy()
-        if '是否垃圾' in filtered_df.columns:
-            filtered_df = filtered_df.drop('是否垃圾', axis=1)
-        return filtered_df
+        pattern = _compile_alternation(tuple(self.spam_keywords), re.IGNORECASE)
+        if pattern is None:
+            return posts_df
+        
+        full_text = _text_column(posts_df, '标题') + ' ' + _text_column(posts_df, '内容')
+        is_spam = full_text.str.contains(pattern, regex=True)
+        
+        return posts_df[~is_spam]
     
     def _calculate_quality_score(self, posts_df):
         """计算帖子质量评分"""
         if len(posts_df) == 0:
-            posts_df['质量评分'] = 0
-            return posts_df
+            return posts_df.assign(质量评分=0)
         
         # 标准化各项指标
         max_read = posts_df['阅读量'].max() if posts_df['阅读量'].max() > 0 else 1
@@ -355,13 +540,11 @@ class GubaAnalyzer:
         max_length = posts_df['内容长度'].max() if posts_df['内容长度'].max() > 0 else 1
         
         # 计算综合评分 (阅读量40% + 评论数40% + 内容长度20%)
-        posts_df['质量评分'] = (
+        return posts_df.assign(质量评分=(
             (posts_df['阅读量'] / max_read) * 40 +
             (posts_df['评论数'] / max_comment) * 40 +
             (posts_df['内容长度'] / max_length) * 20
-        )
-        
-        return posts_df
+        ))
     
     def get_filtered_posts_summary(self, posts_df):
         """生成筛选后的帖子摘要"""
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股吧帖子增量抓取的高水位记录
+按股票记录已抓取帖子的最新发布时间和最近若干条帖子ID，
+下次抓取时按帖子ID识别已抓取的帖子（早于最新发布时间的帖子也视为已抓取；发布时间只精确到分钟，
+同一分钟的帖子按ID判断），只保留新帖子，重复运行不会产生重复行。
+高水位由GubaAnalyzer.commit_watermarks()在帖子处理完成后推进
+
+存储（SQLite）:
+    watermarks: 股票代码 → 最新发布时间、最近帖子ID列表、更新时间
+
+用法:
+    store = get_guba_watermark_store()
+    latest_time, known_ids = store.get('600547')
+    store.update('600547', new_posts_df)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from market_snapshot import load_cache_config
+
+
+def make_guba_post_id(link, title, publish_time):
+    """
+    帖子ID：有链接时使用链接，否则使用 标题 + 发布时间 的哈希
+    
+    参数:
+        link: 帖子链接
+        title: 标题
+        publish_time: 发布时间
+    
+    返回:
+        str: 帖子ID
+    """
+    link = '' if pd.isna(link) else str(link).strip()
+    if link:
+        return link
+    return hashlib.sha1(f"{title}\n{publish_time}".encode('utf-8')).hexdigest()[:16]
+
+
+def post_ids(posts_df):
+    """标准化后帖子的ID列表（与行顺序一致）"""
+    return [
+        make_guba_post_id(link, title, publish_time)
+        for link, title, publish_time in zip(posts_df['帖子链接'], posts_df['标题'], posts_df['发布时间'])
+    ]
+
+
+class GubaWatermarkStore:
+    """按股票记录的增量抓取高水位"""
+    
+    def __init__(self, db_path=None, max_known_ids=500):
+        """
+        初始化存储
+        
+        参数:
+            db_path: SQLite文件路径，默认为缓存目录下的guba_watermarks.db
+            max_known_ids: 每只股票保留的最近帖子ID数
+        """
+        cache_config = load_cache_config()
+        
+        self.db_path = db_path or os.path.join(cache_config['cache_dir'], 'guba_watermarks.db')
+        self.max_known_ids = max_known_ids
+        
+        self._lock = threading.Lock()
+        self._init_db()
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _init_db(self):
+        """创建高水位表"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " stock_code TEXT PRIMARY KEY,"
+                " latest_time TEXT,"
+                " post_ids TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+    
+    def _read(self, stock_code):
+        """读取 (最新发布时间, 最近帖子ID列表)，从新到旧"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT latest_time, post_ids FROM watermarks WHERE stock_code = ?", (str(stock_code),)
+                ).fetchone()
+        except Exception as e:
+            print(f"⚠️  读取增量抓取记录失败: {e}")
+            row = None
+        
+        if not row:
+            return None, []
+        
+        return (pd.Timestamp(row[0]) if row[0] else None), json.loads(row[1])
+    
+    def get(self, stock_code):
+        """
+        读取高水位
+        
+        参数:
+            stock_code: 股票代码
+        
+        返回:
+            tuple: (最新发布时间 pd.Timestamp 或 None, 最近帖子ID集合)
+        """
+        latest_time, known_ids = self._read(stock_code)
+        return latest_time, set(known_ids)
+    
+    def update(self, stock_code, posts_df):
+        """
+        用新抓取的帖子推进高水位
+        
+        参数:
+            stock_code: 股票代码
+            posts_df: 新帖子（标准化格式，按新到旧排列）
+        """
+        if posts_df.empty:
+            return
+        
+        newest = pd.to_datetime(posts_df['发布时间'], errors='coerce').max()
+        
+        with self._lock:
+            latest_time, known_ids = self._read(stock_code)
+            
+            # 新ID在前，保留最近的max_known_ids条
+            merged_ids = list(dict.fromkeys(post_ids(posts_df) + known_ids))[:self.max_known_ids]
+            if pd.notna(newest) and (latest_time is None or newest > latest_time):
+                latest_time = newest
+            
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO watermarks (stock_code, latest_time, post_ids, updated_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (str(stock_code), latest_time.isoformat() if latest_time is not None else None,
+                         json.dumps(merged_ids, ensure_ascii=False), time.time())
+                    )
+            except Exception as e:
+                print(f"⚠️  保存增量抓取记录失败: {e}")
+    
+    def reset(self, stock_code=None):
+        """清除某只股票（默认全部）的高水位，下次重新全量抓取"""
+        with self._lock, self._connect() as conn:
+            if stock_code is None:
+                conn.execute("DELETE FROM watermarks")
+            else:
+                conn.execute("DELETE FROM watermarks WHERE stock_code = ?", (str(stock_code),))
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_guba_watermark_store():
+    """
+    获取进程内共享的高水位存储
+    
+    返回:
+        GubaWatermarkStore
+    """
+    global _shared_store
+    
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = GubaWatermarkStore()
+        return _shared_store
@@ -8,19 +8,62 @@
 import pandas as pd
 import numpy as np
 import re
+import math
+import multiprocessing
+import os
 import warnings
 from datetime import datetime
 
+from intelligence_rules import RuleEngine
+from stock_names import get_stock_name_dictionary
+
 warnings.filterwarnings('ignore')
 
 
+# 默认配置（可在config.py的INTELLIGENCE_CONFIG中覆盖）
+DEFAULT_INTELLIGENCE_CONFIG = {
+    'workers': 0,                 # 并行分析的进程数，0表示CPU核数，1表示只用当前进程
+    'parallel_min_posts': 5000,   # 帖子数少于该值时不启用多进程
+    'shards_per_worker': 4        # 每个进程分到的分片数（分片越多负载越均衡）
+}
+
+# fork出的子进程从这里读取分析器和帖子列（写时复制共享，不经过pickle）
+_worker_state = {}
+
+
+def load_intelligence_config():
+    """读取情报分析配置，config.py中的INTELLIGENCE_CONFIG覆盖默认值"""
+    intelligence_config = dict(DEFAULT_INTELLIGENCE_CONFIG)
+    
+    try:
+        from config import INTELLIGENCE_CONFIG
+        intelligence_config.update(INTELLIGENCE_CONFIG)
+    except ImportError:
+        pass
+    
+    return intelligence_config
+
+
+def _analyze_shard(bounds):
+    """子进程：分析 [start, end) 范围内的帖子"""
+    start, end = bounds
+    analyzer = _worker_state['analyzer']
+    columns = _worker_state['columns']
+    return analyzer._analyze_rows(*(column[start:end] for column in columns))
+
+
 class IntelligenceAnalyzer:
     """股吧情报分析器"""
     
-    def __init__(self):
-        """初始化分析器"""
+    def __init__(self, stock_dictionary=None):
+        """
+        初始化分析器
         
-        # 股票代码和简称映射（常见股票）
+        参数:
+            stock_dictionary: 股票简称字典（StockNameDictionary），默认使用全市场简称字典
+        """
+        
+        # 股票代码和简称映射（常见股票，全市场简称获取失败时仍可识别）
         self.stock_mapping = {
             # 黄金股
             '山东黄金': '600547', '中金黄金': '600489', '紫金矿业': '601899',
@@ -89,12 +132,41 @@ class IntelligenceAnalyzer:
             '看涨', '看跌', '涨涨涨', '跌跌跌', '冲冲冲'
         ]
         
-    def analyze_intelligence(self, posts_df):
+        # 专业术语（价值评估加分）
+        self.professional_terms = ['突破', '支撑', '压力', '主力', '机构', '业绩', '公告',
+                                   '政策', '行业', '龙头', '资金流入', '净流入']
+        
+        # 编译后的规则引擎（首次使用时构建，关键词修改后置为None即可重新编译）
+        self.stock_dictionary = stock_dictionary
+        self._rule_engine = None
+        
+        # 多进程并行分析配置
+        self.intelligence_config = load_intelligence_config()
+        
+    def _get_rule_engine(self):
+        """获取编译后的规则引擎"""
+        if self._rule_engine is None:
+            stock_dictionary = self.stock_dictionary
+            if stock_dictionary is None:
+                stock_dictionary = get_stock_name_dictionary()
+            self._rule_engine = RuleEngine(
+                self.noise_keywords,
+                stock_dictionary.merged(self.stock_mapping),
+                [('技术派', self.technical_keywords),
+                 ('筹码派', self.chip_keywords),
+                 ('基本面', self.fundamental_keywords)],
+                self.professional_terms
+            )
+        return self._rule_engine
+    
+    def analyze_intelligence(self, posts_df, workers=None):
         """
         分析股吧帖子，提取有价值的投资情报
         
         参数:
-            posts_df: 包含帖子信息的DataFrame
+            posts_df: 包含帖子信息的DataFrame；个股股吧抓取结果的所属股吧列在正文未提及股票时作为标的
+                      （股票代码列可能来自新闻关键词等，不作为标的）
+            workers: 并行分析的进程数，默认读取配置（0表示CPU核数，1表示串行）
             
         返回:
             DataFrame: 包含分析结果的情报列表
@@ -105,32 +177,115 @@ class IntelligenceAnalyzer:
         
         print(f"开始分析 {len(posts_df)} 条帖子...")
         
+        # 按列取值，避免iterrows逐行构造Series
+        def column(name):
+            if name in posts_df.columns:
+                return posts_df[name].tolist()
+            return [''] * len(posts_df)
+        
+        columns = [column('标题'), column('内容'), column('帖子链接'), column('发布时间'), column('所属股吧')]
+        
+        if workers is None:
+            workers = self.intelligence_config['workers']
+        workers = min(workers or os.cpu_count() or 1, len(posts_df))
+        
+        if workers > 1 and len(posts_df) >= self.intelligence_config['parallel_min_posts']:
+            intelligence_list = self._analyze_parallel(columns, workers)
+        else:
+            intelligence_list = self._analyze_rows(*columns)
+        
+        if intelligence_list:
+            result_df = pd.DataFrame(intelligence_list)
+            # 按价值评分排序
+            result_df = result_df.sort_values('价值评分', ascending=False)
+            print(f"✓ 筛选出 {len(result_df)} 条有价值的情报")
+            return result_df.reset_index(drop=True)
+        else:
+            print("× 未找到有价值的情报")
+            return pd.DataFrame()
+    
+    def _analyze_parallel(self, columns, workers):
+        """
+        多进程分析：按顺序切分帖子，各分片结果按原顺序拼接，与串行结果一致
+        
+        子进程由fork创建，编译好的规则引擎和帖子列写时复制共享；
+        不支持fork的平台（如Windows）或进程池出错时退回串行
+        
+        参数:
+            columns: [标题列表, 内容列表, 链接列表, 发布时间列表, 所属股吧代码列表]
+            workers: 进程数
+        
+        返回:
+            list: 情报记录
+        """
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            print("⚠️  当前平台不支持fork，使用单进程分析")
+            return self._analyze_rows(*columns)
+        
+        # 在父进程中编译好规则引擎，子进程直接复用
+        self._get_rule_engine()
+        
+        total = len(columns[0])
+        shard_size = math.ceil(total / (workers * self.intelligence_config['shards_per_worker']))
+        bounds = [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+        
+        print(f"  使用 {workers} 个进程并行分析（{len(bounds)} 个分片）")
+        
+        _worker_state['analyzer'] = self
+        _worker_state['columns'] = columns
+        try:
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                shard_results = pool.map(_analyze_shard, bounds)
+        except Exception as e:
+            print(f"⚠️  多进程分析失败，使用单进程分析: {e}")
+            return self._analyze_rows(*columns)
+        finally:
+            _worker_state.clear()
+        
+        return [intelligence for shard in shard_results for intelligence in shard]
+    
+    def _analyze_rows(self, titles, contents, links, publish_times, board_codes):
+        """
+        逐条分析帖子（串行路径和每个子进程共用）
+        
+        参数:
+            titles, contents, links, publish_times: 等长的列值列表
+            board_codes: 帖子所属个股股吧的代码（个股股吧抓取结果的所属股吧列），文中未提及股票时作为标的
+        
+        返回:
+            list: 情报记录（保持输入顺序）
+        """
         intelligence_list = []
+        engine = self._get_rule_engine()
         
-        for idx, row in posts_df.iterrows():
-            title = str(row.get('标题', ''))
-            content = str(row.get('内容', ''))
+        rows = zip(titles, contents, links, publish_times, board_codes)
+        for title, content, link, publish_time, board_code in rows:
+            title = str(title)
+            content = str(content)
             full_text = title + ' ' + content
             
+            # 每条帖子只扫描一遍，后续步骤都从命中集合推导
+            hits = engine.scan(full_text)
+            
             # 1. 剔除散户噪音
-            if self._is_noise(full_text):
+            if self._is_noise(full_text, hits):
                 continue
             
             # 2. 识别股票标的
-            stocks = self._identify_stocks(full_text)
+            stocks = self._identify_stocks(full_text, hits) or self._board_stock(board_code)
             if not stocks:
                 continue
             
             # 3. 分类逻辑
-            categories = self._classify_post(full_text)
+            categories = self._classify_post(full_text, hits)
             if not categories:
                 continue
             
             # 4. 提取关键论据
-            evidence = self._extract_evidence(full_text, categories)
+            evidence = self._extract_evidence(full_text, categories, hits)
             
             # 5. 价值评估
-            score = self._evaluate_value(full_text, categories, evidence)
+            score = self._evaluate_value(full_text, categories, evidence, hits)
             
             # 构建情报记录
             intelligence = {
@@ -140,29 +295,23 @@ class IntelligenceAnalyzer:
                 '次要分类': categories[1] if len(categories) > 1 else '',
                 '关键论据': evidence,
                 '价值评分': score,
-                '原文链接': row.get('帖子链接', ''),
-                '发布时间': row.get('发布时间', ''),
+                '原文链接': link,
+                '发布时间': publish_time,
                 '原始内容': content[:200] + '...' if len(content) > 200 else content
             }
             
             intelligence_list.append(intelligence)
         
-        if intelligence_list:
-            result_df = pd.DataFrame(intelligence_list)
-            # 按价值评分排序
-            result_df = result_df.sort_values('价值评分', ascending=False)
-            print(f"✓ 筛选出 {len(result_df)} 条有价值的情报")
-            return result_df.reset_index(drop=True)
-        else:
-            print("× 未找到有价值的情报")
-            return pd.DataFrame()
+        return intelligence_list
     
-    def _is_noise(self, text):
-        """判断是否为散户噪音"""
-        text_lower = text.lower()
+    def _is_noise(self, text, hits=None):
+        """判断是否为散户噪音（hits为规则引擎的扫描结果，未提供时现场扫描）"""
+        engine = self._get_rule_engine()
+        if hits is None:
+            hits = engine.scan(text)
         
         # 检查噪音关键词
-        noise_count = sum(1 for keyword in self.noise_keywords if keyword in text_lower)
+        noise_count = engine.noise_count(text, hits)
         
         # 如果包含3个以上噪音关键词，判定为噪音
         if noise_count >= 3:
@@ -174,115 +323,48 @@ class IntelligenceAnalyzer:
         
         return False
     
-    def _identify_stocks(self, text):
-        """识别帖子中讨论的股票"""
-        identified_stocks = []
-        
-        # 方法1: 通过股票代码识别（6位数字）
-        code_pattern = r'\b[036]\d{5}\b'
-        codes = re.findall(code_pattern, text)
-        identified_stocks.extend(codes)
-        
-        # 方法2: 通过股票简称识别
-        for name, code in self.stock_mapping.items():
-            if name in text:
-                stock_info = f"{name}({code})"
-                if stock_info not in identified_stocks:
-                    identified_stocks.append(stock_info)
-        
-        return list(set(identified_stocks))
+    def _identify_stocks(self, text, hits=None):
+        """识别帖子中讨论的股票（6位代码 + 全市场股票简称，重叠时取最长的简称；hits同_is_noise）"""
+        return self._get_rule_engine().stocks(text, hits)
     
-    def _classify_post(self, text):
-        """分类帖子类型"""
-        categories = []
-        scores = {}
-        
-        # 技术派评分
-        tech_score = 0
-        for category, keywords in self.technical_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    tech_score += 1
-        if tech_score > 0:
-            scores['技术派'] = tech_score
-        
-        # 筹码派评分
-        chip_score = 0
-        for category, keywords in self.chip_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    chip_score += 1
-        if chip_score > 0:
-            scores['筹码派'] = chip_score
-        
-        # 基本面评分
-        fundamental_score = 0
-        for category, keywords in self.fundamental_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    fundamental_score += 1
-        if fundamental_score > 0:
-            scores['基本面'] = fundamental_score
-        
-        # 按得分排序
-        if scores:
-            sorted_categories = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-            categories = [cat for cat, score in sorted_categories]
-        
-        return categories
+    def _board_stock(self, board_code):
+        """个股股吧帖子的所属股票（代码无效时为空列表）"""
+        board_code = str(board_code).strip()
+        if not re.fullmatch(r'[036]\d{5}', board_code):
+            return []
+        
+        name = self._get_rule_engine().stock_dictionary.name_of(board_code)
+        return [f"{name}({board_code})" if name else board_code]
     
-    def _extract_evidence(self, text, categories):
-        """提取关键论据"""
-        evidence_list = []
+    def _classify_post(self, text, hits=None):
+        """分类帖子类型（按技术派/筹码派/基本面命中的关键词数排序）"""
+        engine = self._get_rule_engine()
+        if hits is None:
+            hits = engine.scan(text)
         
+        return engine.classify(hits)
+    
+    def _extract_evidence(self, text, categories, hits=None):
+        """提取关键论据"""
         if not categories:
             return ''
         
-        main_category = categories[0]
+        engine = self._get_rule_engine()
+        if hits is None:
+            hits = engine.scan(text)
         
         # 根据主要分类提取相关论据
-        if main_category == '技术派':
-            for category, keywords in self.technical_keywords.items():
-                for keyword in keywords:
-                    if keyword in text:
-                        # 提取包含关键词的句子片段
-                        sentences = re.split(r'[。！？；\n]', text)
-                        for sentence in sentences:
-                            if keyword in sentence and len(sentence) > 10:
-                                evidence_list.append(sentence.strip())
-                                break
-                if evidence_list:
-                    break
-        
-        elif main_category == '筹码派':
-            for category, keywords in self.chip_keywords.items():
-                for keyword in keywords:
-                    if keyword in text:
-                        sentences = re.split(r'[。！？；\n]', text)
-                        for sentence in sentences:
-                            if keyword in sentence and len(sentence) > 10:
-                                evidence_list.append(sentence.strip())
-                                break
-                if evidence_list:
-                    break
-        
-        elif main_category == '基本面':
-            for category, keywords in self.fundamental_keywords.items():
-                for keyword in keywords:
-                    if keyword in text:
-                        sentences = re.split(r'[。！？；\n]', text)
-                        for sentence in sentences:
-                            if keyword in sentence and len(sentence) > 10:
-                                evidence_list.append(sentence.strip())
-                                break
-                if evidence_list:
-                    break
+        evidence_list = engine.evidence(text, hits, categories[0])
         
         # 返回前3条最相关的论据
         return ' | '.join(evidence_list[:3]) if evidence_list else '无明确论据'
     
-    def _evaluate_value(self, text, categories, evidence):
+    def _evaluate_value(self, text, categories, evidence, hits=None):
         """评估情报价值（1-10分）"""
+        engine = self._get_rule_engine()
+        if hits is None:
+            hits = engine.scan(text)
+        
         score = 0
         
         # 基础分：有分类就给3分
@@ -299,18 +381,14 @@ class IntelligenceAnalyzer:
                 score += 1
         
         # 数据分：包含具体数字加分
-        number_pattern = r'\d+\.?\d*%?'
-        numbers = re.findall(number_pattern, text)
-        if len(numbers) >= 3:
+        number_count = engine.number_count(text)
+        if number_count >= 3:
             score += 2
-        elif len(numbers) >= 1:
+        elif number_count >= 1:
             score += 1
         
         # 专业度分：包含专业术语加分
-        professional_terms = ['突破', '支撑', '压力', '主力', '机构', '业绩', '公告', 
-                             '政策', '行业', '龙头', '资金流入', '净流入']
-        professional_count = sum(1 for term in professional_terms if term in text)
-        if professional_count >= 3:
+        if engine.professional_count(hits) >= 3:
             score += 1
         
         # 确保分数在1-10之间
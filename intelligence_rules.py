@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股吧情报规则引擎
+把噪音词、技术派/筹码派/基本面关键词和专业术语编译进一个Aho-Corasick自动机，
+每条帖子只扫描一遍，得到所有关键词的命中位置；分类、论据提取和价值评估都从命中集合推导，
+句子只切分一次（命中位置按句子起点二分定位），不再对每个关键词重复 in 检查和 re.split；
+全市场股票简称也编译进同一个自动机，命中交给简称字典（stock_names.StockNameDictionary）按最左最长取舍
+
+结果与逐关键词检查的原逻辑一致:
+- 同一关键词在多个子类中出现时按出现次数计分（如"减仓"同时属于庄家和资金）
+- 论据按子类、关键词的原有顺序，取每个关键词第一次出现且长度大于10的句子
+
+用法:
+    engine = RuleEngine(noise_keywords, stock_dictionary, keyword_families, professional_terms)
+    hits = engine.scan(text)
+    categories = engine.classify(hits)
+"""
+
+import bisect
+import re
+
+from multi_pattern_matcher import AhoCorasick
+
+
+# 句子分隔符（与原_extract_evidence一致，均为单个字符）
+SENTENCE_PATTERN = re.compile(r'[。！？；\n]')
+
+# 扫描结果中股票简称命中的键前缀（与关键词字符串区分）
+STOCK_NAME = 'stock_name'
+
+# 股票代码和数字
+CODE_PATTERN = re.compile(r'\b[036]\d{5}\b')
+NUMBER_PATTERN = re.compile(r'\d+\.?\d*%?')
+
+
+class RuleEngine:
+    """编译后的情报规则"""
+    
+    def __init__(self, noise_keywords, stock_dictionary, keyword_families, professional_terms):
+        """
+        编译规则
+        
+        参数:
+            noise_keywords: 散户噪音关键词列表
+            stock_dictionary: 股票简称字典（StockNameDictionary）
+            keyword_families: [(分类名, {子类: [关键词, ...]}), ...]，顺序即分类得分相同时的先后
+            professional_terms: 专业术语列表
+        """
+        self.stock_dictionary = stock_dictionary
+        self.keyword_families = keyword_families
+        self.professional_terms = set(professional_terms)
+        
+        # 含大小写字母的噪音词按原逻辑在小写文本中检查，其余在自动机命中中统计（按列表中出现次数计数）
+        self.noise_counts = {}
+        self.cased_noise_keywords = []
+        for keyword in noise_keywords:
+            if keyword.lower() == keyword.upper():
+                self.noise_counts[keyword] = self.noise_counts.get(keyword, 0) + 1
+            else:
+                self.cased_noise_keywords.append(keyword)
+        
+        # 每个关键词在各分类中出现的次数（分类得分按原逻辑逐列表计数）
+        self.family_counts = {}
+        for family, keywords_by_category in keyword_families:
+            counts = {}
+            for keywords in keywords_by_category.values():
+                for keyword in keywords:
+                    counts[keyword] = counts.get(keyword, 0) + 1
+            self.family_counts[family] = counts
+        
+        patterns = set(self.noise_counts) | self.professional_terms
+        for counts in self.family_counts.values():
+            patterns.update(counts)
+        
+        self.matcher = AhoCorasick()
+        for pattern in patterns:
+            self.matcher.add(pattern)
+        for name in stock_dictionary.names:
+            self.matcher.add(name, (STOCK_NAME, name))
+        self.matcher.build()
+    
+    def scan(self, text):
+        """
+        扫描文本一遍
+        
+        参数:
+            text: 帖子全文
+        
+        返回:
+            dict: {关键词: [起始位置, ...]}（位置按出现顺序），
+                  股票简称的命中记为 {(STOCK_NAME, 简称): [起始位置, ...]}
+        """
+        hits = {}
+        for start, _, pattern in self.matcher.iter_matches(text):
+            positions = hits.get(pattern)
+            if positions is None:
+                hits[pattern] = [start]
+            else:
+                positions.append(start)
+        return hits
+    
+    def noise_count(self, text, hits):
+        """命中的噪音关键词个数"""
+        count = sum(n for keyword, n in self.noise_counts.items() if keyword in hits)
+        if self.cased_noise_keywords:
+            text_lower = text.lower()
+            count += sum(1 for keyword in self.cased_noise_keywords if keyword in text_lower)
+        return count
+    
+    def stocks(self, text, hits=None):
+        """
+        识别的股票（代码在前，简称按出现顺序，去重）
+        
+        参数:
+            text: 帖子全文
+            hits: scan的返回值，未提供时现场扫描
+        
+        返回:
+            list: ['600547', '山东黄金(600547)', ...]
+        """
+        if hits is None:
+            hits = self.scan(text)
+        
+        matches = [
+            (start, start + len(key[1]), key[1])
+            for key, positions in hits.items() if isinstance(key, tuple)
+            for start in positions
+        ]
+        
+        identified = list(dict.fromkeys(CODE_PATTERN.findall(text)))
+        identified.extend(self.stock_dictionary.identify(text, matches))
+        return list(dict.fromkeys(identified))
+    
+    def classify(self, hits):
+        """
+        按各分类命中关键词的计数排序
+        
+        返回:
+            list: 分类名（得分从高到低，得分相同时保持keyword_families的顺序）
+        """
+        scores = []
+        for family, _ in self.keyword_families:
+            counts = self.family_counts[family]
+            score = sum(counts.get(keyword, 0) for keyword in hits)
+            if score > 0:
+                scores.append((family, score))
+        
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return [family for family, _ in scores]
+    
+    def evidence(self, text, hits, main_category):
+        """
+        提取主要分类下的论据句子
+        
+        参数:
+            text: 帖子全文
+            hits: scan的返回值
+            main_category: 主要分类名
+        
+        返回:
+            list: 论据句子（已去除首尾空白）
+        """
+        keywords_by_category = dict(self.keyword_families).get(main_category)
+        if not keywords_by_category:
+            return []
+        
+        sentences = None
+        evidence_list = []
+        
+        for keywords in keywords_by_category.values():
+            for keyword in keywords:
+                positions = hits.get(keyword)
+                if not positions:
+                    continue
+                
+                # 只切分一次句子，命中位置二分定位到句子
+                if sentences is None:
+                    sentences = SENTENCE_PATTERN.split(text)
+                    starts = []
+                    offset = 0
+                    for sentence in sentences:
+                        starts.append(offset)
+                        offset += len(sentence) + 1
+                
+                indices = sorted({bisect.bisect_right(starts, position) - 1 for position in positions})
+                for index in indices:
+                    if len(sentences[index]) > 10:
+                        evidence_list.append(sentences[index].strip())
+                        break
+            
+            if evidence_list:
+                break
+        
+        return evidence_list
+    
+    def professional_count(self, hits):
+        """命中的专业术语个数"""
+        return sum(1 for term in self.professional_terms if term in hits)
+    
+    def number_count(self, text):
+        """文本中的数字个数"""
+        return len(NUMBER_PATTERN.findall(text))
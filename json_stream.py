@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量JSON解析
+边接收模型的流式输出边解析，数组中的元素一旦完整就立即交给调用方（如逐条到达的推荐股票），
+输出一旦出现不可能构成合法JSON的内容就报错，调用方可以立即中止请求，而不是等到超时
+
+JSON前的说明文字中可能带括号（如"根据[数据]分析，结果如下：{...}"）：尚未产出任何元素时，
+候选值失败后从下一个'{'/'['重新开始，与extract_json逐个尝试的行为一致
+
+支持的结构:
+1. 顶层数组: [{...}, {...}]，逐个产出元素
+2. 顶层对象中的数组字段: {"recommendations": [{...}, ...]}，逐个产出元素及其字段名
+
+用法:
+    parser = JSONStreamParser()
+    for chunk in chunks:
+        for key, item in parser.feed(chunk):
+            ...
+    result = parser.result()
+"""
+
+import json
+
+
+# JSON值外允许出现的字符（空白、结构符号、数字、true/false/null）
+_STRUCTURAL_CHARS = set(' \t\r\n{}[]:,-+.0123456789eEtrufalsn')
+
+_CLOSING = {'}': '{', ']': '['}
+
+
+class MalformedStreamError(ValueError):
+    """流式输出不可能构成合法JSON"""
+
+
+class JSONStreamParser:
+    """增量JSON解析器"""
+    
+    def __init__(self, max_preamble=300, expect=None):
+        """
+        初始化解析器
+        
+        参数:
+            max_preamble: JSON开始前允许的最多字符数（如"```json"或说明文字），超出视为格式异常
+            expect: 期望的顶层类型（dict、list或二者的元组），类型不符的候选值跳过，None表示不限
+        """
+        self.max_preamble = max_preamble
+        self.expect = expect or (dict, list)
+        
+        self.text = ''           # 已接收的全部文本
+        self.done = False        # 顶层JSON值是否已结束
+        self.emitted = 0         # 已产出的元素数
+        
+        self._value = None       # 解析完成的顶层JSON值
+        self._reset(0)
+    
+    def _reset(self, position):
+        """放弃当前候选值，从position起重新寻找顶层JSON值"""
+        self._pos = position
+        self._start = None       # 顶层JSON值的起始位置
+        self._stack = []         # 未闭合的容器 [(符号, 起始位置, 所属字段名), ...]
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None  # 顶层对象中最近一个完整字符串（作为下一个数组的字段名）
+    
+    def feed(self, chunk):
+        """
+        输入一段文本
+        
+        参数:
+            chunk: 新到达的文本
+        
+        返回:
+            list: 新完成的数组元素 [(字段名, 元素), ...]，顶层数组的字段名为None
+        
+        异常:
+            MalformedStreamError: 输出不可能构成合法JSON
+        """
+        self.text += chunk
+        items = []
+        
+        while True:
+            try:
+                self._scan(items)
+                return items
+            except MalformedStreamError:
+                # 已产出元素（调用方已处理）或还没有候选值时无法重来
+                if self.emitted or self._start is None:
+                    raise
+                self._reset(self._start + 1)
+    
+    def _scan(self, items):
+        """从当前位置解析到已接收文本的末尾，新完成的元素追加到items"""
+        while self._pos < len(self.text) and not self.done:
+            char = self.text[self._pos]
+            position = self._pos
+            self._pos += 1
+            
+            if self._start is None:
+                if char in '{[':
+                    self._start = position
+                    self._stack.append((char, position, None))
+                elif position >= self.max_preamble:
+                    raise MalformedStreamError(f"前{self.max_preamble}个字符内未出现JSON")
+                continue
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    item = self._complete(self._string_start, position + 1)
+                    if item is not None:
+                        items.append(item)
+                        self.emitted += 1
+                    elif len(self._stack) == 1 and self._stack[0][0] == '{':
+                        self._last_string = self.text[self._string_start:position + 1]
+                continue
+            
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            
+            elif char in '{[':
+                key = None
+                if len(self._stack) == 1 and self._stack[0][0] == '{' and char == '[':
+                    key = json.loads(self._last_string) if self._last_string else None
+                self._stack.append((char, position, key))
+            
+            elif char in '}]':
+                opener, start, _ = self._stack.pop() if self._stack else (None, None, None)
+                if opener != _CLOSING[char]:
+                    raise MalformedStreamError(f"第{position}个字符处括号不匹配: {char}")
+                
+                if not self._stack:
+                    self._value = self._finish(position + 1)
+                    self.done = True
+                else:
+                    item = self._complete(start, position + 1)
+                    if item is not None:
+                        items.append(item)
+                        self.emitted += 1
+            
+            elif char not in _STRUCTURAL_CHARS:
+                raise MalformedStreamError(f"第{position}个字符处出现非法内容: {char!r}")
+        
+        return items
+    
+    def _complete(self, start, end):
+        """值[start:end]结束时，若其直接位于被跟踪的数组中则解析并返回 (字段名, 元素)"""
+        if not self._stack or self._stack[-1][0] != '[':
+            return None
+        
+        depth = len(self._stack)
+        if depth == 1:
+            key = None
+        elif depth == 2 and self._stack[0][0] == '{':
+            key = self._stack[-1][2]
+        else:
+            return None
+        
+        try:
+            return key, json.loads(self.text[start:end])
+        except json.JSONDecodeError as e:
+            raise MalformedStreamError(f"数组元素不是合法JSON: {e}")
+    
+    def _finish(self, end):
+        """顶层值结束：解析并检查类型"""
+        try:
+            value = json.loads(self.text[self._start:end])
+        except json.JSONDecodeError as e:
+            raise MalformedStreamError(f"不是合法JSON: {e}")
+        
+        if not self.emitted and not isinstance(value, self.expect):
+            raise MalformedStreamError(f"JSON类型不符: {type(value).__name__}")
+        return value
+    
+    def result(self):
+        """
+        完整的顶层JSON值
+        
+        返回:
+            dict/list: 解析结果
+        
+        异常:
+            MalformedStreamError: 输出不完整（如被max_tokens截断）或不是合法JSON
+        """
+        if not self.done:
+            raise MalformedStreamError("输出不完整")
+        
+        return self._value
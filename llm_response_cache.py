@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型回复的磁盘缓存
+以 (模型, 系统提示词, 用户输入, 温度, API地址) 的哈希为键缓存回复文本，
+重跑流水线时相同的请求直接命中缓存，不再调用API；
+键中包含API地址，指向本地模拟服务器时的回复与真实API的回复互不混用
+
+机制:
+1. SQLite存储，按最近访问时间做LRU淘汰，总大小不超过上限
+2. 只缓存成功的回复；调用方发现回复不可用（如JSON解析失败）时可调用invalidate删除
+3. 统计命中/未命中/淘汰次数
+
+用法:
+    cache = get_llm_response_cache()
+    key = make_cache_key(model, system_prompt, user_input, temperature, api_base)
+    content = cache.get(key)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from market_snapshot import load_cache_config
+
+
+def make_cache_key(model, system_prompt, user_input, temperature, api_base=None):
+    """
+    请求内容的哈希键
+    
+    参数:
+        model: 模型名
+        system_prompt: 系统提示词
+        user_input: 用户输入
+        temperature: 温度
+        api_base: 请求发往的API地址，None表示只按请求内容区分（如模拟服务器的录制键）
+    
+    返回:
+        str: sha256十六进制串
+    """
+    fields = [model, system_prompt, user_input, float(temperature)]
+    if api_base is not None:
+        fields.append(api_base.rstrip('/'))
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """按内容哈希寻址、LRU淘汰的回复缓存"""
+    
+    def __init__(self, db_path=None, max_bytes=100 * 1024 * 1024):
+        """
+        初始化缓存
+        
+        参数:
+            db_path: SQLite文件路径，默认为缓存目录下的llm_responses.db
+            max_bytes: 缓存回复总大小上限（字节）
+        """
+        cache_config = load_cache_config()
+        
+        self.db_path = db_path or os.path.join(cache_config['cache_dir'], 'llm_responses.db')
+        self.max_bytes = max_bytes
+        
+        self.stats = {'hit': 0, 'miss': 0, 'evict': 0}
+        self._lock = threading.Lock()
+        
+        self._init_db()
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _init_db(self):
+        """创建缓存表"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+    
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+    
+    def get(self, key):
+        """
+        读取缓存的回复并刷新访问时间
+        
+        参数:
+            key: make_cache_key生成的键
+        
+        返回:
+            str: 回复文本，未命中时为None
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row:
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        except Exception as e:
+            print(f"  ⚠️  读取回复缓存失败: {e}")
+            row = None
+        
+        self._count('hit' if row else 'miss')
+        return row[0] if row else None
+    
+    def contains(self, key):
+        """是否已缓存（不刷新访问时间，不计入统计）"""
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+        except Exception:
+            return False
+    
+    def put(self, key, response):
+        """
+        写入回复，超出大小上限时淘汰最久未访问的条目
+        
+        参数:
+            key: make_cache_key生成的键
+            response: 回复文本
+        """
+        size = len(response.encode('utf-8'))
+        now = time.time()
+        
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, response, size, now, now)
+                )
+                evicted = self._evict(conn)
+        except Exception as e:
+            print(f"  ⚠️  写入回复缓存失败: {e}")
+            return
+        
+        if evicted:
+            self._count('evict', evicted)
+    
+    def _evict(self, conn):
+        """按访问时间从旧到新删除，直到总大小不超过上限，返回删除条数"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        return len(victims)
+    
+    def invalidate(self, key):
+        """删除一条缓存（回复不可用时调用）"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+    
+    def summary(self):
+        """命中统计摘要"""
+        with self._lock:
+            stats = dict(self.stats)
+        
+        total = stats['hit'] + stats['miss']
+        hit_rate = stats['hit'] / total * 100 if total else 0
+        return (f"AI回复缓存: 命中 {stats['hit']}, 未命中 {stats['miss']}, "
+                f"淘汰 {stats['evict']} (命中率 {hit_rate:.0f}%)")
+
+
+# 进程内共享实例
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_response_cache(max_bytes=None):
+    """
+    获取进程内共享的回复缓存
+    
+    参数:
+        max_bytes: 首次创建时使用的大小上限（字节），默认100MB
+    
+    返回:
+        LLMResponseCache: 所有DeepSeek客户端共用的缓存
+    """
+    global _shared_cache
+    
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMResponseCache(max_bytes=max_bytes or 100 * 1024 * 1024)
+        return _shared_cache
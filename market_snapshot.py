@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场行情快照缓存
+进程内共享 ak.stock_zh_a_spot_em 全A股实时行情，避免多个模块重复下载
+
+机制:
+1. 内存缓存：同一进程内所有模块共用一份快照，在TTL内直接返回
+2. 磁盘缓存：快照落盘为列式文件（parquet，缺少pyarrow时退化为pickle），
+   同一天内多个脚本依次运行时也能复用
+3. 降级：下载失败时使用过期的磁盘快照，保证各模块仍有一致的市场视图
+"""
+
+import akshare as ak
+import pandas as pd
+import threading
+import time
+import os
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+# 默认配置（可在config.py的CACHE_CONFIG中覆盖）
+DEFAULT_SNAPSHOT_CONFIG = {
+    'cache_dir': 'cache',
+    'snapshot_ttl': 300,   # 快照有效期（秒）
+}
+
+# 需要转换为数值类型的列
+NUMERIC_COLUMNS = [
+    '最新价', '涨跌幅', '涨跌额', '成交量', '成交额', '振幅', '最高', '最低',
+    '今开', '昨收', '量比', '换手率', '市盈率-动态', '市净率', '总市值', '流通市值'
+]
+
+
+def load_cache_config():
+    """读取缓存配置，config.py中的CACHE_CONFIG覆盖默认值"""
+    cache_config = dict(DEFAULT_SNAPSHOT_CONFIG)
+    
+    try:
+        from config import CACHE_CONFIG
+        cache_config.update(CACHE_CONFIG)
+    except ImportError:
+        pass
+    
+    return cache_config
+
+
+class MarketSnapshot:
+    """全A股实时行情快照"""
+    
+    def __init__(self, ttl=None, cache_dir=None):
+        """
+        初始化快照缓存
+        
+        参数:
+            ttl: 快照有效期（秒），默认读取配置
+            cache_dir: 磁盘缓存目录，默认读取配置
+        """
+        cache_config = load_cache_config()
+        
+        self.ttl = ttl if ttl is not None else cache_config['snapshot_ttl']
+        self.cache_dir = cache_dir or cache_config['cache_dir']
+        
+        self._df = None
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+    
+    def get(self, force_refresh=False):
+        """
+        获取全A股行情快照
+        
+        参数:
+            force_refresh: 是否忽略缓存强制重新下载
+        
+        返回:
+            DataFrame: 行情快照副本（调用方可自由修改），失败时为空DataFrame
+        """
+        return self._get_frame(force_refresh).copy()
+    
+    def get_stock(self, stock_code):
+        """
+        获取单只股票的快照行
+        
+        参数:
+            stock_code: 股票代码
+        
+        返回:
+            dict: 该股票的行情字段，未找到时为空字典
+        """
+        df = self._get_frame()
+        
+        if df.empty:
+            return {}
+        
+        matched = df[df['代码'] == str(stock_code)]
+        
+        if matched.empty:
+            return {}
+        
+        return matched.iloc[0].to_dict()
+    
+    def get_stocks(self, stock_codes):
+        """
+        获取多只股票的快照行
+        
+        参数:
+            stock_codes: 股票代码列表
+            
+        返回:
+            DataFrame: 命中的快照行副本，未命中的代码不出现在结果中
+        """
+        df = self._get_frame()
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        codes = [str(code).zfill(6) for code in stock_codes]
+        
+        return df[df['代码'].isin(codes)].copy()
+    
+    def _get_frame(self, force_refresh=False):
+        """获取内部快照（不复制，仅供只读使用）"""
+        with self._lock:
+            if not force_refresh and self._is_fresh(self._fetched_at):
+                return self._df
+            
+            # 1. 尝试磁盘缓存
+            if not force_refresh:
+                df, fetched_at = self._load_from_disk()
+                if df is not None and self._is_fresh(fetched_at):
+                    self._df, self._fetched_at = df, fetched_at
+                    print(f"✓ 使用磁盘行情快照 ({len(df)} 只股票)")
+                    return self._df
+            
+            # 2. 下载最新快照
+            try:
+                print("正在获取全A股实时行情快照...")
+                df = self._normalize(ak.stock_zh_a_spot_em())
+                self._df, self._fetched_at = df, time.time()
+                self._save_to_disk(df)
+                print(f"✓ 行情快照获取成功，共 {len(df)} 只股票")
+                return self._df
+            
+            except Exception as e:
+                print(f"× 行情快照获取失败: {e}")
+            
+            # 3. 降级使用过期快照
+            if self._df is None:
+                df, fetched_at = self._load_from_disk()
+                if df is not None:
+                    self._df, self._fetched_at = df, fetched_at
+            
+            if self._df is not None:
+                age = int(time.time() - self._fetched_at)
+                print(f"⚠️  使用过期行情快照（{age}秒前）")
+                return self._df
+            
+            return pd.DataFrame()
+    
+    def invalidate(self):
+        """清空内存缓存，下次get时重新加载"""
+        with self._lock:
+            self._df = None
+            self._fetched_at = 0
+    
+    def _is_fresh(self, fetched_at):
+        """判断快照是否在有效期内"""
+        return fetched_at > 0 and (time.time() - fetched_at) < self.ttl
+    
+    def _normalize(self, df):
+        """统一代码格式与数值列类型"""
+        df = df.copy()
+        
+        if '代码' in df.columns:
+            df['代码'] = df['代码'].astype(str).str.zfill(6)
+        
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        return df.reset_index(drop=True)
+    
+    def _parquet_path(self):
+        return os.path.join(self.cache_dir, 'market_snapshot.parquet')
+    
+    def _pickle_path(self):
+        return os.path.join(self.cache_dir, 'market_snapshot.pkl')
+    
+    def _save_to_disk(self, df):
+        """快照落盘（parquet优先，缺少依赖时使用pickle）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            
+            try:
+                df.to_parquet(self._parquet_path(), index=False)
+            except ImportError:
+                df.to_pickle(self._pickle_path())
+        
+        except Exception as e:
+            print(f"  ⚠️  行情快照落盘失败: {e}")
+    
+    def _load_from_disk(self):
+        """
+        读取磁盘快照
+        
+        返回:
+            tuple: (DataFrame或None, 落盘时间戳)
+        """
+        for path, reader in [(self._parquet_path(), pd.read_parquet),
+                             (self._pickle_path(), pd.read_pickle)]:
+            if not os.path.exists(path):
+                continue
+            
+            try:
+                df = reader(path)
+                return self._normalize(df), os.path.getmtime(path)
+            except Exception as e:
+                print(f"  ⚠️  读取磁盘快照失败 ({path}): {e}")
+        
+        return None, 0
+
+
+# 进程内共享实例
+_shared_snapshot = None
+_shared_lock = threading.Lock()
+
+
+def get_market_snapshot():
+    """
+    获取进程内共享的行情快照实例
+    
+    返回:
+        MarketSnapshot: 所有模块共用的快照对象
+    """
+    global _shared_snapshot
+    
+    with _shared_lock:
+        if _shared_snapshot is None:
+            _shared_snapshot = MarketSnapshot()
+        return _shared_snapshot
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟DeepSeek服务器（OpenAI兼容的 /chat/completions 接口）
+用于离线压测和回归测试所有调用大模型的模块的并发、重试和缓存行为
+
+模式:
+1. 回放（replay）: 按 (模型, 系统提示词, 用户输入, 温度) 查找录制的回复，没有录制时返回fallback_content
+2. 录制（record）: 没有录制的请求转发到真实API，回复追加写入录制文件
+
+故障注入（同一请求的第N次尝试结果由随机种子固定，便于复现）:
+- latency / latency_jitter: 每次请求的延迟
+- rate_429: 返回429限流（带Retry-After）
+- rate_malformed: 返回被截断、无法解析的JSON
+支持 "stream": true 的SSE流式输出
+
+用法:
+    python mock_deepseek_server.py            # 回放模式
+    python mock_deepseek_server.py --record   # 录制模式（需要真实API Key）
+    
+    然后在config.py中设置 DEEPSEEK_CONFIG['api_base_override'] = 'http://127.0.0.1:8765/v1'，
+    或在同一进程中:
+        with MockDeepSeekServer(rate_429=0.2) as server:
+            set_api_base_override(server.api_base)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from llm_response_cache import make_cache_key
+from market_snapshot import load_cache_config
+
+
+# 默认配置（可在config.py的MOCK_DEEPSEEK_CONFIG中覆盖）
+DEFAULT_MOCK_DEEPSEEK_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'recordings_path': None,       # None表示缓存目录下的deepseek_recordings.jsonl
+    'upstream': 'https://api.deepseek.com/v1',
+    'latency': 0.5,                # 固定延迟（秒）
+    'latency_jitter': 0.5,         # 随机抖动（秒）
+    'rate_429': 0.0,               # 429概率
+    'rate_malformed': 0.0,         # 格式错误JSON概率
+    'retry_after': 1,              # 429的Retry-After（秒）
+    'stream_chunk_chars': 20,      # 流式输出每段字符数
+    'stream_chunk_delay': 0.02,    # 流式输出每段间隔（秒）
+    'fallback_content': '[]',      # 没有录制时返回的内容，None表示返回404
+    'seed': 0                      # 故障注入随机种子
+}
+
+
+def load_mock_server_config():
+    """读取模拟服务器配置，config.py中的MOCK_DEEPSEEK_CONFIG覆盖默认值"""
+    mock_config = dict(DEFAULT_MOCK_DEEPSEEK_CONFIG)
+    
+    try:
+        from config import MOCK_DEEPSEEK_CONFIG
+        mock_config.update(MOCK_DEEPSEEK_CONFIG)
+    except ImportError:
+        pass
+    
+    return mock_config
+
+
+class MockDeepSeekServer:
+    """后台线程运行的模拟DeepSeek服务器"""
+    
+    def __init__(self, mode='replay', recordings_path=None, **overrides):
+        """
+        初始化服务器（start后开始监听）
+        
+        参数:
+            mode: 'replay' 或 'record'
+            recordings_path: 录制文件路径，默认读取配置
+            overrides: 覆盖MOCK_DEEPSEEK_CONFIG中的其他字段（如latency、rate_429、port）
+        """
+        mock_config = load_mock_server_config()
+        mock_config.update(overrides)
+        
+        if mode not in ('replay', 'record'):
+            raise ValueError(f"未知模式: {mode}")
+        
+        self.mode = mode
+        self.host = mock_config['host']
+        self.port = mock_config['port']
+        self.upstream = mock_config['upstream'].rstrip('/')
+        self.latency = mock_config['latency']
+        self.latency_jitter = mock_config['latency_jitter']
+        self.rate_429 = mock_config['rate_429']
+        self.rate_malformed = mock_config['rate_malformed']
+        self.retry_after = mock_config['retry_after']
+        self.stream_chunk_chars = mock_config['stream_chunk_chars']
+        self.stream_chunk_delay = mock_config['stream_chunk_delay']
+        self.fallback_content = mock_config['fallback_content']
+        self.seed = mock_config['seed']
+        
+        self.recordings_path = recordings_path or mock_config['recordings_path'] or os.path.join(
+            load_cache_config()['cache_dir'], 'deepseek_recordings.jsonl'
+        )
+        self.recordings = self._load_recordings()
+        
+        self.stats = {'request': 0, 'replay': 0, 'record': 0, 'fallback': 0, 'miss': 0,
+                      '429': 0, 'malformed': 0, 'stream': 0}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+    
+    @property
+    def api_base(self):
+        """客户端使用的API基础URL"""
+        return f"http://{self.host}:{self.port}/v1"
+    
+    def _load_recordings(self):
+        """读取录制文件（同一请求以最后一次录制为准）"""
+        recordings = {}
+        
+        if not os.path.exists(self.recordings_path):
+            return recordings
+        
+        with open(self.recordings_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    recordings[record['key']] = record['content']
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        
+        return recordings
+    
+    def record(self, system_prompt, user_input, content, model='deepseek-chat', temperature=0.3):
+        """
+        写入一条录制（录制模式下由真实回复调用，测试中可直接构造回放数据）
+        
+        参数:
+            system_prompt: 系统提示词
+            user_input: 用户输入
+            content: 回复内容
+            model: 模型名
+            temperature: 温度
+        """
+        key = make_cache_key(model, system_prompt, user_input, temperature)
+        line = json.dumps({
+            'key': key, 'model': model, 'temperature': temperature,
+            'system_prompt': system_prompt, 'user_input': user_input,
+            'content': content, 'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }, ensure_ascii=False)
+        
+        with self._lock:
+            directory = os.path.dirname(self.recordings_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.recordings_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            self.recordings[key] = content
+    
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+    
+    def _roll(self, key, attempt, fault):
+        """请求key第attempt次尝试的故障随机数（0-1，由种子确定）"""
+        digest = hashlib.sha256(f"{self.seed}:{fault}:{key}:{attempt}".encode('utf-8')).hexdigest()
+        return int(digest[:8], 16) / 0x100000000
+    
+    def _next_attempt(self, key):
+        with self._lock:
+            self._attempts[key] = self._attempts.get(key, 0) + 1
+            return self._attempts[key]
+    
+    def _fetch_upstream(self, payload, authorization):
+        """录制模式：把请求转发到真实API，返回回复内容，失败时为None"""
+        try:
+            response = requests.post(
+                f"{self.upstream}/chat/completions",
+                json=dict(payload, stream=False),
+                headers={"Content-Type": "application/json", "Authorization": authorization},
+                timeout=(10, 120)
+            )
+            response.raise_for_status()
+            return response.json()['choices'][0]['message']['content'].strip()
+        except Exception as e:
+            print(f"  × 转发到真实API失败: {e}")
+            return None
+    
+    def handle(self, payload, authorization=''):
+        """
+        处理一次请求
+        
+        参数:
+            payload: 请求体
+            authorization: Authorization请求头（录制模式转发用）
+        
+        返回:
+            tuple: (HTTP状态码, 回复内容或错误信息, 额外响应头)
+        """
+        self._count('request')
+        
+        messages = payload.get('messages') or []
+        system_prompt = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+        user_input = next((m['content'] for m in messages if m.get('role') == 'user'), '')
+        model = payload.get('model', 'deepseek-chat')
+        temperature = payload.get('temperature', 0.3)
+        
+        key = make_cache_key(model, system_prompt, user_input, temperature)
+        attempt = self._next_attempt(key)
+        
+        delay = self.latency + self.latency_jitter * self._roll(key, attempt, 'latency')
+        if delay > 0:
+            time.sleep(delay)
+        
+        if self._roll(key, attempt, '429') < self.rate_429:
+            self._count('429')
+            return 429, 'Rate limit reached', {'Retry-After': str(self.retry_after)}
+        
+        content = self.recordings.get(key)
+        
+        if content is not None:
+            self._count('replay')
+        elif self.mode == 'record':
+            content = self._fetch_upstream(payload, authorization)
+            if content is None:
+                return 502, 'Upstream request failed', {}
+            self.record(system_prompt, user_input, content, model, temperature)
+            self._count('record')
+        elif self.fallback_content is not None:
+            self._count('fallback')
+            content = self.fallback_content
+        else:
+            self._count('miss')
+            return 404, 'No recording for this request', {}
+        
+        if self._roll(key, attempt, 'malformed') < self.rate_malformed:
+            self._count('malformed')
+            content = content[:len(content) // 2] + '……（输出中断）'
+        
+        return 200, content, {}
+    
+    def start(self):
+        """
+        在后台线程启动服务器（port为0时自动分配端口）
+        
+        返回:
+            str: API基础URL
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        
+        return self.api_base
+    
+    def stop(self):
+        """停止服务器"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *args):
+        self.stop()
+    
+    def summary(self):
+        """请求统计摘要"""
+        with self._lock:
+            stats = dict(self.stats)
+        
+        return (f"模拟服务器: 请求 {stats['request']}, 回放 {stats['replay']}, 录制 {stats['record']}, "
+                f"无录制 {stats['fallback'] + stats['miss']}, 注入429 {stats['429']}, "
+                f"注入格式错误 {stats['malformed']}, 流式 {stats['stream']}")
+
+
+def _make_handler(server):
+    """绑定到MockDeepSeekServer的请求处理类"""
+    
+    class Handler(BaseHTTPRequestHandler):
+        
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_error(404, f"Unknown path: {self.path}")
+                return
+            
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length).decode('utf-8'))
+            except (ValueError, UnicodeDecodeError):
+                self._send_error(400, 'Invalid JSON body')
+                return
+            
+            status, content, headers = server.handle(payload, self.headers.get('Authorization', ''))
+            
+            if status != 200:
+                self._send_error(status, content, headers)
+            elif payload.get('stream'):
+                server._count('stream')
+                self._send_stream(payload, content)
+            else:
+                self._send_json(200, {
+                    'id': f"mock-{int(time.time() * 1000)}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': payload.get('model', 'deepseek-chat'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop'
+                    }]
+                })
+        
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def _send_error(self, status, message, headers=None):
+            self._send_json(status, {'error': {'message': message, 'code': status}}, headers)
+        
+        def _send_stream(self, payload, content):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            
+            size = max(1, server.stream_chunk_chars)
+            try:
+                for i in range(0, len(content), size):
+                    chunk = {
+                        'object': 'chat.completion.chunk',
+                        'model': payload.get('model', 'deepseek-chat'),
+                        'choices': [{'index': 0, 'delta': {'content': content[i:i+size]}}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    if server.stream_chunk_delay:
+                        time.sleep(server.stream_chunk_delay)
+                
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端提前中止（如检测到格式异常）
+                pass
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return Handler
+
+
+def main():
+    """命令行启动（--record 为录制模式）"""
+    mode = 'record' if '--record' in sys.argv else 'replay'
+    server = MockDeepSeekServer(mode=mode)
+    server.start()
+    
+    print(f"✓ 模拟DeepSeek服务器已启动（{mode}模式）: {server.api_base}")
+    print(f"  录制文件: {server.recordings_path}（已有 {len(server.recordings)} 条）")
+    print(f"  延迟: {server.latency}+{server.latency_jitter}秒, 429概率: {server.rate_429}, "
+          f"格式错误概率: {server.rate_malformed}")
+    print(f"  在config.py中设置 DEEPSEEK_CONFIG['api_base_override'] = '{server.api_base}' 后运行各模块")
+    print("  按 Ctrl+C 停止")
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n{server.summary()}")
+
+
+if __name__ == "__main__":
+    main()
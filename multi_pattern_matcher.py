@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多模式字符串匹配（Aho-Corasick自动机）
+一次构建、逐字扫描文本一遍即可找出所有模式串的出现位置，
+匹配耗时与模式串数量无关，适合"大量股票名称/代码/关键词 × 大量舆情文本"的碰撞
+
+用法:
+    matcher = AhoCorasick()
+    matcher.add('山东黄金', ('stock', '600547'))
+    matcher.add('重组', ('keyword', 0, 0))
+    matcher.build()
+    for start, end, value in matcher.iter_matches(text):
+        ...
+"""
+
+from collections import deque
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机"""
+    
+    def __init__(self):
+        # 状态0为根节点
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._built = False
+    
+    def add(self, pattern, value=None):
+        """
+        添加模式串
+        
+        参数:
+            pattern: 模式串（空串忽略）
+            value: 命中时返回的值，默认为模式串本身
+        """
+        if not pattern:
+            return
+        
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        
+        self._output[state].append((len(pattern), pattern if value is None else value))
+        self._built = False
+    
+    def build(self):
+        """计算失败指针（添加完所有模式串后调用一次）"""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        
+        while queue:
+            state = queue.popleft()
+            
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                
+                # 继承失败指针上的输出（后缀模式串）
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        
+        self._built = True
+        return self
+    
+    def iter_matches(self, text):
+        """
+        扫描文本，逐个返回命中（包括重叠命中）
+        
+        参数:
+            text: 待扫描文本
+        
+        返回:
+            generator: (起始位置, 结束位置, 值)
+        """
+        if not self._built:
+            self.build()
+        
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            
+            for length, value in output[state]:
+                yield index - length + 1, index + 1, value
+    
+    def find_values(self, text):
+        """
+        返回文本中命中的所有值（去重）
+        
+        参数:
+            text: 待扫描文本
+        
+        返回:
+            set: 命中值集合
+        """
+        return {value for _, _, value in self.iter_matches(text)}
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按token预算打包提示词
+在本地估算token数，按优先级依次放入文本，去除近似重复的内容，
+把配置的token预算填满（最后一条放不下时截断补齐），并报告实际用量
+
+估算规则（DeepSeek官方换算）: 1个中文字符 ≈ 0.6 token，1个英文/数字/符号字符 ≈ 0.3 token
+
+用法:
+    packer = PromptPacker(budget_tokens=4000)
+    result = packer.pack(texts)
+    print(result['text'], result['tokens'])
+"""
+
+import math
+import re
+from collections import Counter
+
+
+# 默认配置（可在config.py的PROMPT_BUDGET_CONFIG中覆盖）
+DEFAULT_PROMPT_BUDGET_CONFIG = {
+    'weibo_sentiment_tokens': 4000,      # 微博情绪分析的帖子预算
+    'discovery_today_tokens': 6000,      # 全网雷达今日讨论的预算
+    'discovery_yesterday_tokens': 3000,  # 全网雷达昨日讨论的预算
+    'near_duplicate_threshold': 0.8,     # 近似重复判定阈值（字符三元组Jaccard相似度）
+    'min_item_tokens': 30,               # 剩余预算不少于该值时截断下一条补齐
+    'weibo_max_shards': 20               # 微博map-reduce分析的最多分片数
+}
+
+_CJK_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+# 去重前清除的噪声：链接、@用户、空白和标点
+_NOISE_PATTERN = re.compile(r'https?://\S+|@[\w\-]+|[\W_]+')
+
+_ELLIPSIS = '…'
+
+
+def load_prompt_budget_config():
+    """读取提示词预算配置，config.py中的PROMPT_BUDGET_CONFIG覆盖默认值"""
+    budget_config = dict(DEFAULT_PROMPT_BUDGET_CONFIG)
+    
+    try:
+        from config import PROMPT_BUDGET_CONFIG
+        budget_config.update(PROMPT_BUDGET_CONFIG)
+    except ImportError:
+        pass
+    
+    return budget_config
+
+
+def estimate_tokens(text):
+    """
+    本地估算文本的token数
+    
+    参数:
+        text: 文本
+    
+    返回:
+        int: 估算token数（向上取整）
+    """
+    if not text:
+        return 0
+    
+    cjk = len(_CJK_PATTERN.findall(text))
+    return math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+
+def _shingles(text):
+    """归一化后的字符三元组集合（过短的文本整体作为一个元素）"""
+    normalized = _NOISE_PATTERN.sub('', str(text)).lower()
+    if len(normalized) <= 3:
+        return {normalized}
+    return {normalized[i:i+3] for i in range(len(normalized) - 2)}
+
+
+class PromptPacker:
+    """按token预算打包文本"""
+    
+    def __init__(self, budget_tokens, separator="\n", dedup_threshold=0.8, min_item_tokens=30):
+        """
+        初始化打包器
+        
+        参数:
+            budget_tokens: token预算
+            separator: 条目之间的分隔符（计入预算）
+            dedup_threshold: 与已选文本的相似度不低于该值时视为近似重复并跳过，None表示不去重
+            min_item_tokens: 剩余预算不少于该值时截断放不下的条目补齐预算，否则继续尝试更短的条目
+        """
+        self.budget_tokens = budget_tokens
+        self.separator = separator
+        self.dedup_threshold = dedup_threshold
+        self.min_item_tokens = min_item_tokens
+        
+        self._separator_tokens = estimate_tokens(separator)
+    
+    def pack(self, texts, format_item=None):
+        """
+        按顺序（优先级从高到低）打包文本
+        
+        参数:
+            texts: 文本列表，调用方需预先按优先级排序
+            format_item: 格式化函数 format_item(position, index, text) -> str，
+                         position为入选后的序号（从1开始），index为texts中的下标；默认原样输出
+        
+        返回:
+            dict: {
+                'text': 拼接后的提示词片段,
+                'indices': 入选文本在texts中的下标（按入选顺序）,
+                'tokens': 估算token数,
+                'budget': token预算,
+                'duplicates': 跳过的近似重复条数,
+                'skipped': 因预算不足未入选的条数,
+                'truncated': 最后一条是否被截断
+            }
+        """
+        format_item = format_item or (lambda position, index, text: text)
+        
+        entries = []
+        indices = []
+        used = 0
+        duplicates = 0
+        skipped = 0
+        truncated = False
+        
+        # 已选文本的三元组倒排索引（只和共享三元组的文本比较相似度）
+        kept_shingles = []
+        shingle_index = {}
+        
+        for index, text in enumerate(texts):
+            text = str(text)
+            
+            shingles = _shingles(text)
+            if self._is_duplicate(shingles, kept_shingles, shingle_index):
+                duplicates += 1
+                continue
+            
+            remaining = self.budget_tokens - used - (self._separator_tokens if entries else 0)
+            if remaining <= 0:
+                skipped += len(texts) - index
+                break
+            
+            entry = format_item(len(entries) + 1, index, text)
+            cost = estimate_tokens(entry)
+            
+            if cost > remaining:
+                if remaining < self.min_item_tokens:
+                    skipped += 1
+                    continue
+                
+                entry = self._truncate(format_item, len(entries) + 1, index, text, remaining)
+                if entry is None:
+                    skipped += 1
+                    continue
+                cost = estimate_tokens(entry)
+                truncated = True
+            
+            used += cost + (self._separator_tokens if entries else 0)
+            entries.append(entry)
+            indices.append(index)
+            
+            kept_shingles.append(shingles)
+            for shingle in shingles:
+                shingle_index.setdefault(shingle, []).append(len(kept_shingles) - 1)
+            
+            if truncated:
+                skipped += len(texts) - index - 1
+                break
+        
+        return {
+            'text': self.separator.join(entries),
+            'indices': indices,
+            'tokens': used,
+            'budget': self.budget_tokens,
+            'duplicates': duplicates,
+            'skipped': skipped,
+            'truncated': truncated
+        }
+    
+    def shard(self, texts, format_item=None, max_shards=None):
+        """
+        按顺序把文本切分为多个不超过预算的分片（用于map-reduce分析）
+        
+        近似重复在全部分片范围内去除；单条超过整个预算时截断
+        
+        参数:
+            texts: 文本列表，调用方需预先按优先级排序
+            format_item: 格式化函数 format_item(position, index, text) -> str，position为分片内序号
+            max_shards: 最多分片数，超出部分（优先级最低的文本）计入最后一个分片的skipped
+        
+        返回:
+            list: 每个分片一个dict，字段同pack的返回值
+        """
+        format_item = format_item or (lambda position, index, text: text)
+        
+        shards = []
+        kept_shingles = []
+        shingle_index = {}
+        
+        def new_shard():
+            shards.append({
+                'entries': [], 'indices': [], 'tokens': 0, 'budget': self.budget_tokens,
+                'duplicates': 0, 'skipped': 0, 'truncated': False
+            })
+            return shards[-1]
+        
+        current = new_shard()
+        
+        for index, text in enumerate(texts):
+            text = str(text)
+            
+            shingles = _shingles(text)
+            if self._is_duplicate(shingles, kept_shingles, shingle_index):
+                current['duplicates'] += 1
+                continue
+            
+            entry = format_item(len(current['entries']) + 1, index, text)
+            cost = estimate_tokens(entry) + (self._separator_tokens if current['entries'] else 0)
+            
+            if current['entries'] and current['tokens'] + cost > self.budget_tokens:
+                if max_shards and len(shards) >= max_shards:
+                    current['skipped'] += len(texts) - index
+                    break
+                
+                current = new_shard()
+                entry = format_item(1, index, text)
+                cost = estimate_tokens(entry)
+            
+            if cost > self.budget_tokens:
+                entry = self._truncate(format_item, len(current['entries']) + 1, index, text, self.budget_tokens)
+                if entry is None:
+                    current['skipped'] += 1
+                    continue
+                cost = estimate_tokens(entry)
+                current['truncated'] = True
+            
+            current['tokens'] += cost
+            current['entries'].append(entry)
+            current['indices'].append(index)
+            
+            kept_shingles.append(shingles)
+            for shingle in shingles:
+                shingle_index.setdefault(shingle, []).append(len(kept_shingles) - 1)
+        
+        for shard in shards:
+            shard['text'] = self.separator.join(shard.pop('entries'))
+        
+        return [shard for shard in shards if shard['indices']]
+    
+    def _is_duplicate(self, shingles, kept_shingles, shingle_index):
+        """与已选文本的Jaccard相似度是否达到阈值"""
+        if self.dedup_threshold is None or not kept_shingles:
+            return False
+        
+        overlaps = Counter(kept for shingle in shingles for kept in shingle_index.get(shingle, ()))
+        for kept, overlap in overlaps.items():
+            union = len(shingles) + len(kept_shingles[kept]) - overlap
+            if overlap / union >= self.dedup_threshold:
+                return True
+        
+        return False
+    
+    def _truncate(self, format_item, position, index, text, remaining):
+        """二分查找放得下的最长前缀，返回格式化后的条目，连格式本身都放不下时为None"""
+        low, high = 1, len(text)
+        best = None
+        
+        while low <= high:
+            mid = (low + high) // 2
+            entry = format_item(position, index, text[:mid] + _ELLIPSIS)
+            if estimate_tokens(entry) <= remaining:
+                best = entry
+                low = mid + 1
+            else:
+                high = mid - 1
+        
+        return best
+    
+    @staticmethod
+    def describe(result):
+        """打包结果的一行摘要"""
+        line = (f"选取 {len(result['indices'])} 条，估算 {result['tokens']}/{result['budget']} tokens"
+                f"（近似重复 {result['duplicates']} 条，超出预算 {result['skipped']} 条")
+        if result['truncated']:
+            line += "，最后一条已截断"
+        return line + "）"
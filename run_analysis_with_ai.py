@@ -43,8 +43,9 @@ def run_analysis_with_ai(api_key=None):
     # 调用AI分析
     ai_analysis_df = deepseek_analyzer.analyze_posts(
         posts_df, 
-        batch_size=10,  # 每批处理10条
-        delay=1         # 请求间隔1秒
+        concurrency=5,           # 同时5个请求
+        requests_per_minute=60,  # 每分钟最多60次请求
+        posts_per_request=5      # 每次请求合并5条帖子
     )
     
     if not ai_analysis_df.empty:
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量化评分引擎
+按规则表对候选股票特征DataFrame一次性计算全部子评分和总分
+
+规则类型:
+- range:     特征落在 [下限, 上限] 区间得分，按顺序取第一个命中的区间
+- flag:      布尔特征为真得分
+- count:     计数特征 × 单位分值，不超过上限
+- threshold: 特征大于阈值得分，按顺序取第一个命中的阈值
+- constant:  固定加分
+
+同一个评分列可以出现在多条规则中，得分累加
+"""
+
+import numpy as np
+
+
+# 通用A股评分规则（stock_screener / stock_screener_improved）
+STOCK_SCORE_RULES = [
+    # 股本匹配 (25分): 8-12亿股得25分，12-15亿股得20分
+    {'score': '股本匹配分', 'type': 'range', 'feature': '总股本(亿股)',
+     'ranges': [(8, 12, 25), (12, 15, 20)]},
+    
+    # 官方背书 (30分): 十大股东包含官方资本
+    {'score': '官方背书分', 'type': 'flag', 'feature': '官方背书', 'points': 30},
+    
+    # 增持动向 (20分): 近期有增持公告
+    {'score': '增持动向分', 'type': 'flag', 'feature': '增持动向', 'points': 20},
+    
+    # 题材热度 (15分): 每个命中的题材类别3分
+    {'score': '题材热度分', 'type': 'count', 'feature': '题材类别数', 'points': 3, 'cap': 15},
+    
+    # 分红预期 (10分): 股息率≥4%或高于行业平均(3%)得10分，>2%得5分，其余有分红得2分
+    {'score': '分红预期分', 'type': 'threshold', 'feature': '平均股息率',
+     'thresholds': [(0.03, 10), (0.02, 5), (0, 2)]},
+]
+
+# 黄金行业评分规则（gold_stock_screener）
+GOLD_SCORE_RULES = STOCK_SCORE_RULES + [
+    # 流通市值符合条件额外加5分（计入股本匹配分）
+    {'score': '股本匹配分', 'type': 'flag', 'feature': '市值匹配', 'points': 5},
+    
+    # 黄金行业固定加分
+    {'score': '黄金行业分', 'type': 'constant', 'points': 15},
+]
+
+
+def score_candidates(features_df, rules=STOCK_SCORE_RULES, total_column='总分'):
+    """
+    按规则表向量化计算评分
+    
+    参数:
+        features_df: 候选股票特征DataFrame，每行一只股票
+        rules: 评分规则表
+        total_column: 总分列名
+    
+    返回:
+        DataFrame: 原特征列 + 各子评分列 + 总分列
+    """
+    scored = features_df.copy()
+    n = len(scored)
+    
+    score_columns = []
+    for rule in rules:
+        if rule['score'] not in score_columns:
+            score_columns.append(rule['score'])
+            scored[rule['score']] = np.zeros(n, dtype=int)
+    
+    for rule in rules:
+        scored[rule['score']] += _apply_rule(scored, rule)
+    
+    scored[total_column] = scored[score_columns].sum(axis=1) if score_columns else 0
+    
+    return scored
+
+
+def _feature_values(df, feature, default):
+    """读取特征列，缺失列或空值按默认值处理"""
+    if feature not in df.columns:
+        return np.full(len(df), default)
+    
+    return df[feature].fillna(default).to_numpy()
+
+
+def _apply_rule(df, rule):
+    """计算单条规则的得分数组"""
+    rule_type = rule['type']
+    
+    if rule_type == 'range':
+        values = _feature_values(df, rule['feature'], np.nan).astype(float)
+        conditions = [(values >= low) & (values <= high) for low, high, _ in rule['ranges']]
+        choices = [points for _, _, points in rule['ranges']]
+        return np.select(conditions, choices, default=0)
+    
+    if rule_type == 'flag':
+        values = _feature_values(df, rule['feature'], False).astype(bool)
+        return np.where(values, rule['points'], 0)
+    
+    if rule_type == 'count':
+        values = _feature_values(df, rule['feature'], 0).astype(int)
+        return np.minimum(values * rule['points'], rule.get('cap', np.iinfo(int).max))
+    
+    if rule_type == 'threshold':
+        values = _feature_values(df, rule['feature'], 0).astype(float)
+        conditions = [values > threshold for threshold, _ in rule['thresholds']]
+        choices = [points for _, points in rule['thresholds']]
+        return np.select(conditions, choices, default=0)
+    
+    if rule_type == 'constant':
+        return np.full(len(df), rule['points'])
+    
+    raise ValueError(f"未知的评分规则类型: {rule_type}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选断点续跑
+长时间的逐只股票筛选在每只股票处理完成后立即追加写入当天的检查点文件（JSON Lines），
+进程崩溃或被超时终止后重新运行，只需处理尚未完成的股票
+
+用法:
+    checkpoint = ScreenCheckpoint('gold_stock_screener')
+    features_list = checkpoint.map(fetcher, collect_features, stocks, resume=True)
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+from market_snapshot import load_cache_config
+
+
+def _to_json_value(value):
+    """numpy标量等非原生类型转换为可序列化的值"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class StockFetchError(RuntimeError):
+    """单只股票的数据获取失败（区别于"未入选"），不写入检查点，续跑时重试"""
+
+
+class ScreenCheckpoint:
+    """按天划分的追加写入检查点"""
+    
+    def __init__(self, name, date=None, checkpoint_dir=None):
+        """
+        初始化检查点
+        
+        参数:
+            name: 筛选任务名（用作文件名前缀）
+            date: 日期字符串YYYYMMDD，默认今天
+            checkpoint_dir: 检查点目录，默认为缓存目录下的checkpoints
+        """
+        cache_config = load_cache_config()
+        
+        self.name = name
+        self.date = date or datetime.now().strftime('%Y%m%d')
+        self.checkpoint_dir = checkpoint_dir or cache_config.get(
+            'checkpoint_dir', os.path.join(cache_config['cache_dir'], 'checkpoints')
+        )
+        self.path = os.path.join(self.checkpoint_dir, f"{self.name}_{self.date}.jsonl")
+        
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """
+        读取今天已完成的股票
+        
+        返回:
+            dict: {股票代码: 特征字典或None}，None表示该股票已处理但未入选
+        """
+        done = {}
+        
+        if not os.path.exists(self.path):
+            return done
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程被终止时最后一行可能只写了一半
+                    continue
+                done[record['code']] = record['result']
+        
+        return done
+    
+    def append(self, stock_code, result):
+        """
+        追加一只股票的处理结果并立即刷新到磁盘
+        
+        参数:
+            stock_code: 股票代码
+            result: 特征字典，未入选时为None
+        """
+        line = json.dumps({'code': str(stock_code), 'result': result},
+                          ensure_ascii=False, default=_to_json_value) + '\n'
+        
+        with self._lock:
+            with open(self.path, 'a+b') as f:
+                # 上次被终止时最后一行可能只写了一半：先换行，避免新记录接在残行后一起丢失
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = '\n' + line
+                f.write(line.encode('utf-8'))
+                f.flush()
+    
+    def reset(self):
+        """清空今天的检查点，并删除同一任务以前日期的检查点文件"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        
+        prefix = f"{self.name}_"
+        for filename in os.listdir(self.checkpoint_dir):
+            if filename.startswith(prefix) and filename.endswith('.jsonl'):
+                os.remove(os.path.join(self.checkpoint_dir, filename))
+    
+    def map(self, fetcher, func, stocks, resume=True):
+        """
+        带检查点的并发处理
+        
+        参数:
+            fetcher: FetchExecutor
+            func: 单只股票处理函数，参数为stocks中元组展开；
+                  抛出异常（如StockFetchError）的股票不写入检查点，续跑时重新处理
+            stocks: 任务元组列表，第一个元素为股票代码
+            resume: 是否跳过今天已完成的股票；False时从头开始
+        
+        返回:
+            list: 与stocks一一对应的结果（含检查点中已有的结果），处理失败的股票为None
+        """
+        if resume:
+            done = self.load()
+        else:
+            self.reset()
+            done = {}
+        
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        
+        pending = [stock for stock in stocks if str(stock[0]) not in done]
+        if done:
+            print(f"断点续跑: 今天已完成 {len(stocks) - len(pending)} 只，剩余 {len(pending)} 只")
+        
+        def task(stock):
+            result = func(*stock)
+            self.append(stock[0], result)
+            return result
+        
+        new_results = dict(zip(
+            (str(stock[0]) for stock in pending),
+            fetcher.map(task, pending)
+        ))
+        
+        return [done[str(stock[0])] if str(stock[0]) in done else new_results[str(stock[0])]
+                for stock in stocks]
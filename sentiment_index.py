@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+舆情语料倒排索引
+Discovery_Engine和微博分析每次保存新数据时增量写入索引，
+索引从 股票代码/关键词 指向帖子ID，倒排记录中携带粉丝数和平台，
+各消费方无需再逐条扫描全部舆情文本
+
+存储（SQLite）:
+    posts:    帖子ID → 原文、来源、平台、粉丝数
+    postings: (词项, 帖子ID) → 粉丝数、平台，词项为股票代码或关键词
+    stock_names: 股票简称 → 代码（按简称查询时使用）
+
+用法:
+    index = get_sentiment_index()
+    index.add_posts([{'text': ..., 'source': '微博', 'platform': '微博', 'followers': 120000}])
+    index.lookup('600547', keywords='high_priority', min_followers=100000)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from market_snapshot import load_cache_config
+from multi_pattern_matcher import AhoCorasick
+from stock_names import StockNameDictionary, get_stock_name_dictionary, load_stock_name_config
+
+
+# 舆情关键词（按优先级分层）
+SENTIMENT_KEYWORDS = {
+    'high_priority': ['重组', '并购', '收购', '入股', '利好', '涨停', '突破'],
+    'medium_priority': ['增持', '回购', '业绩', '盈利', '分红'],
+    'low_priority': ['关注', '看好', '推荐']
+}
+
+# 文本中的A股代码（前后不能紧邻其他数字）
+STOCK_CODE_PATTERN = re.compile(r'(?<!\d)[036]\d{5}(?!\d)')
+
+# SQLite单条语句的参数个数上限以内的分批大小
+_BATCH_SIZE = 500
+
+
+def make_post_id(text, platform=''):
+    """
+    帖子ID：平台 + 原文的哈希，同一帖子重复保存时ID不变
+    
+    参数:
+        text: 帖子原文
+        platform: 平台
+    
+    返回:
+        str: 16位十六进制ID
+    """
+    return hashlib.sha1(f"{platform}\n{text}".encode('utf-8')).hexdigest()[:16]
+
+
+class SentimentIndex:
+    """舆情倒排索引"""
+    
+    def __init__(self, db_path=None, stock_names=None, keywords=None):
+        """
+        初始化索引
+        
+        参数:
+            db_path: SQLite文件路径，默认为缓存目录下的sentiment_index.db
+            stock_names: StockNameDictionary或{股票简称: 代码}，默认取全市场股票简称字典；
+                         简称识别与其他模块一致（最左最长、别名、歧义简称需同时出现代码）
+            keywords: {层级: 关键词列表}，默认SENTIMENT_KEYWORDS
+        """
+        cache_config = load_cache_config()
+        
+        self.db_path = db_path or os.path.join(cache_config['cache_dir'], 'sentiment_index.db')
+        self.keywords = keywords or SENTIMENT_KEYWORDS
+        
+        if isinstance(stock_names, dict):
+            name_config = load_stock_name_config()
+            stock_names = StockNameDictionary(
+                [(code, name) for name, code in stock_names.items()], name_config['aliases'],
+                name_config['min_name_length'], name_config['ambiguous_names']
+            )
+        
+        self._stock_dictionary = stock_names
+        self._matcher = None
+        self._lock = threading.Lock()
+        
+        self._init_db()
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _init_db(self):
+        """创建索引表"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " post_id TEXT PRIMARY KEY,"
+                " text TEXT NOT NULL,"
+                " source TEXT,"
+                " platform TEXT,"
+                " followers INTEGER,"
+                " indexed_at REAL NOT NULL)"
+            )
+            # 以(词项, 帖子ID)为聚簇主键，同一词项的倒排记录连续存放
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " term TEXT NOT NULL,"
+                " term_type TEXT NOT NULL,"
+                " post_id TEXT NOT NULL,"
+                " followers INTEGER,"
+                " platform TEXT,"
+                " PRIMARY KEY (term, post_id)) WITHOUT ROWID"
+            )
+            # 关键词与股票求交集时按帖子ID反查
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_post ON postings (post_id, term)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock_names ("
+                " name TEXT PRIMARY KEY,"
+                " code TEXT NOT NULL)"
+            )
+    
+    def _get_matcher(self):
+        """构建 股票简称 + 关键词 的匹配自动机（首次写入时构建一次）"""
+        with self._lock:
+            if self._matcher is not None:
+                return self._matcher
+            
+            if self._stock_dictionary is None:
+                self._stock_dictionary = get_stock_name_dictionary()
+            
+            matcher = AhoCorasick()
+            for name in self._stock_dictionary.names:
+                matcher.add(name, ('name', name))
+            for tier_keywords in self.keywords.values():
+                for keyword in tier_keywords:
+                    matcher.add(keyword, ('keyword', keyword))
+            matcher.build()
+            
+            # 记录简称映射，供其他进程按简称查询
+            if self._stock_dictionary.names:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO stock_names (name, code) VALUES (?, ?)",
+                        self._stock_dictionary.names.items()
+                    )
+            
+            self._matcher = matcher
+            return matcher
+    
+    def tokenize(self, text):
+        """
+        提取帖子中的词项
+        
+        参数:
+            text: 帖子原文
+        
+        返回:
+            set: {('stock', 代码), ('keyword', 关键词)}
+        """
+        terms = set()
+        name_matches = []
+        for start, end, (term_type, term) in self._get_matcher().iter_matches(text):
+            if term_type == 'name':
+                name_matches.append((start, end, term))
+            else:
+                terms.add((term_type, term))
+        
+        # 简称交给字典取舍：重叠命中取最左最长，歧义简称需同时出现代码
+        terms.update(('stock', code) for _, _, _, code in self._stock_dictionary.find(text, name_matches))
+        terms.update(('stock', code) for code in STOCK_CODE_PATTERN.findall(text))
+        return terms
+    
+    def add_posts(self, posts):
+        """
+        增量写入帖子，已索引过的帖子跳过
+        
+        参数:
+            posts: 帖子字典列表，字段 text / source / platform / followers
+        
+        返回:
+            int: 新增帖子数
+        """
+        records = {}
+        for post in posts:
+            text = str(post.get('text', '') or '')
+            if not text.strip():
+                continue
+            
+            platform = post.get('platform', '')
+            followers = pd.to_numeric(post.get('followers', 0), errors='coerce')
+            followers = 0 if pd.isna(followers) else int(followers)
+            records.setdefault(make_post_id(text, platform),
+                               (text, post.get('source', ''), platform, followers))
+        
+        # 先剔除已索引的帖子，全部已存在时不必构建自动机
+        post_ids = list(records)
+        with self._connect() as conn:
+            for start in range(0, len(post_ids), _BATCH_SIZE):
+                batch = post_ids[start:start + _BATCH_SIZE]
+                for (post_id,) in conn.execute(
+                    f"SELECT post_id FROM posts WHERE post_id IN ({','.join('?' * len(batch))})", batch
+                ):
+                    records.pop(post_id, None)
+        
+        if not records:
+            return 0
+        
+        self._get_matcher()
+        now = time.time()
+        added = 0
+        
+        with self._connect() as conn:
+            for post_id, (text, source, platform, followers) in records.items():
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO posts (post_id, text, source, platform, followers, indexed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (post_id, text, source, platform, followers, now)
+                )
+                # 其他进程可能已同时写入
+                if not cursor.rowcount:
+                    continue
+                
+                conn.executemany(
+                    "INSERT OR IGNORE INTO postings (term, term_type, post_id, followers, platform)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [(term, term_type, post_id, followers, platform)
+                     for term_type, term in self.tokenize(text)]
+                )
+                added += 1
+        
+        return added
+    
+    def resolve_stock(self, stock):
+        """
+        股票简称或代码 → 代码
+        
+        参数:
+            stock: 股票代码或简称
+        
+        返回:
+            str: 股票代码，无法识别时为None
+        """
+        stock = str(stock).strip()
+        if re.fullmatch(r'\d{6}', stock):
+            return stock
+        
+        with self._connect() as conn:
+            row = conn.execute("SELECT code FROM stock_names WHERE name = ?", (stock,)).fetchone()
+        
+        if row:
+            return row[0]
+        if self._stock_dictionary is not None:
+            return self._stock_dictionary.names.get(stock)
+        return None
+    
+    def _expand_keywords(self, keywords):
+        """关键词参数可以是层级名（如'high_priority'）或关键词列表"""
+        if keywords is None:
+            return None
+        if isinstance(keywords, str):
+            return list(self.keywords.get(keywords, [keywords]))
+        return list(keywords)
+    
+    def _build_query(self, stock=None, keywords=None, min_followers=0, platform=None):
+        """
+        构造lookup/count共用的 FROM ... WHERE 子句
+        
+        返回:
+            tuple: (SQL子句, 参数列表)，股票无法识别时为 (None, None)
+        """
+        keywords = self._expand_keywords(keywords)
+        
+        if stock is not None:
+            code = self.resolve_stock(stock)
+            if code is None:
+                return None, None
+            sql = " FROM postings p WHERE p.term = ? AND p.term_type = 'stock'"
+            params = [code]
+            
+            if keywords:
+                sql += (" AND EXISTS (SELECT 1 FROM postings k WHERE k.post_id = p.post_id"
+                        f" AND k.term_type = 'keyword' AND k.term IN ({','.join('?' * len(keywords))}))")
+                params.extend(keywords)
+        
+        elif keywords:
+            sql = f" FROM postings p WHERE p.term_type = 'keyword' AND p.term IN ({','.join('?' * len(keywords))})"
+            params = list(keywords)
+        
+        else:
+            sql = " FROM posts p WHERE 1 = 1"
+            params = []
+        
+        if min_followers:
+            sql += " AND p.followers >= ?"
+            params.append(int(min_followers))
+        if platform:
+            sql += " AND p.platform = ?"
+            params.append(platform)
+        
+        return sql, params
+    
+    def lookup(self, stock=None, keywords=None, min_followers=0, platform=None):
+        """
+        查询提及某只股票和/或含指定关键词的帖子
+        
+        参数:
+            stock: 股票代码或简称，None表示不限股票
+            keywords: 关键词列表或层级名，同时指定stock时取交集（含任一关键词即可）
+            min_followers: 最低粉丝数
+            platform: 限定平台
+        
+        返回:
+            DataFrame: 列为 post_id / followers / platform，按粉丝数降序
+        """
+        empty = pd.DataFrame(columns=['post_id', 'followers', 'platform'])
+        
+        sql, params = self._build_query(stock, keywords, min_followers, platform)
+        if sql is None:
+            return empty
+        
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT p.post_id, p.followers, p.platform" + sql + " ORDER BY p.followers DESC", params
+            ).fetchall()
+        
+        if not rows:
+            return empty
+        return pd.DataFrame(rows, columns=['post_id', 'followers', 'platform'])
+    
+    def count(self, stock=None, keywords=None, min_followers=0, platform=None):
+        """
+        统计命中帖子数，参数同lookup（直接在索引上计数，不取回帖子列表）
+        
+        返回:
+            int: 帖子数
+        """
+        sql, params = self._build_query(stock, keywords, min_followers, platform)
+        if sql is None:
+            return 0
+        
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(DISTINCT p.post_id)" + sql, params).fetchone()[0]
+    
+    def get_posts(self, post_ids):
+        """
+        按ID取回帖子原文
+        
+        参数:
+            post_ids: 帖子ID列表
+        
+        返回:
+            DataFrame: 列为 post_id / text / source / platform / followers，保持输入顺序
+        """
+        post_ids = list(post_ids)
+        rows = []
+        
+        with self._connect() as conn:
+            for start in range(0, len(post_ids), _BATCH_SIZE):
+                batch = post_ids[start:start + _BATCH_SIZE]
+                rows.extend(conn.execute(
+                    "SELECT post_id, text, source, platform, followers FROM posts"
+                    f" WHERE post_id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+        
+        df = pd.DataFrame(rows, columns=['post_id', 'text', 'source', 'platform', 'followers'])
+        return df.set_index('post_id').reindex(post_ids).dropna(subset=['text']).reset_index()
+    
+    def summary(self):
+        """索引规模摘要"""
+        with self._connect() as conn:
+            posts = conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+            stocks = conn.execute(
+                "SELECT COUNT(DISTINCT term) FROM postings WHERE term_type = 'stock'"
+            ).fetchone()[0]
+        return f"舆情索引: {posts} 条帖子，涉及 {stocks} 只股票"
+    
+    def index_history(self, history_dir='discovery_history', weibo_dir='.'):
+        """
+        把已有的全网雷达和微博数据文件补录进索引
+        
+        参数:
+            history_dir: Discovery_Engine历史数据目录
+            weibo_dir: 微博清洗数据CSV所在目录
+        
+        返回:
+            int: 新增帖子数
+        """
+        added = 0
+        
+        if os.path.exists(history_dir):
+            for filename in sorted(os.listdir(history_dir)):
+                if not (filename.startswith('discovery_') and filename.endswith('.json')):
+                    continue
+                try:
+                    with open(os.path.join(history_dir, filename), 'r', encoding='utf-8') as f:
+                        texts = json.load(f).get('texts', [])
+                    added += self.add_posts(discovery_posts(texts))
+                except Exception as e:
+                    print(f"  ⚠️  补录 {filename} 失败: {e}")
+        
+        for filename in sorted(os.listdir(weibo_dir)):
+            if not (filename.startswith('weibo_clean') and filename.endswith('.csv')):
+                continue
+            try:
+                df_weibo = pd.read_csv(os.path.join(weibo_dir, filename), encoding='utf-8-sig')
+                added += self.add_posts(weibo_posts(df_weibo))
+            except Exception as e:
+                print(f"  ⚠️  补录 {filename} 失败: {e}")
+        
+        return added
+
+
+def discovery_posts(texts):
+    """全网雷达文本 → 索引帖子（与QuantPicker._load_sentiment_data的字段一致）"""
+    return [{'text': text, 'source': '全网雷达', 'followers': 10000, 'platform': '小红书+微博'}
+            for text in texts]
+
+
+def weibo_posts(df_weibo):
+    """微博清洗数据 → 索引帖子（与QuantPicker._load_sentiment_data的字段一致）"""
+    texts = df_weibo['博文内容'].astype(str) if '博文内容' in df_weibo else pd.Series('', index=df_weibo.index)
+    followers = df_weibo['粉丝数'] if '粉丝数' in df_weibo else pd.Series(1000, index=df_weibo.index)
+    return [{'text': text, 'source': '微博', 'followers': count, 'platform': '微博'}
+            for text, count in zip(texts, followers)]
+
+
+# 进程内共享实例
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_sentiment_index():
+    """
+    获取进程内共享的舆情索引
+    
+    返回:
+        SentimentIndex: 所有模块共用的索引
+    """
+    global _shared_index
+    
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = SentimentIndex()
+        return _shared_index
+
+
+def main():
+    """补录已有的舆情数据文件"""
+    index = get_sentiment_index()
+    added = index.index_history()
+    print(f"✓ 新增索引 {added} 条帖子")
+    print(index.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐只股票慢变数据的磁盘缓存
+股东户数、分红、历史公告等数据按季度或按天更新，缓存到SQLite避免每次运行都重新下载
+
+机制:
+1. 按 (数据集, 键) 存储DataFrame，每个数据集独立配置有效期
+2. 过期但仍在宽限期内的数据先返回旧值，后台线程异步刷新（stale-while-revalidate）
+3. 按报告期失效：跨过季度末后，季度数据（如股东户数）在新报告期之前获取的缓存全部失效；
+   也可调用 invalidate_before 手动清除某个报告期之前的数据
+4. 下载失败时使用任意过期的缓存
+
+用法:
+    cache = get_stock_data_cache()
+    holders = cache.get_or_fetch('stock_zh_a_gdhs', code,
+                                 lambda: fetcher.call('stock_zh_a_gdhs', lambda: ak.stock_zh_a_gdhs(symbol=code)))
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from market_snapshot import load_cache_config
+
+
+DAY = 24 * 3600
+
+# 各数据集默认配置（可在config.py的CACHE_CONFIG['datasets']中覆盖）
+DEFAULT_DATASET_CONFIG = {
+    # 股东户数：季度更新
+    'stock_zh_a_gdhs': {
+        'ttl': 7 * DAY,            # 有效期（秒）
+        'stale_ttl': 30 * DAY,     # 过期后仍可先返回旧值的宽限期（秒）
+        'date_column': '股东户数统计截止日',
+        'period': 'quarter'        # 跨过季度末后旧缓存失效
+    },
+    # 分红：按年度/半年度更新
+    'stock_zh_a_dividend': {
+        'ttl': 7 * DAY,
+        'stale_ttl': 90 * DAY,
+        'date_column': '公告日期',
+        'period': 'quarter'
+    },
+    # 历史公告：按天更新
+    'stock_zh_a_hist_notice': {
+        'ttl': 12 * 3600,
+        'stale_ttl': 2 * DAY,
+        'date_column': '公告日期',
+        'period': None
+    },
+    # 个股新闻：盘中持续更新
+    'stock_news_em': {
+        'ttl': 1800,
+        'stale_ttl': 1800,
+        'date_column': '发布时间',
+        'period': None
+    }
+}
+
+# 未配置的数据集使用的默认值
+FALLBACK_DATASET_CONFIG = {'ttl': DAY, 'stale_ttl': DAY, 'date_column': None, 'period': None}
+
+
+def latest_quarter_end(now=None):
+    """
+    最近一个已经过去的季度末
+    
+    参数:
+        now: 当前时间，默认datetime.now()
+    
+    返回:
+        datetime: 季度末当天0点（3/31、6/30、9/30、12/31）
+    """
+    now = now or datetime.now()
+    
+    quarter_ends = [(3, 31), (6, 30), (9, 30), (12, 31)]
+    for month, day in reversed(quarter_ends):
+        candidate = datetime(now.year, month, day)
+        if candidate <= now:
+            return candidate
+    
+    return datetime(now.year - 1, 12, 31)
+
+
+class StockDataCache:
+    """逐只股票慢变数据的SQLite缓存"""
+    
+    def __init__(self, db_path=None, datasets=None, background_workers=2, max_pending_refresh=None):
+        """
+        初始化缓存
+        
+        参数:
+            db_path: SQLite文件路径，默认为缓存目录下的stock_data.db
+            datasets: {数据集名: 配置}，覆盖默认配置中的对应字段
+            background_workers: 后台刷新线程数
+            max_pending_refresh: 同时排队/执行的后台刷新上限，超出时本次不刷新（仍返回旧值）
+        """
+        cache_config = load_cache_config()
+        
+        self.db_path = db_path or os.path.join(cache_config['cache_dir'], 'stock_data.db')
+        
+        self.datasets = {name: dict(conf) for name, conf in DEFAULT_DATASET_CONFIG.items()}
+        for overrides in (cache_config.get('datasets', {}), datasets or {}):
+            for name, conf in overrides.items():
+                self.datasets.setdefault(name, dict(FALLBACK_DATASET_CONFIG)).update(conf)
+        
+        self.stats = {'hit': 0, 'stale': 0, 'miss': 0, 'error': 0}
+        
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.background_workers = background_workers
+        self.max_pending_refresh = (max_pending_refresh if max_pending_refresh is not None
+                                    else cache_config.get('max_pending_refresh', 64))
+        # 后台刷新线程池按需创建，close()之后再次需要时重新创建
+        self._background = None
+        
+        self._init_db()
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _init_db(self):
+        """创建缓存表"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock_data ("
+                " dataset TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " payload BLOB NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " report_date TEXT,"
+                " PRIMARY KEY (dataset, key))"
+            )
+    
+    def _config(self, dataset):
+        return self.datasets.get(dataset, FALLBACK_DATASET_CONFIG)
+    
+    def get_or_fetch(self, dataset, key, fetch_func):
+        """
+        读取缓存，缺失或过期时调用fetch_func获取并写入
+        
+        参数:
+            dataset: 数据集名（通常为akshare函数名）
+            key: 缓存键（通常为股票代码）
+            fetch_func: 无参获取函数，返回DataFrame
+        
+        返回:
+            DataFrame: 缓存或新获取的数据；获取失败且无任何缓存时抛出原异常
+        """
+        key = str(key)
+        entry = self._read(dataset, key)
+        state = self._state(dataset, entry)
+        
+        if state == 'fresh':
+            self._count('hit')
+            return entry[0]
+        
+        if state == 'stale':
+            self._count('stale')
+            self._schedule_refresh(dataset, key, fetch_func)
+            return entry[0]
+        
+        self._count('miss')
+        try:
+            return self._fetch_and_store(dataset, key, fetch_func)
+        except Exception:
+            self._count('error')
+            if entry is not None:
+                age_days = (time.time() - entry[1]) / DAY
+                print(f"    ⚠️  {dataset} {key} 获取失败，使用过期缓存（{age_days:.1f}天前）")
+                return entry[0]
+            raise
+    
+    def _state(self, dataset, entry):
+        """
+        判断缓存状态
+        
+        返回:
+            str: 'fresh'（有效）、'stale'（过期但可先返回）或 'expired'（需同步获取）
+        """
+        if entry is None:
+            return 'expired'
+        
+        conf = self._config(dataset)
+        fetched_at = entry[1]
+        
+        # 跨过报告期后，旧报告期内获取的数据不再使用
+        if conf.get('period') == 'quarter' and fetched_at < latest_quarter_end().timestamp():
+            return 'expired'
+        
+        age = time.time() - fetched_at
+        if age < conf['ttl']:
+            return 'fresh'
+        if age < conf['ttl'] + conf['stale_ttl']:
+            return 'stale'
+        return 'expired'
+    
+    def _fetch_and_store(self, dataset, key, fetch_func):
+        """同步获取并写入缓存"""
+        df = fetch_func()
+        if df is None:
+            df = pd.DataFrame()
+        
+        self._write(dataset, key, df)
+        return df
+    
+    def _schedule_refresh(self, dataset, key, fetch_func):
+        """提交后台刷新任务，同一键同时只刷新一次；排队数达到上限时跳过"""
+        def refresh():
+            try:
+                self._fetch_and_store(dataset, key, fetch_func)
+            except Exception as e:
+                self._count('error')
+                print(f"    ⚠️  后台刷新 {dataset} {key} 失败: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard((dataset, key))
+        
+        with self._lock:
+            if (dataset, key) in self._refreshing:
+                return
+            if len(self._refreshing) >= self.max_pending_refresh:
+                return
+            
+            if self._background is None:
+                self._background = ThreadPoolExecutor(max_workers=self.background_workers)
+            self._refreshing.add((dataset, key))
+            self._background.submit(refresh)
+    
+    def wait_for_refresh(self):
+        """等待所有已提交的后台刷新完成"""
+        self.close(cancel_pending=False)
+    
+    def close(self, cancel_pending=True):
+        """
+        关闭后台刷新线程池
+        
+        线程池的工作线程不是守护线程，未处理的刷新任务会让进程退出时一直等待；
+        筛选结束后调用本方法丢弃排队中的刷新（正在执行的刷新仍会完成），之后再有刷新时重新创建线程池
+        
+        参数:
+            cancel_pending: True时取消尚未开始的刷新并立即返回；False时等待全部刷新完成
+        """
+        with self._lock:
+            background, self._background = self._background, None
+        
+        if background is None:
+            return
+        
+        background.shutdown(wait=not cancel_pending, cancel_futures=cancel_pending)
+        
+        if cancel_pending:
+            # 被取消的任务不会执行finally，清空标记以便下次重新刷新
+            with self._lock:
+                self._refreshing.clear()
+    
+    def _report_date(self, dataset, df):
+        """提取数据中最新的报告日期（YYYY-MM-DD），无法提取时为None"""
+        column = self._config(dataset).get('date_column')
+        
+        if not column or df.empty or column not in df.columns:
+            return None
+        
+        dates = pd.to_datetime(df[column], errors='coerce').dropna()
+        if dates.empty:
+            return None
+        
+        return dates.max().strftime('%Y-%m-%d')
+    
+    def _read(self, dataset, key):
+        """
+        读取缓存条目
+        
+        返回:
+            tuple: (DataFrame, 获取时间戳, 报告日期)，不存在或损坏时为None
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload, fetched_at, report_date FROM stock_data WHERE dataset = ? AND key = ?",
+                    (dataset, key)
+                ).fetchone()
+        except Exception as e:
+            print(f"    ⚠️  读取缓存失败 ({dataset} {key}): {e}")
+            return None
+        
+        if row is None:
+            return None
+        
+        try:
+            return pickle.loads(row[0]), row[1], row[2]
+        except Exception:
+            return None
+    
+    def _write(self, dataset, key, df):
+        """写入缓存条目"""
+        report_date = self._report_date(dataset, df)
+        
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO stock_data (dataset, key, payload, fetched_at, report_date) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (dataset, key, pickle.dumps(df), time.time(), report_date)
+                )
+        except Exception as e:
+            print(f"    ⚠️  写入缓存失败 ({dataset} {key}): {e}")
+    
+    def invalidate(self, dataset=None, key=None):
+        """
+        删除缓存条目
+        
+        参数:
+            dataset: 数据集名，为None时清空全部
+            key: 缓存键，为None时清空整个数据集
+        """
+        sql, params = "DELETE FROM stock_data", []
+        
+        if dataset is not None:
+            sql += " WHERE dataset = ?"
+            params.append(dataset)
+            if key is not None:
+                sql += " AND key = ?"
+                params.append(str(key))
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(sql, params)
+    
+    def invalidate_before(self, dataset, report_date):
+        """
+        删除报告日期早于指定日期的缓存（新报告期披露后调用）
+        
+        没有报告日期的条目（如空数据）按获取时间判断
+        
+        参数:
+            dataset: 数据集名
+            report_date: 报告日期，'YYYY-MM-DD' 或 datetime
+        
+        返回:
+            int: 删除的条目数
+        """
+        report_date = pd.Timestamp(report_date)
+        
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM stock_data WHERE dataset = ? AND "
+                "(report_date < ? OR (report_date IS NULL AND fetched_at < ?))",
+                (dataset, report_date.strftime('%Y-%m-%d'), report_date.timestamp())
+            )
+            return cursor.rowcount
+    
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+    
+    def summary(self):
+        """缓存命中统计文本"""
+        total = self.stats['hit'] + self.stats['stale'] + self.stats['miss']
+        hit_rate = (self.stats['hit'] + self.stats['stale']) / total * 100 if total else 0
+        
+        return (f"缓存命中 {self.stats['hit']} 次，过期命中 {self.stats['stale']} 次，"
+                f"未命中 {self.stats['miss']} 次（命中率 {hit_rate:.1f}%）")
+
+
+# 进程内共享实例
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_stock_data_cache():
+    """
+    获取进程内共享的慢变数据缓存
+    
+    返回:
+        StockDataCache: 共享缓存
+    """
+    global _shared_cache
+    
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = StockDataCache()
+        return _shared_cache
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量个股基本面数据
+从全市场行情快照批量推导 总股本/流通股/流通市值/最新价，
+仅对快照中缺失字段的股票回退到 ak.stock_individual_info_em 单只查询
+
+字段单位与 stock_individual_info_em 保持一致（股本: 股，市值: 元），
+各筛选器原有的解析逻辑无需修改
+"""
+
+import akshare as ak
+import pandas as pd
+import numpy as np
+import threading
+import warnings
+
+from market_snapshot import get_market_snapshot
+from fetch_executor import get_fetch_executor
+
+warnings.filterwarnings('ignore')
+
+
+# 基本面字段（与stock_individual_info_em的item名称一致）
+BASIC_INFO_FIELDS = ['最新', '总股本', '流通股', '总市值', '流通市值']
+
+
+class FundamentalsProvider:
+    """批量基本面数据提供器"""
+    
+    def __init__(self, snapshot=None):
+        """
+        初始化提供器
+        
+        参数:
+            snapshot: MarketSnapshot实例，默认使用进程内共享快照
+        """
+        self.market_snapshot = snapshot or get_market_snapshot()
+        
+        # 已解析的基本面数据（按股票代码索引）
+        self._frame = pd.DataFrame(columns=['股票简称'] + BASIC_INFO_FIELDS)
+        self._lock = threading.Lock()
+        
+        # 单只查询回退次数（用于评估批量覆盖率）
+        self.fallback_count = 0
+    
+    def get_fundamentals(self, stock_codes, fallback=True):
+        """
+        批量获取基本面数据
+        
+        参数:
+            stock_codes: 股票代码列表
+            fallback: 快照缺失字段时是否回退到单只查询
+        
+        返回:
+            DataFrame: 以股票代码为索引，列为 股票简称 + BASIC_INFO_FIELDS
+        """
+        codes = list(dict.fromkeys(str(code).zfill(6) for code in stock_codes))
+        
+        with self._lock:
+            new_codes = [code for code in codes if code not in self._frame.index]
+        
+        if new_codes:
+            derived = self._derive_from_snapshot(new_codes)
+            
+            # 快照中完全不存在或字段缺失的股票
+            incomplete = [
+                code for code in new_codes
+                if code not in derived.index or derived.loc[code, BASIC_INFO_FIELDS].isna().any()
+            ]
+            
+            if fallback and incomplete:
+                print(f"  快照缺失 {len(incomplete)} 只股票的基本面字段，单只补充查询...")
+                for code in incomplete:
+                    derived = self._fill_from_individual(derived, code)
+            
+            with self._lock:
+                if self._frame.empty:
+                    self._frame = derived
+                elif not derived.empty:
+                    self._frame = pd.concat([self._frame, derived])
+                    self._frame = self._frame[~self._frame.index.duplicated(keep='last')]
+        
+        with self._lock:
+            return self._frame.reindex(codes)
+    
+    def get_basic_info(self, stock_code):
+        """
+        获取单只股票的基本面字典（兼容stock_individual_info_em转换后的info_dict）
+        
+        参数:
+            stock_code: 股票代码
+        
+        返回:
+            dict: {'股票代码', '股票简称', '最新', '总股本', ...}，无数据时为空字典
+        """
+        code = str(stock_code).zfill(6)
+        row = self.get_fundamentals([code]).loc[code]
+        
+        info_dict = {'股票代码': code}
+        for field, value in row.items():
+            if not pd.isna(value):
+                info_dict[field] = value
+        
+        if not any(field in info_dict for field in BASIC_INFO_FIELDS):
+            return {}
+        
+        return info_dict
+    
+    def prefilter(self, stock_codes, shares_range=(8, 15), circulating_cap_range=(105, 195)):
+        """
+        在行情快照上按股本和流通市值批量预筛（不发起单只查询）
+        
+        快照缺少字段、无法判断的股票（如停牌）保留，交由后续逐只检查
+        
+        参数:
+            stock_codes: 股票代码列表
+            shares_range: 总股本区间（亿股）
+            circulating_cap_range: 流通市值区间（亿元）
+        
+        返回:
+            list: 通过预筛的股票代码（保持输入顺序）
+        """
+        codes = list(dict.fromkeys(str(code).zfill(6) for code in stock_codes))
+        derived = self._derive_from_snapshot(codes).reindex(codes)
+        
+        total_shares = derived['总股本'] / 1e8
+        circulating_cap = derived['流通市值'] / 1e8
+        
+        keep = (
+            (total_shares.between(*shares_range) | total_shares.isna()) &
+            (circulating_cap.between(*circulating_cap_range) | circulating_cap.isna())
+        )
+        
+        return list(derived.index[keep])
+    
+    def _derive_from_snapshot(self, stock_codes):
+        """从行情快照推导基本面字段（股本 = 市值 / 最新价）"""
+        snapshot = self.market_snapshot.get_stocks(stock_codes)
+        
+        if snapshot.empty:
+            return pd.DataFrame(columns=['股票简称'] + BASIC_INFO_FIELDS)
+        
+        price = snapshot['最新价'].where(snapshot['最新价'] > 0)
+        
+        derived = pd.DataFrame({
+            '股票简称': snapshot['名称'].values,
+            '最新': price.values,
+            '总股本': (snapshot['总市值'] / price).round().values,
+            '流通股': (snapshot['流通市值'] / price).round().values,
+            '总市值': snapshot['总市值'].values,
+            '流通市值': snapshot['流通市值'].values
+        }, index=snapshot['代码'].values)
+        
+        return derived.replace([np.inf, -np.inf], np.nan)
+    
+    def _fill_from_individual(self, derived, stock_code):
+        """单只查询补齐缺失字段，只覆盖快照中为空的值"""
+        try:
+            stock_info = get_fetch_executor().call(
+                'stock_individual_info_em', lambda: ak.stock_individual_info_em(symbol=stock_code)
+            )
+            self.fallback_count += 1
+            
+            info_dict = {}
+            for _, row in stock_info.iterrows():
+                info_dict[row['item']] = row['value']
+        
+        except Exception as e:
+            print(f"    获取股票 {stock_code} 基本信息失败: {e}")
+            return derived
+        
+        if stock_code not in derived.index:
+            derived.loc[stock_code] = np.nan
+        
+        if pd.isna(derived.loc[stock_code, '股票简称']) and '股票简称' in info_dict:
+            derived.loc[stock_code, '股票简称'] = info_dict['股票简称']
+        
+        for field in BASIC_INFO_FIELDS:
+            if pd.isna(derived.loc[stock_code, field]) and field in info_dict:
+                derived.loc[stock_code, field] = pd.to_numeric(info_dict[field], errors='coerce')
+        
+        return derived
+
+
+# 进程内共享实例
+_shared_provider = None
+_shared_lock = threading.Lock()
+
+
+def get_fundamentals_provider():
+    """
+    获取进程内共享的基本面数据提供器
+    
+    返回:
+        FundamentalsProvider: 所有筛选器共用的提供器
+    """
+    global _shared_provider
+    
+    with _shared_lock:
+        if _shared_provider is None:
+            _shared_provider = FundamentalsProvider()
+        return _shared_provider
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场股票简称字典
+从 ak.stock_info_a_code_name 构建 简称 → 代码 的字典（含去掉ST/N/C等前缀、-U/-W等后缀的简称），
+缓存到磁盘并每天刷新一次，编译成Aho-Corasick自动机：每条帖子扫描一遍即可识别约5000只股票，
+耗时与原来逐个检查20个简称相当
+
+重叠命中按"最左最长"取舍：文本"中金黄金"同时命中"中金"和"中金黄金"时只保留"中金黄金"
+
+与常用词相同的简称（如"机器人""太阳能""新希望"）是歧义简称：只有同一文本中也出现了该股票代码时才算提及，
+避免板块讨论被归到这些股票上；名单见STOCK_NAME_CONFIG['ambiguous_names']
+
+用法:
+    dictionary = get_stock_name_dictionary()
+    dictionary.identify('山东黄金放量突破，中金黄金跟涨')   # ['山东黄金(600547)', '中金黄金(600489)']
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime
+
+from market_snapshot import load_cache_config
+from multi_pattern_matcher import AhoCorasick
+
+
+# 默认配置（可在config.py的STOCK_NAME_CONFIG中覆盖）
+DEFAULT_STOCK_NAME_CONFIG = {
+    'min_name_length': 3,   # 短于该长度的简称不参与识别（避免"中国"之类的误判），aliases不受限制
+    'aliases': {},          # 额外的 {别名: 代码}，如 {'茅台': '600519'}
+    
+    # 与常用词相同的简称：文本中同时出现股票代码才算提及（aliases中的别名不受限制）
+    'ambiguous_names': ['机器人', '太阳能', '新希望', '农产品', '好想你', '老百姓', '金融街',
+                        '人民网', '新华网', '我爱我家', '中国医药', '中国软件']
+}
+
+# 简称前的状态标记：*ST/ST/S*ST/SST/S、新股N、次新C、除权除息XD/XR/DR
+_PREFIX_PATTERN = re.compile(r'^(?:\*ST|S\*ST|SST|ST|S|N|C|XD|XR|DR)(?=[\u4e00-\u9fff])')
+
+# 科创板/创业板简称后的标记：-U（未盈利）、-W（特殊表决权）等
+_SUFFIX_PATTERN = re.compile(r'-[A-Z]+$')
+
+
+def load_stock_name_config():
+    """读取股票简称配置，config.py中的STOCK_NAME_CONFIG覆盖默认值"""
+    name_config = dict(DEFAULT_STOCK_NAME_CONFIG)
+    
+    try:
+        from config import STOCK_NAME_CONFIG
+        name_config.update(STOCK_NAME_CONFIG)
+    except ImportError:
+        pass
+    
+    return name_config
+
+
+def normalize_name(name):
+    """全角转半角并去除空白（如"万  科Ａ" → "万科A"）"""
+    return re.sub(r'\s+', '', unicodedata.normalize('NFKC', str(name)))
+
+
+def name_variants(name):
+    """
+    股票简称的可识别写法
+    
+    参数:
+        name: 交易所公布的简称
+    
+    返回:
+        list: [规范化简称, 去掉前后缀标记的简称]（去重）
+    """
+    normalized = normalize_name(name)
+    stripped = _SUFFIX_PATTERN.sub('', _PREFIX_PATTERN.sub('', normalized))
+    return list(dict.fromkeys(variant for variant in (normalized, stripped) if variant))
+
+
+class StockNameDictionary:
+    """股票简称字典（最左最长匹配）"""
+    
+    def __init__(self, stocks=None, aliases=None, min_name_length=3, ambiguous_names=None):
+        """
+        构建字典
+        
+        参数:
+            stocks: [(代码, 简称), ...]，通常来自stock_info_a_code_name
+            aliases: {别名: 代码}，不受最短长度限制，覆盖同名的简称
+            min_name_length: 简称最短长度
+            ambiguous_names: 歧义简称，文本中同时出现对应代码时才算提及
+        """
+        self.min_name_length = min_name_length
+        self.stocks = [(str(code).zfill(6), str(name)) for code, name in stocks or []]
+        self.aliases = {normalize_name(alias): str(code).zfill(6) for alias, code in (aliases or {}).items()}
+        self.ambiguous_names = {normalize_name(name) for name in ambiguous_names or []} - set(self.aliases)
+        
+        self.names = {}        # 可识别的写法 → 代码
+        self.code_names = {}   # 代码 → 规范化简称（用于展示）
+        
+        for code, name in self.stocks:
+            variants = name_variants(name)
+            if not variants:
+                continue
+            
+            self.code_names.setdefault(code, variants[0])
+            for variant in variants:
+                if len(variant) >= min_name_length:
+                    self.names.setdefault(variant, code)
+        
+        for alias, code in self.aliases.items():
+            if alias:
+                self.names[alias] = code
+                self.code_names.setdefault(code, alias)
+        
+        self.matcher = AhoCorasick()
+        for name in self.names:
+            self.matcher.add(name)
+        self.matcher.build()
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def merged(self, stock_mapping):
+        """
+        返回加入额外简称后的新字典（原字典不变，已有的简称不被覆盖）
+        
+        参数:
+            stock_mapping: {简称: 代码}，如各模块中手工维护的常用股票
+        
+        返回:
+            StockNameDictionary
+        """
+        stocks = self.stocks + [(code, name) for name, code in stock_mapping.items()]
+        return StockNameDictionary(stocks, self.aliases, self.min_name_length, self.ambiguous_names)
+    
+    def find(self, text, matches=None):
+        """
+        识别文本中的股票简称（重叠命中取最左最长，歧义简称需文本中同时出现代码）
+        
+        参数:
+            text: 待扫描文本
+            matches: 已有的简称命中 [(起始位置, 结束位置, 简称), ...]（如其他自动机一并扫描的结果），
+                     None表示用本字典的自动机扫描
+        
+        返回:
+            list: [(起始位置, 结束位置, 简称, 代码), ...]，按出现顺序
+        """
+        if matches is None:
+            matches = self.matcher.iter_matches(text)
+        matches = sorted(matches, key=lambda match: (match[0], -match[1]))
+        
+        found = []
+        last_end = 0
+        for start, end, name in matches:
+            if start < last_end:
+                continue
+            last_end = end
+            
+            code = self.names[name]
+            if name in self.ambiguous_names and code not in text:
+                continue
+            found.append((start, end, name, code))
+        
+        return found
+    
+    def identify(self, text, matches=None):
+        """
+        识别文本中的股票
+        
+        参数:
+            text: 待扫描文本
+            matches: 同find
+        
+        返回:
+            list: ['简称(代码)', ...]，按首次出现顺序去重，简称为交易所公布的规范化简称
+        """
+        codes = dict.fromkeys(code for _, _, _, code in self.find(text, matches))
+        return [f"{self.code_names.get(code, code)}({code})" for code in codes]
+    
+    def name_of(self, code):
+        """代码对应的简称，未知时返回None"""
+        return self.code_names.get(str(code).zfill(6))
+
+
+def _cache_path(cache_dir=None):
+    return os.path.join(cache_dir or load_cache_config()['cache_dir'], 'stock_names.json')
+
+
+def _fetch_stock_list():
+    """下载全市场A股代码和简称"""
+    import akshare as ak
+    from fetch_executor import get_fetch_executor
+    
+    df = get_fetch_executor().call('stock_info_a_code_name', ak.stock_info_a_code_name)
+    return [[str(code), str(name)] for code, name in zip(df['code'], df['name'])]
+
+
+def load_stock_name_dictionary(cache_dir=None, fetch_func=None, today=None):
+    """
+    加载全市场股票简称字典（磁盘缓存每天刷新一次，下载失败时使用旧缓存）
+    
+    参数:
+        cache_dir: 缓存目录，默认读取配置
+        fetch_func: 下载函数，返回 [[代码, 简称], ...]，默认调用stock_info_a_code_name
+        today: 当天日期字符串（YYYY-MM-DD），默认取当前日期
+    
+    返回:
+        StockNameDictionary: 下载和缓存都不可用时只包含配置中的别名
+    """
+    name_config = load_stock_name_config()
+    path = _cache_path(cache_dir)
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    
+    cached = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  读取股票简称缓存失败: {e}")
+    
+    stocks = cached['stocks'] if cached else None
+    
+    if not cached or cached.get('date') != today:
+        try:
+            fetched = (fetch_func or _fetch_stock_list)()
+        except Exception as e:
+            fetched = None
+            if stocks:
+                print(f"⚠️  更新股票简称失败，使用 {cached.get('date')} 的缓存: {e}")
+            else:
+                print(f"⚠️  获取股票简称失败，仅使用配置的别名: {e}")
+        
+        if fetched:
+            stocks = fetched
+            print(f"✓ 已更新全市场股票简称: {len(stocks)} 只")
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'date': today, 'stocks': stocks}, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"⚠️  保存股票简称缓存失败: {e}")
+    
+    return StockNameDictionary(stocks or [], name_config['aliases'], name_config['min_name_length'],
+                               name_config['ambiguous_names'])
+
+
+_shared_dictionary = None
+_shared_date = None
+_shared_lock = threading.Lock()
+
+
+def get_stock_name_dictionary():
+    """
+    获取进程内共享的股票简称字典（跨天后重新加载）
+    
+    返回:
+        StockNameDictionary
+    """
+    global _shared_dictionary, _shared_date
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    with _shared_lock:
+        if _shared_dictionary is None or _shared_date != today:
+            _shared_dictionary = load_stock_name_dictionary(today=today)
+            _shared_date = today
+        return _shared_dictionary
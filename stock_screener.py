@@ -8,13 +8,29 @@ A股股票筛选和评分系统
 import akshare as ak
 import pandas as pd
 import numpy as np
+import sys
 import time
 import warnings
 from datetime import datetime, timedelta
 import re
 
+from market_snapshot import get_market_snapshot
+from stock_fundamentals import get_fundamentals_provider
+from scoring_engine import score_candidates, STOCK_SCORE_RULES
+from fetch_executor import get_fetch_executor
+from stock_data_cache import get_stock_data_cache
+from screen_checkpoint import ScreenCheckpoint, StockFetchError
+
 warnings.filterwarnings('ignore')
 
+
+# 评分结果列
+RESULT_COLUMNS = [
+    '股票代码', '股票名称', '总股本(亿股)', '流通市值(亿元)',
+    '股本匹配分', '官方背书分', '增持动向分', '题材热度分', '分红预期分', '总分'
+]
+
+
 class StockScreener:
     def __init__(self):
         """初始化股票筛选器"""
@@ -32,9 +48,25 @@ class StockScreener:
             '中央汇金', '证金公司', '国有资产', '国投', '中投'
         ]
         
+        # 共享全市场行情快照和批量基本面数据
+        self.market_snapshot = get_market_snapshot()
+        self.fundamentals = get_fundamentals_provider()
+        
+        # 共享并发限流获取执行器和慢变数据磁盘缓存
+        self.fetcher = get_fetch_executor()
+        self.data_cache = get_stock_data_cache()
+        
     def get_stock_list(self):
-        """获取A股股票列表"""
+        """获取A股股票列表（优先使用共享行情快照）"""
         print("正在获取A股股票列表...")
+        
+        snapshot = self.market_snapshot.get()
+        if not snapshot.empty:
+            stock_list = snapshot[['代码', '名称']].rename(columns={'代码': 'code', '名称': 'name'})
+            stock_list = stock_list.sort_values('code').reset_index(drop=True)
+            print(f"获取到 {len(stock_list)} 只股票")
+            return stock_list
+        
         try:
             stock_list = ak.stock_info_a_code_name()
             print(f"获取到 {len(stock_list)} 只股票")
@@ -44,16 +76,9 @@ class StockScreener:
             return pd.DataFrame()
     
     def get_stock_basic_info(self, stock_code):
-        """获取股票基本信息"""
+        """获取股票基本信息（批量基本面数据，缺失时回退单只查询）"""
         try:
-            # 获取股票基本信息
-            stock_individual_info = ak.stock_individual_info_em(symbol=stock_code)
-            
-            # 转换为字典格式便于处理
-            info_dict = {}
-            for _, row in stock_individual_info.iterrows():
-                info_dict[row['item']] = row['value']
-            
+            info_dict = self.fundamentals.get_basic_info(stock_code)
             return info_dict
         except Exception as e:
             print(f"获取股票 {stock_code} 基本信息失败: {e}")
@@ -62,7 +87,12 @@ class StockScreener:
     def get_stock_holders(self, stock_code):
         """获取股票十大股东信息"""
         try:
-            holders = ak.stock_zh_a_gdhs(symbol=stock_code)
+            holders = self.data_cache.get_or_fetch(
+                'stock_zh_a_gdhs', stock_code,
+                lambda: self.fetcher.call(
+                    'stock_zh_a_gdhs', lambda: ak.stock_zh_a_gdhs(symbol=stock_code)
+                )
+            )
             return holders
         except Exception as e:
             print(f"获取股票 {stock_code} 股东信息失败: {e}")
@@ -74,10 +104,16 @@ class StockScreener:
             end_date = datetime.now().strftime('%Y%m%d')
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
             
-            announcements = ak.stock_zh_a_hist_notice(
-                symbol=stock_code,
-                start_date=start_date,
-                end_date=end_date
+            announcements = self.data_cache.get_or_fetch(
+                'stock_zh_a_hist_notice', f"{stock_code}_{days}",
+                lambda: self.fetcher.call(
+                    'stock_zh_a_hist_notice',
+                    lambda: ak.stock_zh_a_hist_notice(
+                        symbol=stock_code,
+                        start_date=start_date,
+                        end_date=end_date
+                    )
+                )
             )
             return announcements
         except Exception as e:
@@ -87,7 +123,12 @@ class StockScreener:
     def get_dividend_info(self, stock_code):
         """获取股票分红信息"""
         try:
-            dividend_info = ak.stock_zh_a_dividend(symbol=stock_code)
+            dividend_info = self.data_cache.get_or_fetch(
+                'stock_zh_a_dividend', stock_code,
+                lambda: self.fetcher.call(
+                    'stock_zh_a_dividend', lambda: ak.stock_zh_a_dividend(symbol=stock_code)
+                )
+            )
             return dividend_info
         except Exception as e:
             print(f"获取股票 {stock_code} 分红信息失败: {e}")
@@ -96,10 +137,10 @@ class StockScreener:
     def check_market_cap_criteria(self, info_dict):
         """检查市值和股本条件"""
         try:
-            # 总股本 (亿股)
-            total_shares = float(info_dict.get('总股本', 0))
-            # 流通市值 (亿元)
-            circulating_market_cap = float(info_dict.get('流通市值', 0))
+            # 总股本 (股 -> 亿股)
+            total_shares = float(info_dict.get('总股本', 0)) / 1e8
+            # 流通市值 (元 -> 亿元)
+            circulating_market_cap = float(info_dict.get('流通市值', 0)) / 1e8
             
             # 检查总股本是否在8-15亿区间
             shares_criteria = 8 <= total_shares <= 15
@@ -196,14 +237,14 @@ class StockScreener:
         except:
             return 0, 0
     
-    def calculate_stock_score(self, stock_code, stock_name):
-        """计算单只股票的综合评分"""
+    def collect_stock_features(self, stock_code, stock_name):
+        """获取单只股票的评分特征（不满足股本/市值条件时返回None，基本信息获取失败时抛出StockFetchError）"""
         print(f"正在分析股票: {stock_code} - {stock_name}")
         
         # 获取基本信息
         basic_info = self.get_stock_basic_info(stock_code)
         if not basic_info:
-            return None
+            raise StockFetchError(f"无法获取 {stock_code} 基本信息")
         
         # 检查市值和股本条件
         shares_ok, market_cap_ok, total_shares, circulating_market_cap = self.check_market_cap_criteria(basic_info)
@@ -218,114 +259,138 @@ class StockScreener:
         
         print(f"  基本条件符合 - 总股本: {total_shares}亿股, 流通市值: {circulating_market_cap}亿元")
         
-        # 初始化评分
-        score_details = {
+        features = {
             '股票代码': stock_code,
             '股票名称': stock_name,
             '总股本(亿股)': total_shares,
-            '流通市值(亿元)': circulating_market_cap,
-            '股本匹配分': 0,
-            '官方背书分': 0,
-            '增持动向分': 0,
-            '题材热度分': 0,
-            '分红预期分': 0,
-            '总分': 0
+            '流通市值(亿元)': circulating_market_cap
         }
         
-        # 1. 股本匹配评分 (25分)
-        if 8 <= total_shares <= 12:
-            score_details['股本匹配分'] = 25
-        elif 12 < total_shares <= 15:
-            score_details['股本匹配分'] = 20
-        
-        # 2. 获取股东信息并评分 (30分)
+        # 1. 股东信息
         holders_df = self.get_stock_holders(stock_code)
         has_official, official_list = self.check_official_capital(holders_df)
+        features['官方背书'] = has_official
         if has_official:
-            score_details['官方背书分'] = 30
             print(f"  发现官方资本: {official_list}")
         
-        # 3. 获取公告信息
+        # 2. 公告信息：增持公告和题材关键词
         announcements_df = self.get_stock_announcements(stock_code)
         
-        # 检查增持公告 (20分)
         has_buyback, buyback_list = self.check_recent_buyback(announcements_df)
+        features['增持动向'] = has_buyback
         if has_buyback:
-            score_details['增持动向分'] = 20
             print(f"  发现增持公告: {len(buyback_list)}条")
         
-        # 检查关键词匹配 (15分)
         keyword_matches = self.check_keywords_in_announcements(announcements_df)
-        keyword_score = 0
-        for category, matches in keyword_matches.items():
-            if matches:
-                keyword_score += 3  # 每个类别3分，最多15分
-                print(f"  发现{category}相关公告: {len(matches)}条")
-        score_details['题材热度分'] = min(keyword_score, 15)
-        
-        # 4. 分红评分 (10分)
+        matched_categories = [category for category, matches in keyword_matches.items() if matches]
+        features['题材类别数'] = len(matched_categories)
+        for category in matched_categories:
+            print(f"  发现{category}相关公告: {len(keyword_matches[category])}条")
+        
+        # 3. 分红信息
         dividend_df = self.get_dividend_info(stock_code)
-        dividend_score, avg_dividend_rate = self.calculate_dividend_score(dividend_df)
-        score_details['分红预期分'] = dividend_score
-        if dividend_score > 0:
+        _, avg_dividend_rate = self.calculate_dividend_score(dividend_df)
+        features['平均股息率'] = avg_dividend_rate
+        if avg_dividend_rate > 0:
             print(f"  平均股息率: {avg_dividend_rate:.2%}")
         
-        # 计算总分
-        score_details['总分'] = (score_details['股本匹配分'] + 
-                               score_details['官方背书分'] + 
-                               score_details['增持动向分'] + 
-                               score_details['题材热度分'] + 
-                               score_details['分红预期分'])
+        return features
+    
+    def score_features(self, features_df):
+        """
+        向量化计算评分
         
-        print(f"  综合评分: {score_details['总分']}分")
+        参数:
+            features_df: collect_stock_features结果组成的DataFrame
+            
+        返回:
+            DataFrame: 评分结果（列与原逐只评分结果一致）
+        """
+        scored = score_candidates(features_df, STOCK_SCORE_RULES)
+        return scored[RESULT_COLUMNS]
+    
+    def calculate_stock_score(self, stock_code, stock_name):
+        """计算单只股票的综合评分"""
+        try:
+            features = self.collect_stock_features(stock_code, stock_name)
+        except StockFetchError as e:
+            print(f"    {e}")
+            return None
+        if features is None:
+            return None
         
-        # 添加延时避免请求过频
-        time.sleep(0.5)
+        score_details = self.score_features(pd.DataFrame([features])).iloc[0].to_dict()
+        
+        print(f"  综合评分: {score_details['总分']}分")
         
         return score_details
     
-    def screen_stocks(self, max_stocks=100):
-        """筛选股票并评分"""
+    def screen_stocks(self, max_stocks=100, resume=False):
+        """
+        筛选股票并评分
+        
+        参数:
+            max_stocks: 处理的股票数量，None表示全市场
+            resume: 是否断点续跑（跳过今天检查点中已完成的股票）
+        """
         print("开始筛选A股股票...")
+        stage_times = {}
         
         # 获取股票列表
+        start = time.perf_counter()
         stock_list = self.get_stock_list()
         if stock_list.empty:
             print("无法获取股票列表")
             return pd.DataFrame()
         
-        results = []
-        processed_count = 0
+        if max_stocks is not None:
+            stock_list = stock_list.head(max_stocks)
+        stage_times['股票列表'] = time.perf_counter() - start
         
-        for _, row in stock_list.iterrows():
-            if processed_count >= max_stocks:
-                break
-                
-            stock_code = row['code']
-            stock_name = row['name']
-            
-            try:
-                score_result = self.calculate_stock_score(stock_code, stock_name)
-                if score_result:
-                    results.append(score_result)
-                    
-                processed_count += 1
-                
-                # 每处理10只股票显示进度
-                if processed_count % 10 == 0:
-                    print(f"已处理 {processed_count} 只股票，找到符合条件的 {len(results)} 只")
-                    
-            except Exception as e:
-                print(f"处理股票 {stock_code} 时出错: {e}")
-                continue
-        
-        if results:
-            results_df = pd.DataFrame(results)
-            # 按总分排序
+        # 快照批量预筛：只有股本/流通市值可能符合条件的股票进入逐只检查
+        start = time.perf_counter()
+        survivors = set(self.fundamentals.prefilter(stock_list['code']))
+        stock_list = stock_list[stock_list['code'].astype(str).str.zfill(6).isin(survivors)]
+        stage_times['快照预筛'] = time.perf_counter() - start
+        print(f"快照预筛: {len(survivors)} 只股票进入详细检查")
+        
+        # 批量预取基本面数据，替代逐只查询
+        start = time.perf_counter()
+        self.fundamentals.get_fundamentals(stock_list['code'])
+        stage_times['基本面预取'] = time.perf_counter() - start
+        
+        stocks = list(stock_list[['code', 'name']].itertuples(index=False, name=None))
+        
+        # 并发获取各股票特征（按接口限流，结果顺序与输入一致），每只完成后写入检查点
+        start = time.perf_counter()
+        checkpoint = ScreenCheckpoint('stock_screener')
+        try:
+            features_list = checkpoint.map(self.fetcher, self.collect_stock_features, stocks, resume=resume)
+        finally:
+            # 丢弃排队中的缓存后台刷新，避免进程退出时等待
+            self.data_cache.close()
+        features_list = [features for features in features_list if features]
+        stage_times['逐只检查'] = time.perf_counter() - start
+        print(f"已处理 {len(stocks)} 只股票，找到符合条件的 {len(features_list)} 只")
+        print(self.data_cache.summary())
+        
+        results_df = pd.DataFrame()
+        if features_list:
+            # 所有候选股票一次性向量化评分，按总分排序
+            start = time.perf_counter()
+            results_df = self.score_features(pd.DataFrame(features_list))
             results_df = results_df.sort_values('总分', ascending=False)
-            return results_df
-        else:
-            return pd.DataFrame()
+            stage_times['评分'] = time.perf_counter() - start
+        
+        self.print_stage_times(stage_times)
+        return results_df
+    
+    def print_stage_times(self, stage_times):
+        """打印各阶段耗时"""
+        print("\n各阶段耗时:")
+        for stage, seconds in stage_times.items():
+            print(f"  {stage}: {seconds:.2f}秒")
+        print(f"  合计: {sum(stage_times.values()):.2f}秒")
     
     def save_results(self, results_df, filename=None):
         """保存结果到文件"""
@@ -371,10 +436,10 @@ def main():
     # 创建筛选器实例
     screener = StockScreener()
     
-    # 设置要处理的股票数量（可以根据需要调整）
-    max_stocks = 200  # 处理前200只股票进行测试
+    # 设置要处理的股票数量（可以根据需要调整），--full 表示全市场筛选
+    max_stocks = None if '--full' in sys.argv else 200
     
-    print(f"将处理前 {max_stocks} 只股票进行筛选...")
+    print("将对全市场股票进行筛选..." if max_stocks is None else f"将处理前 {max_stocks} 只股票进行筛选...")
     print("筛选条件:")
     print("- 总股本: 8-15亿股")
     print("- 流通市值: 105-195亿元 (目标150亿±30%)")
@@ -382,8 +447,11 @@ def main():
     print("- 关键词匹配和分红情况")
     print()
     
+    # --resume: 跳过今天已完成的股票（失败或超时后重跑）
+    resume = '--resume' in sys.argv
+    
     # 开始筛选
-    results = screener.screen_stocks(max_stocks=max_stocks)
+    results = screener.screen_stocks(max_stocks=max_stocks, resume=resume)
     
     if not results.empty:
         # 打印摘要
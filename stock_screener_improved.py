@@ -8,13 +8,28 @@
 import akshare as ak
 import pandas as pd
 import numpy as np
+import sys
 import time
 import warnings
 from datetime import datetime, timedelta
 import re
 
+from stock_fundamentals import get_fundamentals_provider
+from scoring_engine import score_candidates, STOCK_SCORE_RULES
+from fetch_executor import get_fetch_executor, retry_with_backoff
+from stock_data_cache import get_stock_data_cache
+from screen_checkpoint import ScreenCheckpoint, StockFetchError
+
 warnings.filterwarnings('ignore')
 
+
+# 评分结果列
+RESULT_COLUMNS = [
+    '股票代码', '股票名称', '总股本(亿股)', '流通市值(亿元)',
+    '股本匹配分', '官方背书分', '增持动向分', '题材热度分', '分红预期分', '总分'
+]
+
+
 class StockScreener:
     def __init__(self):
         """初始化股票筛选器"""
@@ -32,18 +47,18 @@ class StockScreener:
             '中央汇金', '证金公司', '国有资产', '国投', '中投'
         ]
         
-    def retry_request(self, func, max_retries=3, delay=1):
-        """重试机制"""
-        for attempt in range(max_retries):
-            try:
-                result = func()
-                return result
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                print(f"    请求失败，{delay}秒后重试... (尝试 {attempt + 1}/{max_retries})")
-                time.sleep(delay)
-        return None
+        # 共享批量基本面数据
+        self.fundamentals = get_fundamentals_provider()
+        
+        # 共享并发限流获取执行器和慢变数据磁盘缓存
+        self.fetcher = get_fetch_executor()
+        self.data_cache = get_stock_data_cache()
+        
+    def retry_request(self, func, max_retries=3, delay=1, endpoint=None):
+        """重试机制（抖动指数退避，指定endpoint时按接口限流）"""
+        if endpoint:
+            return self.fetcher.call(endpoint, func, max_retries=max_retries, base_delay=delay)
+        return retry_with_backoff(func, max_retries=max_retries, base_delay=delay)
     
     def get_stock_list(self):
         """获取A股股票列表"""
@@ -57,17 +72,11 @@ class StockScreener:
             return pd.DataFrame()
     
     def get_stock_basic_info(self, stock_code):
-        """获取股票基本信息"""
+        """获取股票基本信息（批量基本面数据，缺失时回退单只查询）"""
         try:
-            stock_individual_info = self.retry_request(
-                lambda: ak.stock_individual_info_em(symbol=stock_code)
+            info_dict = self.retry_request(
+                lambda: self.fundamentals.get_basic_info(stock_code)
             )
-            
-            # 转换为字典格式便于处理
-            info_dict = {}
-            for _, row in stock_individual_info.iterrows():
-                info_dict[row['item']] = row['value']
-            
             return info_dict
         except Exception as e:
             print(f"    获取基本信息失败: {e}")
@@ -76,10 +85,14 @@ class StockScreener:
     def get_stock_holders(self, stock_code):
         """获取股票十大股东信息"""
         try:
-            holders = self.retry_request(
-                lambda: ak.stock_zh_a_gdhs(symbol=stock_code),
-                max_retries=2,  # 股东信息经常失败，减少重试次数
-                delay=2
+            holders = self.data_cache.get_or_fetch(
+                'stock_zh_a_gdhs', stock_code,
+                lambda: self.retry_request(
+                    lambda: ak.stock_zh_a_gdhs(symbol=stock_code),
+                    max_retries=2,  # 股东信息经常失败，减少重试次数
+                    delay=2,
+                    endpoint='stock_zh_a_gdhs'
+                )
             )
             return holders
         except Exception as e:
@@ -139,15 +152,14 @@ class StockScreener:
         
         return len(found_officials) > 0, found_officials
     
-    def calculate_stock_score(self, stock_code, stock_name):
-        """计算单只股票的综合评分"""
+    def collect_stock_features(self, stock_code, stock_name):
+        """获取单只股票的评分特征（不满足股本/市值条件时返回None，基本信息获取失败时抛出StockFetchError）"""
         print(f"正在分析股票: {stock_code} - {stock_name}")
         
         # 获取基本信息
         basic_info = self.get_stock_basic_info(stock_code)
         if not basic_info:
-            print(f"    跳过：无法获取基本信息")
-            return None
+            raise StockFetchError(f"无法获取 {stock_code} 基本信息")
         
         # 检查市值和股本条件
         shares_ok, market_cap_ok, total_shares, circulating_market_cap = self.check_market_cap_criteria(basic_info)
@@ -162,96 +174,115 @@ class StockScreener:
         
         print(f"    ✓ 基本条件符合 - 总股本: {total_shares:.2f}亿股, 流通市值: {circulating_market_cap:.2f}亿元")
         
-        # 初始化评分
-        score_details = {
+        features = {
             '股票代码': stock_code,
             '股票名称': stock_name,
-            '总股本(亿股)': round(total_shares, 2),
-            '流通市值(亿元)': round(circulating_market_cap, 2),
-            '股本匹配分': 0,
-            '官方背书分': 0,
-            '增持动向分': 0,
-            '题材热度分': 0,
-            '分红预期分': 0,
-            '总分': 0
+            '总股本(亿股)': total_shares,
+            '流通市值(亿元)': circulating_market_cap
         }
         
-        # 1. 股本匹配评分 (25分)
-        if 8 <= total_shares <= 12:
-            score_details['股本匹配分'] = 25
-        elif 12 < total_shares <= 15:
-            score_details['股本匹配分'] = 20
-        
-        # 2. 获取股东信息并评分 (30分)
+        # 获取股东信息
         holders_df = self.get_stock_holders(stock_code)
         has_official, official_list = self.check_official_capital(holders_df)
+        features['官方背书'] = has_official
         if has_official:
-            score_details['官方背书分'] = 30
             print(f"    ✓ 发现官方资本: {official_list[:2]}...")  # 只显示前2个
         
         # 简化版评分：由于网络限制，暂时跳过公告和分红数据
-        # 可以根据需要后续添加
+        # 缺失的特征在评分引擎中按0分处理
         
-        # 计算总分
-        score_details['总分'] = (score_details['股本匹配分'] + 
-                               score_details['官方背书分'] + 
-                               score_details['增持动向分'] + 
-                               score_details['题材热度分'] + 
-                               score_details['分红预期分'])
+        return features
+    
+    def score_features(self, features_df):
+        """向量化计算评分（与stock_screener共用评分规则表）"""
+        scored = score_candidates(features_df, STOCK_SCORE_RULES)
+        scored[['总股本(亿股)', '流通市值(亿元)']] = scored[['总股本(亿股)', '流通市值(亿元)']].round(2)
+        return scored[RESULT_COLUMNS]
+    
+    def calculate_stock_score(self, stock_code, stock_name):
+        """计算单只股票的综合评分"""
+        try:
+            features = self.collect_stock_features(stock_code, stock_name)
+        except StockFetchError as e:
+            print(f"    {e}")
+            return None
+        if features is None:
+            return None
         
-        print(f"    综合评分: {score_details['总分']}分")
+        score_details = self.score_features(pd.DataFrame([features])).iloc[0].to_dict()
         
-        # 添加延时避免请求过频
-        time.sleep(1)
+        print(f"    综合评分: {score_details['总分']}分")
         
         return score_details
     
-    def screen_stocks(self, max_stocks=50):
-        """筛选股票并评分"""
+    def screen_stocks(self, max_stocks=50, resume=False):
+        """
+        筛选股票并评分
+        
+        参数:
+            max_stocks: 处理的股票数量，None表示全市场
+            resume: 是否断点续跑（跳过今天检查点中已完成的股票）
+        """
         print("开始筛选A股股票...")
         print(f"筛选条件: 总股本8-15亿股, 流通市值105-195亿元")
-        print(f"将处理前 {max_stocks} 只股票\n")
+        print("将处理全市场股票\n" if max_stocks is None else f"将处理前 {max_stocks} 只股票\n")
+        stage_times = {}
         
         # 获取股票列表
+        start = time.perf_counter()
         stock_list = self.get_stock_list()
         if stock_list.empty:
             print("无法获取股票列表")
             return pd.DataFrame()
         
-        results = []
-        processed_count = 0
+        if max_stocks is not None:
+            stock_list = stock_list.head(max_stocks)
+        stage_times['股票列表'] = time.perf_counter() - start
         
-        for _, row in stock_list.iterrows():
-            if processed_count >= max_stocks:
-                break
-                
-            stock_code = row['code']
-            stock_name = row['name']
-            
-            try:
-                score_result = self.calculate_stock_score(stock_code, stock_name)
-                if score_result:
-                    results.append(score_result)
-                    print(f"    ✓ 符合条件，已加入结果列表")
-                    
-                processed_count += 1
-                
-                # 每处理10只股票显示进度
-                if processed_count % 10 == 0:
-                    print(f"\n--- 进度: {processed_count}/{max_stocks}, 找到符合条件的 {len(results)} 只 ---\n")
-                    
-            except Exception as e:
-                print(f"    处理股票 {stock_code} 时出错: {e}")
-                processed_count += 1
-                continue
+        # 快照批量预筛：只有股本/流通市值可能符合条件的股票进入逐只检查
+        start = time.perf_counter()
+        survivors = set(self.fundamentals.prefilter(stock_list['code']))
+        stock_list = stock_list[stock_list['code'].astype(str).str.zfill(6).isin(survivors)]
+        stage_times['快照预筛'] = time.perf_counter() - start
+        print(f"--- 快照预筛: {len(survivors)} 只股票进入详细检查 ---\n")
+        
+        # 批量预取基本面数据，替代逐只查询
+        start = time.perf_counter()
+        self.fundamentals.get_fundamentals(stock_list['code'])
+        stage_times['基本面预取'] = time.perf_counter() - start
         
-        if results:
-            results_df = pd.DataFrame(results)
-            # 按总分排序
+        stocks = list(stock_list[['code', 'name']].itertuples(index=False, name=None))
+        
+        # 并发获取各股票特征（按接口限流，结果顺序与输入一致），每只完成后写入检查点
+        start = time.perf_counter()
+        checkpoint = ScreenCheckpoint('stock_screener_improved')
+        try:
+            features_list = checkpoint.map(self.fetcher, self.collect_stock_features, stocks, resume=resume)
+        finally:
+            # 丢弃排队中的缓存后台刷新，避免进程退出时等待
+            self.data_cache.close()
+        features_list = [features for features in features_list if features]
+        stage_times['逐只检查'] = time.perf_counter() - start
+        print(f"\n--- 已处理 {len(stocks)} 只股票，找到符合条件的 {len(features_list)} 只 ---")
+        print(f"--- {self.data_cache.summary()} ---\n")
+        
+        results_df = pd.DataFrame()
+        if features_list:
+            # 所有候选股票一次性向量化评分，按总分排序
+            start = time.perf_counter()
+            results_df = self.score_features(pd.DataFrame(features_list))
             results_df = results_df.sort_values('总分', ascending=False)
-            return results_df
-        else:
-            return pd.DataFrame()
+            stage_times['评分'] = time.perf_counter() - start
+        
+        self.print_stage_times(stage_times)
+        return results_df
+    
+    def print_stage_times(self, stage_times):
+        """打印各阶段耗时"""
+        print("各阶段耗时:")
+        for stage, seconds in stage_times.items():
+            print(f"  {stage}: {seconds:.2f}秒")
+        print(f"  合计: {sum(stage_times.values()):.2f}秒\n")
     
     def print_summary(self, results_df):
         """打印筛选结果摘要"""
@@ -286,11 +317,14 @@ def main():
     # 创建筛选器实例
     screener = StockScreener()
     
-    # 设置要处理的股票数量
-    max_stocks = 50  # 先处理50只进行测试
+    # 设置要处理的股票数量，--full 表示全市场筛选
+    max_stocks = None if '--full' in sys.argv else 50  # 默认先处理50只进行测试
+    
+    # --resume: 跳过今天已完成的股票（失败或超时后重跑）
+    resume = '--resume' in sys.argv
     
     # 开始筛选
-    results = screener.screen_stocks(max_stocks=max_stocks)
+    results = screener.screen_stocks(max_stocks=max_stocks, resume=resume)
     
     if not results.empty:
         # 打印摘要
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DeepSeek分析器并发模式和合并请求测试脚本
+模拟DeepSeek客户端，无需联网和API Key
+"""
+
+import json
+import re
+import threading
+import time
+
+import pandas as pd
+
+from deepseek_analyzer import DeepSeekAnalyzer
+
+
+class FakeClient:
+    """模拟DeepSeekClient：固定延迟返回，标题含'失败'时抛出异常"""
+    
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.stats = {'request': 0, 'retry': 0, 'error': 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+    
+    def is_cached(self, system_prompt, user_input, temperature=None):
+        return False
+    
+    def cache_summary(self):
+        return ""
+    
+    def forget(self, system_prompt, user_input, temperature=None):
+        pass
+    
+    def chat(self, system_prompt, user_input, **kwargs):
+        with self._lock:
+            self.stats['request'] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        
+        try:
+            time.sleep(self.latency)
+            title = user_input.split('\n')[0].replace('标题: ', '')
+            if '失败' in title:
+                raise ConnectionError('模拟网络错误')
+            return json.dumps([{'stock_name': title, 'sentiment_score': 0.5,
+                                'key_logic': '测试', 'confidence_level': 0.8}], ensure_ascii=False)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeBatchClient(FakeClient):
+    """模拟合并请求：按post_id返回结果，超过max_posts条时返回被截断的JSON"""
+    
+    def __init__(self, max_posts=4):
+        super().__init__(latency=0)
+        self.max_posts = max_posts
+        self.batch_sizes = []
+        self.forgotten = 0
+    
+    def forget(self, system_prompt, user_input, temperature=None):
+        self.forgotten += 1
+    
+    def chat(self, system_prompt, user_input, **kwargs):
+        posts = re.findall(r'【(P\d+)】\n标题: (.*)', user_input)
+        if not posts:
+            return super().chat(system_prompt, user_input, **kwargs)
+        
+        self.stats['request'] += 1
+        self.batch_sizes.append(len(posts))
+        
+        items = []
+        for post_id, title in posts:
+            if '无效' in title:
+                continue
+            items.append({'post_id': post_id, 'stock_name': title, 'sentiment_score': 0.5,
+                          'key_logic': '测试', 'confidence_level': 0.8})
+        # 模型输出顺序与输入相反，结果应按post_id还原
+        content = json.dumps(items[::-1], ensure_ascii=False)
+        
+        if len(posts) > self.max_posts:
+            return content[:len(content) // 2]
+        return content
+
+
+def make_posts(n):
+    """构造模拟帖子，第3条会失败"""
+    titles = [f'帖子{i}' if i != 3 else '帖子3失败' for i in range(n)]
+    return pd.DataFrame({'标题': titles, '内容': ['内容'] * n, '帖子链接': [''] * n, '发布时间': [''] * n})
+
+
+def test_async_order_and_errors():
+    """测试并发模式保持输入顺序，单条失败不影响其他帖子"""
+    print("测试并发分析...")
+    
+    analyzer = DeepSeekAnalyzer(api_key='test')
+    analyzer.deepseek = FakeClient(latency=0.2)
+    
+    start = time.perf_counter()
+    result = analyzer.analyze_posts(make_posts(10), concurrency=5, requests_per_minute=6000)
+    elapsed = time.perf_counter() - start
+    
+    print(f"10条帖子并发分析耗时: {elapsed:.2f}秒")
+    assert list(result['stock_name']) == [f'帖子{i}' for i in range(10) if i != 3]
+    assert analyzer.deepseek.max_in_flight == 5
+    assert elapsed < 1.5
+
+
+def test_requests_per_minute_budget():
+    """测试每分钟请求数上限"""
+    analyzer = DeepSeekAnalyzer(api_key='test')
+    analyzer.deepseek = FakeClient(latency=0)
+    
+    # 每分钟600次 = 每秒10次（令牌桶容量10）：14次请求中前10次立即放行，其余按速率等待
+    start = time.perf_counter()
+    analyzer.analyze_posts(make_posts(15).drop(index=3), concurrency=8, requests_per_minute=600)
+    elapsed = time.perf_counter() - start
+    
+    assert analyzer.deepseek.stats['request'] == 14
+    assert elapsed >= 0.3
+
+
+def test_batched_requests():
+    """测试多帖合并请求：请求数减少，结果按post_id拆回并保持输入顺序"""
+    analyzer = DeepSeekAnalyzer(api_key='test')
+    analyzer.deepseek = FakeBatchClient(max_posts=4)
+    
+    posts = make_posts(12)
+    posts.loc[5, '标题'] = '帖子5无效'
+    posts = posts.drop(index=3)
+    
+    result = analyzer.analyze_posts(posts, batch_size=12, delay=0, posts_per_request=4)
+    
+    assert analyzer.deepseek.batch_sizes == [4, 4, 3]
+    assert list(result['stock_name']) == [f'帖子{i}' for i in range(12) if i not in (3, 5)]
+    assert 'post_id' not in result.columns
+    assert result['原始标题'].iloc[0] == '帖子0'
+
+
+def test_batch_split_on_parse_failure():
+    """测试回复解析失败的批次对半拆分重试，单条时回退为单帖请求"""
+    analyzer = DeepSeekAnalyzer(api_key='test')
+    analyzer.deepseek = FakeBatchClient(max_posts=2)
+    
+    posts = make_posts(10).drop(index=3)
+    result = analyzer.analyze_posts(posts, concurrency=3, requests_per_minute=6000, posts_per_request=5)
+    
+    # 5条 → 2+3 → 3条拆为1（单帖请求）+2；4条 → 2+2
+    assert sorted(analyzer.deepseek.batch_sizes) == [2, 2, 2, 2, 3, 4, 5]
+    assert analyzer.deepseek.forgotten == 3
+    assert list(result['stock_name']) == [f'帖子{i}' for i in range(10) if i != 3]
+
+
+if __name__ == "__main__":
+    test_async_order_and_errors()
+    test_requests_per_minute_budget()
+    test_batched_requests()
+    test_batch_split_on_parse_failure()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DeepSeek统一客户端测试脚本
+模拟HTTP响应，无需联网和API Key
+"""
+
+import json
+
+import requests
+
+from deepseek_client import DeepSeekClient, extract_json
+
+
+class FakeResponse:
+    """模拟requests.Response"""
+    
+    def __init__(self, status_code, content=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._content = content
+    
+    def json(self):
+        return {'choices': [{'message': {'content': self._content}}]}
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+
+class FakeStreamResponse(FakeResponse):
+    """模拟流式响应：按SSE格式逐段返回内容，记录已被读取的段数"""
+    
+    def __init__(self, chunks):
+        super().__init__(200)
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+    
+    def iter_lines(self, decode_unicode=False):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield 'data: ' + json.dumps({'choices': [{'delta': {'content': chunk}}]}, ensure_ascii=False)
+            yield ''
+        yield 'data: [DONE]'
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.closed = True
+
+
+def make_client(responses):
+    """构造按顺序返回模拟响应的客户端"""
+    client = DeepSeekClient(api_key='test', retry_base_delay=0, response_cache=False)
+    calls = []
+    
+    def fake_post(url, json=None, timeout=None, stream=False):
+        calls.append((url, json, timeout))
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    client.session.post = fake_post
+    return client, calls
+
+
+def test_extract_json():
+    """测试各种回复格式的JSON提取"""
+    print("测试JSON提取...")
+    
+    assert extract_json('{"a": 1}') == {'a': 1}
+    assert extract_json('```json\n{"a": 1}\n```') == {'a': 1}
+    assert extract_json('分析如下：\n{"a": {"b": [1, 2]}}\n以上仅供参考 {注意风险}') == {'a': {'b': [1, 2]}}
+    assert extract_json('结果: [{"stock_name": "山东黄金"}]', (list, dict)) == [{'stock_name': '山东黄金'}]
+    assert extract_json('[1, 2] 之后 {"a": 1}', dict) == {'a': 1}
+    assert extract_json('无法识别') is None
+    assert extract_json('{"a": 1') is None
+    assert extract_json(None) is None
+
+
+def test_retry_on_rate_limit():
+    """测试429和5xx重试后成功"""
+    client, calls = make_client([
+        FakeResponse(429, headers={'Retry-After': '0'}),
+        FakeResponse(503),
+        FakeResponse(200, '```json\n{"recommendations": []}\n```')
+    ])
+    
+    result = client.chat_json('system', 'user', max_tokens=2000, timeout=60)
+    
+    assert result == {'recommendations': []}
+    assert len(calls) == 3
+    assert calls[0][0] == 'https://api.deepseek.com/v1/chat/completions'
+    assert calls[0][1]['max_tokens'] == 2000
+    assert calls[0][2] == (client.connect_timeout, 60)
+    assert client.stats == {'request': 3, 'retry': 2, 'error': 0, 'abort': 0}
+
+
+def test_no_retry_on_client_error():
+    """测试401等客户端错误不重试，连接错误重试到上限后返回None"""
+    client, calls = make_client([FakeResponse(401)])
+    assert client.chat('system', 'user') is None
+    assert len(calls) == 1
+    
+    client, calls = make_client([requests.exceptions.ConnectionError('断开')] * 3)
+    assert client.chat('system', 'user') is None
+    assert len(calls) == 3
+    assert client.stats['error'] == 1
+
+
+def test_shared_session():
+    """测试同一客户端的多次调用复用同一个Session"""
+    client, calls = make_client([FakeResponse(200, 'ok'), FakeResponse(200, 'ok')])
+    session = client.session
+    
+    assert client.chat('system', 'a') == 'ok'
+    assert client.chat('system', 'b') == 'ok'
+    assert client.session is session
+    assert client.session.headers['Authorization'] == 'Bearer test'
+
+
+def test_stream_items_arrive_incrementally():
+    """测试流式接收：推荐逐条回调，最终结果与整段解析一致"""
+    chunks = ['```json\n{"recommendations": [', '{"rank": 1, "stock_name": "山东', '黄金"}, ',
+              '{"rank": 2, "stock_name": "紫金矿业"}', '], "market_view": "震荡"}', '\n```']
+    response = FakeStreamResponse(chunks)
+    client, calls = make_client([response])
+    
+    arrivals = []
+    
+    def on_item(key, item):
+        arrivals.append((key, item['stock_name'], response.consumed))
+    
+    result = client.chat_json('system', 'user', stream=True, on_item=on_item, max_tokens=2000)
+    
+    assert result == extract_json(''.join(chunks))
+    assert arrivals == [('recommendations', '山东黄金', 3), ('recommendations', '紫金矿业', 4)]
+    assert calls[0][1]['stream'] is True
+    assert calls[0][2] == (client.connect_timeout, client.stream_idle_timeout)
+    assert response.closed
+
+
+def test_stream_aborts_on_malformed_output():
+    """测试输出格式异常时立即中止，不再读取后续内容，改用非流式请求重试一次"""
+    chunks = ['{"recommendations": [{"rank": 1}, ', '抱歉，我无法', '给出推荐'] + ['。'] * 100
+    response = FakeStreamResponse(chunks)
+    retry = FakeResponse(200, '{"recommendations": [{"rank": 1}, {"rank": 2}]}')
+    client, calls = make_client([response, retry])
+    
+    arrivals = []
+    result = client.chat_json('system', 'user', stream=True, on_item=lambda key, item: arrivals.append(item))
+    
+    assert result == {'recommendations': [{'rank': 1}, {'rank': 2}]}
+    assert response.consumed == 2
+    assert client.stats['abort'] == 1
+    assert 'stream' not in calls[1][1]
+    assert arrivals == [{'rank': 1}, {'rank': 2}]  # 已回调的元素不重复回调
+    
+    # 重试仍失败时返回None
+    client, _ = make_client([FakeStreamResponse(chunks), FakeResponse(200, '抱歉')])
+    assert client.chat_json('system', 'user', stream=True) is None
+
+
+def test_stream_recovers_from_bracketed_preamble():
+    """测试说明文字中带括号时跳过，连接中断时从已接收内容中提取JSON"""
+    chunks = ['根据[数据]分析，', '结果如下：\n{"a": [1,', '2]}']
+    client, calls = make_client([FakeStreamResponse(chunks)])
+    assert client.chat_json('system', 'user', stream=True) == extract_json(''.join(chunks)) == {'a': [1, 2]}
+    assert len(calls) == 1
+    
+    class DroppedStreamResponse(FakeStreamResponse):
+        """读完全部分段后连接中断（没有[DONE]）"""
+        def iter_lines(self, decode_unicode=False):
+            for line in list(super().iter_lines(decode_unicode))[:-1]:
+                yield line
+            raise requests.exceptions.ChunkedEncodingError('连接中断')
+    
+    # 连接中断时已接收的内容不完整，改用非流式请求重试一次
+    dropped = DroppedStreamResponse(['{"recommendations": [', '{"rank": 1}'])
+    client, calls = make_client([dropped, FakeResponse(200, '{"recommendations": [{"rank": 1}]}')])
+    assert client.chat_json('system', 'user', stream=True) == {'recommendations': [{'rank': 1}]}
+    assert len(calls) == 2
+    assert client.stats['error'] == 1
+
+
+if __name__ == "__main__":
+    test_extract_json()
+    test_retry_on_rate_limit()
+    test_no_retry_on_client_error()
+    test_shared_session()
+    test_stream_items_arrive_incrementally()
+    test_stream_aborts_on_malformed_output()
+    test_stream_recovers_from_bracketed_preamble()
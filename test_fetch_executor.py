@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发限流获取执行器测试脚本
+无需联网
+"""
+
+import time
+import threading
+
+from fetch_executor import FetchExecutor, TokenBucket, retry_with_backoff
+
+
+def test_token_bucket_rate():
+    """测试令牌桶限制请求速率"""
+    print("测试令牌桶限流...")
+    
+    bucket = TokenBucket(rate=20, capacity=1)
+    
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    
+    # 首个令牌立即可用，其余10个按20/秒补充，约0.5秒
+    print(f"11次请求耗时: {elapsed:.2f}秒")
+    assert 0.4 <= elapsed < 1.0
+
+
+def test_retry_with_backoff():
+    """测试失败重试和最终抛出异常"""
+    attempts = []
+    
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("网络抖动")
+        return 'ok'
+    
+    assert retry_with_backoff(flaky, max_retries=3, base_delay=0.01) == 'ok'
+    assert len(attempts) == 3
+    
+    def always_fail():
+        raise ValueError("接口错误")
+    
+    try:
+        retry_with_backoff(always_fail, max_retries=2, base_delay=0.01)
+        assert False, "应抛出异常"
+    except ValueError:
+        pass
+
+
+def test_map_keeps_order_and_concurrency():
+    """测试并发执行、结果保序和单任务失败隔离"""
+    print("测试并发执行...")
+    
+    fetcher = FetchExecutor(max_workers=8, default_rate=1000)
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+    
+    def task(i):
+        with lock:
+            active.append(i)
+            peak[0] = max(peak[0], len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(i)
+        if i == 5:
+            raise RuntimeError("单只股票失败")
+        return i * i
+    
+    start = time.monotonic()
+    results = fetcher.map(task, range(16), progress_every=0)
+    elapsed = time.monotonic() - start
+    
+    assert results[5] is None
+    assert [r for i, r in enumerate(results) if i != 5] == [i * i for i in range(16) if i != 5]
+    assert peak[0] > 1
+    print(f"16个任务耗时: {elapsed:.2f}秒（串行约0.8秒）")
+    assert elapsed < 0.5
+
+
+def test_call_uses_endpoint_limit():
+    """测试按接口名使用独立的限流配置"""
+    fetcher = FetchExecutor(rate_limits={'slow_api': 10}, default_rate=1000, max_retries=1)
+    
+    # 桶容量默认等于速率：前10次突发，其余5次按10/秒补充
+    start = time.monotonic()
+    for _ in range(15):
+        fetcher.call('slow_api', lambda: None)
+    slow_elapsed = time.monotonic() - start
+    
+    start = time.monotonic()
+    for _ in range(6):
+        fetcher.call('fast_api', lambda: None)
+    fast_elapsed = time.monotonic() - start
+    
+    assert slow_elapsed >= 0.4
+    assert fast_elapsed < 0.1
+
+
+if __name__ == "__main__":
+    test_token_bucket_rate()
+    test_retry_with_backoff()
+    test_map_keeps_order_and_concurrency()
+    test_call_uses_endpoint_limit()
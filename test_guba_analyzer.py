@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股吧帖子筛选测试脚本
+与逐行apply的原逻辑对比长度和垃圾内容筛选结果，并测试10万条帖子的筛选耗时，无需联网
+"""
+
+import random
+import tempfile
+import threading
+import time
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from fetch_executor import FetchExecutor
+from guba_analyzer import GubaAnalyzer
+from guba_watermark import GubaWatermarkStore
+
+
+def reference_length(analyzer, title, content):
+    """原逐行实现：正文为空时用标题，逐个移除低质量短语后计算长度"""
+    content = str(content)
+    full_text = title if (not content or content == 'nan' or len(content.strip()) == 0) else content
+    for phrase in analyzer.low_quality_phrases:
+        full_text = full_text.replace(phrase, '')
+    return len(full_text.strip())
+
+
+def reference_spam(analyzer, title, content):
+    """原逐行实现（关键词统一按小写比较）"""
+    full_text = (str(title) + ' ' + str(content)).lower()
+    return any(keyword.lower() in full_text for keyword in analyzer.spam_keywords)
+
+
+def random_posts(analyzer, n, seed=3):
+    """用低质量短语、垃圾关键词和正常文字随机拼出帖子"""
+    rng = random.Random(seed)
+    fillers = ['黄金板块走强', '机构调研', '业绩预告超预期', '  ', '放量突破', 'qq', '加v', '今天']
+    vocabulary = analyzer.low_quality_phrases + analyzer.spam_keywords + fillers * 4
+    
+    titles, contents = [], []
+    for i in range(n):
+        titles.append(''.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))))
+        roll = rng.random()
+        if roll < 0.05:
+            contents.append(np.nan)
+        elif roll < 0.1:
+            contents.append('   ')
+        else:
+            contents.append(''.join(rng.choice(vocabulary) for _ in range(rng.randint(0, 12))))
+    
+    return pd.DataFrame({
+        '标题': titles,
+        '内容': contents,
+        '阅读量': [rng.randint(0, 20000) for _ in range(n)],
+        '评论数': [rng.randint(0, 20) for _ in range(n)],
+        '帖子链接': [f"https://guba.eastmoney.com/{i}" for i in range(n)],
+        '发布时间': ['2025-01-01 09:30'] * n
+    })
+
+
+def test_filters_match_reference():
+    """测试列式筛选与逐行实现一致"""
+    analyzer = GubaAnalyzer()
+    df = random_posts(analyzer, 5000)
+    
+    lengths = analyzer._filter_by_length(df.copy())
+    expected = [reference_length(analyzer, t, c) for t, c in zip(df['标题'], df['内容'])]
+    expected_index = [i for i, length in enumerate(expected) if length > 10]
+    assert lengths.index.tolist() == expected_index
+    assert lengths['内容长度'].tolist() == [expected[i] for i in expected_index]
+    
+    kept = analyzer._filter_spam_content(df.copy())
+    expected_kept = [i for i, (t, c) in enumerate(zip(df['标题'], df['内容'])) if not reference_spam(analyzer, t, c)]
+    assert kept.index.tolist() == expected_kept
+    
+    # 大写关键词（QQ、加V）也能匹配小写写法
+    spam = pd.DataFrame({'标题': ['欢迎加v交流', '黄金走势'], '内容': ['', '有问题联系qq']})
+    assert analyzer._filter_spam_content(spam).empty
+
+
+def test_pipeline_stats_and_speed():
+    """测试筛选流水线的分阶段统计，10万条帖子在1秒内完成"""
+    analyzer = GubaAnalyzer()
+    df = random_posts(analyzer, 100000, seed=9)
+    
+    start = time.time()
+    result = analyzer._apply_filters(df)
+    elapsed = time.time() - start
+    
+    print(f"10万条帖子筛选耗时 {elapsed:.3f} 秒")
+    for stage in analyzer.filter_stats:
+        print(f"  {stage}")
+    
+    stages = analyzer.filter_stats
+    assert [stage['阶段'] for stage in stages] == ['规则A(长度筛选)', '规则B(互动筛选)', '规则C(排除垃圾)', '质量评分']
+    assert stages[0]['输入'] == len(df)
+    assert all(stages[i]['输出'] == stages[i + 1]['输入'] for i in range(len(stages) - 1))
+    assert stages[-1]['输出'] == len(result) > 0
+    assert result['质量评分'].is_monotonic_decreasing
+    assert '是否垃圾' not in result.columns
+    assert elapsed < 3  # 本机约0.5秒，留出共享机器的余量
+
+
+class FakeGuba:
+    """按发布时间从新到旧分页的个股股吧"""
+    
+    def __init__(self, total, page_size=5, paginated=True):
+        self.posts = []
+        self.page_size = page_size
+        self.paginated = paginated
+        self.requests = 0
+        self.publish(total)
+    
+    def publish(self, n):
+        """发布n条新帖子（排在最前面）"""
+        start = len(self.posts)
+        new_posts = [
+            {'title': f"帖子{i}", 'url': f"https://guba.sina.com.cn/post/{i}",
+             'time': pd.Timestamp('2025-01-01 09:00') + pd.Timedelta(minutes=i)}
+            for i in range(start, start + n)
+        ]
+        self.posts = new_posts[::-1] + self.posts
+    
+    def fetch_page(self, stock_code, page):
+        self.requests += 1
+        if not self.paginated:
+            page = 1
+        rows = self.posts[(page - 1) * self.page_size:page * self.page_size]
+        return pd.DataFrame(rows, columns=['title', 'url', 'time']), self.paginated
+
+
+def test_incremental_fetch():
+    """测试增量抓取：遇到已抓取的帖子即停止翻页，重复运行不产生重复行"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        store = GubaWatermarkStore(db_path=f"{cache_dir}/guba_watermarks.db")
+        analyzer = GubaAnalyzer(watermark_store=store)
+        guba = FakeGuba(total=15)
+        analyzer._fetch_guba_page = guba.fetch_page
+        
+        first = analyzer._get_stock_guba_posts('600547', max_pages=5)
+        assert len(first) == 15
+        assert guba.requests == 4  # 第4页为空
+        assert (first['股票代码'] == '600547').all()
+        
+        # 处理完成前不推进高水位，下游失败时重跑仍能拿到这些帖子
+        assert store.get('600547') == (None, set())
+        assert len(analyzer._get_stock_guba_posts('600547', max_pages=5)) == 15
+        assert analyzer.commit_watermarks() == 1
+        
+        guba.publish(2)
+        guba.requests = 0
+        second = analyzer._get_stock_guba_posts('600547', max_pages=5)
+        assert second['标题'].tolist() == ['帖子16', '帖子15']
+        assert guba.requests == 1
+        analyzer.commit_watermarks(['600547'])
+        
+        guba.requests = 0
+        assert analyzer._get_stock_guba_posts('600547', max_pages=5).empty
+        assert guba.requests == 1
+        
+        all_titles = first['标题'].tolist() + second['标题'].tolist()
+        assert len(all_titles) == len(set(all_titles)) == 17
+        
+        latest_time, known_ids = store.get('600547')
+        assert latest_time == pd.Timestamp('2025-01-01 09:16')
+        assert 'https://guba.sina.com.cn/post/16' in known_ids
+        
+        # 其他股票的高水位互不影响
+        guba.requests = 0
+        assert len(analyzer._get_stock_guba_posts('600489', max_pages=2)) == 10
+        assert guba.requests == 2
+
+
+def test_incremental_fetch_edge_cases():
+    """测试与高水位同一分钟的新帖子不丢失，置顶帖和排在前面的旧帖子不会提前停止翻页"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = GubaAnalyzer(watermark_store=GubaWatermarkStore(db_path=f"{cache_dir}/guba_watermarks.db"))
+        guba = FakeGuba(total=10)
+        analyzer._fetch_guba_page = guba.fetch_page
+        
+        analyzer._get_stock_guba_posts('600547', max_pages=5)
+        analyzer.commit_watermarks()
+        
+        # 同一分钟（09:09）又发了一条新帖子
+        latest = guba.posts[0]
+        guba.posts.insert(0, {'title': '帖子9补充', 'url': 'https://guba.sina.com.cn/post/9b', 'time': latest['time']})
+        assert analyzer._get_stock_guba_posts('600547', max_pages=5)['标题'].tolist() == ['帖子9补充']
+        analyzer.commit_watermarks()
+        
+        # 第1页顶部是置顶帖和被顶起的旧帖子，新帖子一直排到第2页
+        guba.publish(8)
+        old = guba.posts[-1]
+        guba.posts = [{'title': '【置顶】股吧用户公约', 'url': 'https://guba.sina.com.cn/notice', 'time': pd.Timestamp('2024-01-01')},
+                      old] + guba.posts
+        guba.requests = 0
+        fresh = analyzer._get_stock_guba_posts('600547', max_pages=5)
+        assert fresh['标题'].tolist() == [f"帖子{i}" for i in range(18, 10, -1)]
+        assert guba.requests == 3  # 第3页最后一条已抓取过
+
+
+def test_fetch_without_pagination():
+    """测试接口不支持翻页时只请求一次，不重复拼接同一批帖子"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = GubaAnalyzer(watermark_store=GubaWatermarkStore(db_path=f"{cache_dir}/guba_watermarks.db"))
+        guba = FakeGuba(total=8, paginated=False)
+        analyzer._fetch_guba_page = guba.fetch_page
+        
+        posts = analyzer._get_stock_guba_posts('600547', max_pages=5, incremental=False)
+        assert len(posts) == 5
+        assert guba.requests == 1
+        assert analyzer.watermark_store.get('600547') == (None, set())
+
+
+def test_watchlist_crawl():
+    """测试自选股并发抓取：全局限流、去重合并，结果可直接做情报分析"""
+    from intelligence_analyzer import IntelligenceAnalyzer
+    from stock_names import StockNameDictionary
+    
+    codes = [f"{600000 + i}" for i in range(30)]
+    lock = threading.Lock()
+    state = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+    
+    def fake_stock_guba_sina(symbol, page=1):
+        with lock:
+            state['requests'] += 1
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        time.sleep(0.02)
+        with lock:
+            state['in_flight'] -= 1
+        
+        if page > 2:
+            return pd.DataFrame()
+        rows = [{'title': f"{symbol}第{page}页帖子{i}：放量突破箱体，主力资金净流入明显",
+                 'url': f"https://guba.sina.com.cn/{symbol}/{page}/{i}",
+                 'time': f"2025-01-0{page} 09:3{i}"} for i in range(3)]
+        # 置顶公告不返回；同一条转发帖出现在每只股票的股吧里
+        rows.insert(0, {'title': '置顶：股吧用户公约', 'url': 'https://guba.sina.com.cn/notice', 'time': '2024-01-01 08:00'})
+        rows.append({'title': '转发：股吧用户公约', 'url': 'https://guba.sina.com.cn/forward', 'time': '2025-01-01 08:00'})
+        return pd.DataFrame(rows)
+    
+    rate = 50
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = GubaAnalyzer(
+            watermark_store=GubaWatermarkStore(db_path=f"{cache_dir}/guba_watermarks.db"),
+            fetch_executor=FetchExecutor(max_workers=8, rate_limits={'stock_guba_sina': rate})
+        )
+        
+        arrived = []
+        ak.stock_guba_sina = fake_stock_guba_sina
+        try:
+            start = time.time()
+            posts = analyzer.get_watchlist_posts(codes, max_pages=5, on_posts=lambda code, df: arrived.append(code))
+            elapsed = time.time() - start
+            
+            assert analyzer.commit_watermarks() == len(codes)
+            again = analyzer.get_watchlist_posts(codes, max_pages=5)
+        finally:
+            del ak.stock_guba_sina
+    
+    print(f"{state['requests']} 次请求耗时 {elapsed:.2f} 秒，最大并发 {state['max_in_flight']}")
+    
+    # 每只股票3次请求（第3页为空），令牌桶限制每秒rate次（初始突发rate次）
+    assert state['requests'] == len(codes) * 3 + len(codes)
+    assert elapsed >= (len(codes) * 3 - rate) / rate
+    assert state['max_in_flight'] > 1
+    assert sorted(arrived) == codes
+    
+    # 每只股票6条帖子 + 全局只保留一条转发帖
+    assert len(posts) == len(codes) * 6 + 1
+    assert not posts['标题'].str.startswith('置顶').any()
+    assert posts['帖子链接'].is_unique
+    assert posts['股票代码'].iloc[0] == codes[0]
+    assert again.empty
+    
+    # 帖子正文未提及股票时按所属股吧识别
+    intelligence = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary([['600001', '测试股份']]))
+    result = intelligence.analyze_intelligence(posts, workers=1)
+    assert len(result) == len(codes) * 6
+    assert '测试股份(600001)' in set(result['识别股票'])
+
+
+def test_news_not_attributed_to_keyword():
+    """测试热门/新闻帖子不按关键词列归属股票（stock_news_em默认关键词603777）"""
+    from intelligence_analyzer import IntelligenceAnalyzer
+    from stock_names import StockNameDictionary
+    
+    news = pd.DataFrame({
+        '关键词': ['603777'] * 2,
+        '新闻标题': ['大盘放量突破箱体，主力资金净流入明显', '来伊份放量突破箱体，主力资金净流入明显'],
+        '新闻内容': ['沪指放量突破箱体，成交量明显放大，主力资金净流入明显'] * 2,
+        '发布时间': ['2025-01-02 09:30'] * 2,
+        '新闻链接': ['https://finance.eastmoney.com/a/1', 'https://finance.eastmoney.com/a/2']
+    })
+    posts = GubaAnalyzer()._normalize_posts_format(news)
+    assert (posts['股票代码'] == '603777').all()
+    
+    intelligence = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary([['603777', '来伊份']]))
+    result = intelligence.analyze_intelligence(posts, workers=1)
+    
+    # 正文未提及股票的新闻不归到关键词603777上，提及简称的照常识别
+    assert result['识别股票'].tolist() == ['来伊份(603777)']
+
+
+if __name__ == "__main__":
+    test_filters_match_reference()
+    test_pipeline_stats_and_speed()
+    test_incremental_fetch()
+    test_incremental_fetch_edge_cases()
+    test_fetch_without_pagination()
+    test_watchlist_crawl()
+    test_news_not_attributed_to_keyword()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股吧情报规则引擎测试脚本
+与逐关键词检查的原逻辑逐条对比分类、论据和评分，并测试10万条帖子的吞吐，无需联网
+"""
+
+import random
+import re
+import time
+
+import pandas as pd
+
+from intelligence_analyzer import IntelligenceAnalyzer
+from stock_names import StockNameDictionary
+
+
+def reference_analyze(analyzer, text):
+    """原逐关键词实现（in检查 + 每个关键词重新切分句子），作为对照"""
+    text_lower = text.lower()
+    noise_count = sum(1 for keyword in analyzer.noise_keywords if keyword in text_lower)
+    noise = noise_count >= 3 or (len(text) < 30 and noise_count > 0)
+    
+    stocks = set(re.findall(r'\b[036]\d{5}\b', text))
+    stocks.update(f"{name}({code})" for name, code in analyzer.stock_mapping.items() if name in text)
+    
+    families = [('技术派', analyzer.technical_keywords),
+                ('筹码派', analyzer.chip_keywords),
+                ('基本面', analyzer.fundamental_keywords)]
+    scores = {}
+    for family, keywords_by_category in families:
+        score = sum(1 for keywords in keywords_by_category.values() for keyword in keywords if keyword in text)
+        if score > 0:
+            scores[family] = score
+    categories = [cat for cat, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True)]
+    
+    evidence = ''
+    if categories:
+        evidence_list = []
+        for keywords in dict(families)[categories[0]].values():
+            for keyword in keywords:
+                if keyword in text:
+                    for sentence in re.split(r'[。！？；\n]', text):
+                        if keyword in sentence and len(sentence) > 10:
+                            evidence_list.append(sentence.strip())
+                            break
+            if evidence_list:
+                break
+        evidence = ' | '.join(evidence_list[:3]) if evidence_list else '无明确论据'
+    
+    score = 3 if categories else 0
+    if evidence and evidence != '无明确论据':
+        score += 2 + (len(evidence) > 50) + (len(evidence) > 100)
+    numbers = len(re.findall(r'\d+\.?\d*%?', text))
+    score += 2 if numbers >= 3 else (1 if numbers >= 1 else 0)
+    if sum(1 for term in analyzer.professional_terms if term in text) >= 3:
+        score += 1
+    
+    return noise, stocks, categories, evidence, max(1, min(10, score))
+
+
+def random_posts(analyzer, n, seed=7):
+    """用关键词、股票简称、代码和填充文字随机拼出帖子"""
+    rng = random.Random(seed)
+    vocabulary = list(analyzer.noise_keywords) + list(analyzer.stock_mapping) + analyzer.professional_terms
+    for keywords_by_category in (analyzer.technical_keywords, analyzer.chip_keywords, analyzer.fundamental_keywords):
+        for keywords in keywords_by_category.values():
+            vocabulary.extend(keywords)
+    fillers = ['今天', '感觉', '后市', '明天继续观察', '600547', '12.5%', '3.2元', '放', '量', ' ', 'ab']
+    separators = ['。', '！', '？', '；', '\n', '，', '']
+    
+    posts = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 25)):
+            parts.append(rng.choice(vocabulary) if rng.random() < 0.4 else rng.choice(fillers))
+            parts.append(rng.choice(separators))
+        posts.append(''.join(parts))
+    return posts
+
+
+def test_matches_reference_logic():
+    """测试规则引擎的噪音、股票、分类、论据、评分与原逻辑一致"""
+    analyzer = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary())
+    
+    for text in random_posts(analyzer, 3000):
+        noise, stocks, categories, evidence, score = reference_analyze(analyzer, text)
+        
+        assert analyzer._is_noise(text) == noise, text
+        assert set(analyzer._identify_stocks(text)) == stocks, text
+        assert analyzer._classify_post(text) == categories, text
+        assert analyzer._extract_evidence(text, categories) == evidence, text
+        assert analyzer._evaluate_value(text, categories, evidence) == score, text
+
+
+def test_overlapping_keywords():
+    """测试重叠和重复归类的关键词：MACD金叉同时命中MACD/金叉/MACD金叉，减仓在筹码派计两次"""
+    analyzer = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary())
+    engine = analyzer._get_rule_engine()
+    
+    hits = engine.scan('MACD金叉')
+    assert set(hits) == {'MACD', '金叉', 'MACD金叉'}
+    assert engine.classify(hits) == ['技术派']
+    
+    hits = engine.scan('主力减仓')
+    assert engine.classify(hits) == ['筹码派']
+    
+    # 筹码派3分（主力+减仓×2）高于技术派2分；同分时技术派在前
+    assert analyzer._classify_post('主力减仓，均线金叉') == ['筹码派', '技术派']
+    assert analyzer._classify_post('主力减仓，均线金叉，放量') == ['技术派', '筹码派']
+    
+    text = '山东黄金今天涨了。山东黄金放量突破60日线，主力资金净流入明显'
+    evidence = analyzer._extract_evidence(text, ['技术派'])
+    assert evidence == '山东黄金放量突破60日线，主力资金净流入明显'
+
+
+def test_analyze_intelligence_throughput():
+    """测试10万条帖子的整体分析"""
+    analyzer = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary())
+    
+    posts = random_posts(analyzer, 2000, seed=11)
+    n = 100000
+    df = pd.DataFrame({
+        '标题': [posts[i % len(posts)][:20] for i in range(n)],
+        '内容': [posts[(i * 7) % len(posts)] for i in range(n)],
+        '帖子链接': [f"https://guba.eastmoney.com/{i}" for i in range(n)],
+        '发布时间': ['2025-01-01 09:30'] * n
+    })
+    
+    start = time.time()
+    result = analyzer.analyze_intelligence(df)
+    elapsed = time.time() - start
+    
+    print(f"{n} 条帖子耗时 {elapsed:.2f} 秒，筛选出 {len(result)} 条")
+    assert not result.empty
+    assert result['价值评分'].between(1, 10).all()
+    assert result['原文链接'].str.startswith('https://guba.eastmoney.com/').all()
+    assert elapsed < 120
+
+
+def test_parallel_matches_serial():
+    """测试多进程分析与串行分析的结果完全一致"""
+    analyzer = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary())
+    analyzer.intelligence_config['parallel_min_posts'] = 0
+    
+    posts = random_posts(analyzer, 3000, seed=5)
+    df = pd.DataFrame({
+        '标题': [post[:15] for post in posts],
+        '内容': posts,
+        '帖子链接': [f"https://guba.eastmoney.com/{i}" for i in range(len(posts))],
+        '发布时间': ['2025-01-01 09:30'] * len(posts)
+    })
+    
+    timings = {}
+    results = {}
+    for workers in (1, 4):
+        start = time.time()
+        results[workers] = analyzer.analyze_intelligence(df, workers=workers)
+        timings[workers] = time.time() - start
+    
+    print(f"串行 {timings[1]:.2f} 秒，4进程 {timings[4]:.2f} 秒")
+    assert not results[1].empty
+    pd.testing.assert_frame_equal(results[1], results[4])
+
+
+if __name__ == "__main__":
+    test_matches_reference_logic()
+    test_overlapping_keywords()
+    test_analyze_intelligence_throughput()
+    test_parallel_matches_serial()
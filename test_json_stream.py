@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量JSON解析测试脚本
+逐字符输入模型输出，测试数组元素的产出时机和格式异常检测
+"""
+
+from json_stream import JSONStreamParser, MalformedStreamError
+
+
+def feed_all(text, step=1):
+    """按固定步长分段输入，返回产出的元素和解析器"""
+    parser = JSONStreamParser()
+    items = []
+    for i in range(0, len(text), step):
+        items.extend(parser.feed(text[i:i+step]))
+    return items, parser
+
+
+def test_items_from_object_arrays():
+    """测试顶层对象中数组字段的元素逐个产出（字符串中的括号、转义不影响解析）"""
+    text = ('```json\n{"hot_sectors": [{"sector_name": "黄金[贵金属]", "reason": "避险\\"升温\\""}, '
+            '{"sector_name": "有色", "growth_rate": -1.5e2}], '
+            '"key_events": ["美联储{降息}", "央行购金"], "market_sentiment": "乐观", "ok": true, "x": null}\n```')
+    
+    for step in (1, 7, len(text)):
+        items, parser = feed_all(text, step)
+        assert items == [
+            ('hot_sectors', {'sector_name': '黄金[贵金属]', 'reason': '避险"升温"'}),
+            ('hot_sectors', {'sector_name': '有色', 'growth_rate': -150.0}),
+            ('key_events', '美联储{降息}'),
+            ('key_events', '央行购金')
+        ]
+        assert parser.done
+        assert parser.result()['market_sentiment'] == '乐观'
+
+
+def test_items_from_top_level_array():
+    """测试顶层数组的元素产出（标量元素不单独产出）"""
+    items, parser = feed_all('[{"stock_name": "山东黄金"}, [1, 2], "文本", 3]')
+    assert items == [(None, {'stock_name': '山东黄金'}), (None, [1, 2]), (None, '文本')]
+    assert parser.result()[-1] == 3
+
+
+def test_malformed_detected_early():
+    """测试已产出元素后的格式异常在出现时立即报错"""
+    cases = [
+        ('{"a": [{}, 2}', 12),                # 括号不匹配
+        ('{"a": [{"b": 1}], 抱歉后面无法输出', 18),   # 字符串外出现文字
+        ('说明' * 200 + '{}', 300),             # 迟迟没有JSON
+        ('[注意] ' + '说明' * 200, 300),         # 说明文字中的括号被跳过，之后迟迟没有JSON
+    ]
+    for text, position in cases:
+        parser = JSONStreamParser()
+        try:
+            for i, char in enumerate(text):
+                parser.feed(char)
+        except MalformedStreamError:
+            assert i == position, (text, i)
+        else:
+            raise AssertionError(f"未检测到格式异常: {text}")
+    
+    # 被截断的输出
+    items, parser = feed_all('{"recommendations": [{"rank": 1}, {"rank": 2')
+    assert items == [('recommendations', {'rank': 1})]
+    try:
+        parser.result()
+    except MalformedStreamError:
+        pass
+    else:
+        raise AssertionError("未检测到输出不完整")
+
+
+def test_preamble_with_brackets():
+    """测试尚未产出元素时候选值失败，从下一个括号重新开始（与extract_json一致）"""
+    text = '根据[数据]分析，参考[1]，结果如下：\n{"recommendations": [{"rank": 1}], "note": "[完]"}'
+    
+    for step in (1, 5, len(text)):
+        parser = JSONStreamParser(expect=dict)
+        items = []
+        for i in range(0, len(text), step):
+            items.extend(parser.feed(text[i:i+step]))
+        assert items == [('recommendations', {'rank': 1})]
+        assert parser.result() == {'recommendations': [{'rank': 1}], 'note': '[完]'}
+    
+    # 不限类型时"[1]"本身就是合法的顶层值
+    items, parser = feed_all('参考[1]，{"a": 1}')
+    assert parser.result() == [1]
+
+
+if __name__ == "__main__":
+    test_items_from_object_arrays()
+    test_items_from_top_level_array()
+    test_malformed_detected_early()
+    test_preamble_with_brackets()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI回复缓存测试脚本
+使用临时SQLite文件和模拟HTTP响应，无需联网
+"""
+
+import os
+import tempfile
+
+from llm_response_cache import LLMResponseCache, make_cache_key
+from test_deepseek_client import FakeResponse, make_client
+
+
+def test_lru_eviction():
+    """测试超出大小上限时淘汰最久未访问的回复"""
+    print("测试回复缓存LRU淘汰...")
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LLMResponseCache(db_path=os.path.join(cache_dir, 'llm.db'), max_bytes=250)
+        
+        cache.put('a', 'x' * 100)
+        cache.put('b', 'y' * 100)
+        assert cache.get('a') == 'x' * 100  # a变为最近访问
+        
+        cache.put('c', 'z' * 100)
+        assert cache.get('b') is None
+        assert cache.get('a') == 'x' * 100
+        assert cache.get('c') == 'z' * 100
+        
+        assert cache.stats == {'hit': 3, 'miss': 1, 'evict': 1}
+        print(cache.summary())
+
+
+def test_cache_key():
+    """测试缓存键区分模型、提示词、输入、温度和API地址"""
+    base = make_cache_key('deepseek-chat', 'system', 'user', 0.3)
+    
+    assert base == make_cache_key('deepseek-chat', 'system', 'user', 0.3)
+    assert base != make_cache_key('deepseek-reasoner', 'system', 'user', 0.3)
+    assert base != make_cache_key('deepseek-chat', 'system2', 'user', 0.3)
+    assert base != make_cache_key('deepseek-chat', 'system', 'user2', 0.3)
+    assert base != make_cache_key('deepseek-chat', 'system', 'user', 0.7)
+    
+    real = make_cache_key('deepseek-chat', 'system', 'user', 0.3, 'https://api.deepseek.com/v1')
+    assert real != base
+    assert real == make_cache_key('deepseek-chat', 'system', 'user', 0.3, 'https://api.deepseek.com/v1/')
+    assert real != make_cache_key('deepseek-chat', 'system', 'user', 0.3, 'http://127.0.0.1:8765/v1')
+
+
+def test_client_uses_cache():
+    """测试重复请求命中缓存，不可用的回复不保留"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client, calls = make_client([
+            FakeResponse(200, '{"summary": "看多"}'),
+            FakeResponse(200, '格式错误的回复'),
+            FakeResponse(200, '{"summary": "看空"}')
+        ])
+        client.cache = LLMResponseCache(db_path=os.path.join(cache_dir, 'llm.db'))
+        
+        assert client.chat_json('system', '帖子A') == {'summary': '看多'}
+        assert client.chat_json('system', '帖子A') == {'summary': '看多'}
+        assert len(calls) == 1
+        
+        # 解析失败的回复被删除，下次重新请求
+        assert client.chat_json('system', '帖子B') is None
+        assert client.chat_json('system', '帖子B') == {'summary': '看空'}
+        assert len(calls) == 3
+        
+        assert client.cache.stats['hit'] == 1
+        print(client.cache_summary())
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    test_cache_key()
+    test_client_uses_cache()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场行情快照缓存测试脚本
+使用模拟行情数据，无需联网
+"""
+
+import tempfile
+import pandas as pd
+
+import market_snapshot
+from market_snapshot import MarketSnapshot
+
+
+def make_mock_spot():
+    """构造模拟的stock_zh_a_spot_em返回"""
+    return pd.DataFrame({
+        '代码': ['600547', '600489', '000975'],
+        '名称': ['山东黄金', '中金黄金', '银泰黄金'],
+        '最新价': ['30.5', '12.1', '15.8'],
+        '涨跌幅': [3.2, 2.5, -1.1],
+        '换手率': [6.1, 5.5, 2.0],
+        '总市值': [1.4e11, 5.9e10, 4.4e10],
+        '流通市值': [9.8e10, 5.9e10, 4.3e10],
+        '市盈率-动态': [35.2, 20.1, 28.4],
+        '市净率': [4.1, 2.2, 3.0]
+    })
+
+
+def test_snapshot_cache():
+    """测试同一进程内只下载一次"""
+    print("测试行情快照内存缓存...")
+    
+    calls = []
+    original = market_snapshot.ak.stock_zh_a_spot_em
+    
+    def mock_spot():
+        calls.append(1)
+        return make_mock_spot()
+    
+    market_snapshot.ak.stock_zh_a_spot_em = mock_spot
+    
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            snapshot = MarketSnapshot(ttl=60, cache_dir=cache_dir)
+            
+            df1 = snapshot.get()
+            df2 = snapshot.get()
+            
+            assert len(calls) == 1
+            assert len(df1) == 3
+            assert df1['最新价'].dtype.kind == 'f'
+            
+            # 返回副本，调用方修改不影响缓存
+            df1['新列'] = 1
+            assert '新列' not in df2.columns
+            assert '新列' not in snapshot.get().columns
+            
+            stock = snapshot.get_stock('600489')
+            assert stock['名称'] == '中金黄金'
+            assert snapshot.get_stock('999999') == {}
+            
+            print("✓ 内存缓存测试通过")
+    finally:
+        market_snapshot.ak.stock_zh_a_spot_em = original
+
+
+def test_snapshot_disk_and_fallback():
+    """测试磁盘缓存复用和下载失败降级"""
+    print("测试行情快照磁盘缓存...")
+    
+    original = market_snapshot.ak.stock_zh_a_spot_em
+    
+    def failing_spot():
+        raise ConnectionError("网络不可用")
+    
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            market_snapshot.ak.stock_zh_a_spot_em = make_mock_spot
+            MarketSnapshot(ttl=60, cache_dir=cache_dir).get()
+            
+            # 新实例（模拟另一个脚本）直接读取磁盘快照
+            market_snapshot.ak.stock_zh_a_spot_em = failing_spot
+            df = MarketSnapshot(ttl=60, cache_dir=cache_dir).get()
+            assert len(df) == 3
+            
+            # 快照过期且下载失败时，使用过期快照
+            df = MarketSnapshot(ttl=0, cache_dir=cache_dir).get()
+            assert len(df) == 3
+            assert df.iloc[0]['代码'] == '600547'
+            
+            print("✓ 磁盘缓存测试通过")
+    finally:
+        market_snapshot.ak.stock_zh_a_spot_em = original
+
+
+if __name__ == "__main__":
+    test_snapshot_cache()
+    test_snapshot_disk_and_fallback()
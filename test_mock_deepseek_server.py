@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟DeepSeek服务器测试脚本
+在本机端口上启动模拟服务器，测试回放、录制、故障注入，以及客户端和分析器经真实HTTP调用的行为
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from deepseek_analyzer import DeepSeekAnalyzer
+from deepseek_client import DeepSeekClient, get_deepseek_client, set_api_base_override
+from llm_response_cache import LLMResponseCache
+from mock_deepseek_server import MockDeepSeekServer
+
+
+def make_server(directory, **overrides):
+    """无延迟、无故障、自动分配端口的回放服务器"""
+    settings = dict(port=0, latency=0, latency_jitter=0, rate_429=0, rate_malformed=0, retry_after=0,
+                    stream_chunk_delay=0, fallback_content=None)
+    settings.update(overrides)
+    return MockDeepSeekServer(recordings_path=os.path.join(directory, 'recordings.jsonl'), **settings)
+
+
+def make_client(api_base):
+    return DeepSeekClient(api_key='test', api_base=api_base, retry_base_delay=0, response_cache=False)
+
+
+def test_replay_and_stream():
+    """测试回放录制的回复（普通和流式），无录制时返回404"""
+    with tempfile.TemporaryDirectory() as directory:
+        with make_server(directory) as server:
+            server.record('system', 'user', '{"recommendations": [{"rank": 1}, {"rank": 2}]}')
+            client = make_client(server.api_base)
+            
+            assert client.chat_json('system', 'user', temperature=0.3) == {'recommendations': [{'rank': 1}, {'rank': 2}]}
+            
+            arrivals = []
+            result = client.chat_json('system', 'user', temperature=0.3, stream=True,
+                                      on_item=lambda key, item: arrivals.append(item['rank']))
+            assert result['recommendations'][1] == {'rank': 2}
+            assert arrivals == [1, 2]
+            
+            assert client.chat('system', '未录制的输入', temperature=0.3) is None
+            print(server.summary())
+            assert server.stats['replay'] == 2
+            assert server.stats['stream'] == 1
+            assert server.stats['miss'] == 1
+
+
+def test_record_then_replay():
+    """测试录制模式转发到上游并写入文件，之后离线回放得到相同回复"""
+    with tempfile.TemporaryDirectory() as directory:
+        upstream = make_server(os.path.join(directory, 'upstream'), fallback_content='{"sentiment_index": 66}')
+        upstream.start()
+        
+        try:
+            with make_server(directory, mode='record', upstream=upstream.api_base) as recorder:
+                assert make_client(recorder.api_base).chat_json('system', 'user') == {'sentiment_index': 66}
+            assert recorder.stats['record'] == 1
+        finally:
+            upstream.stop()
+        
+        with open(os.path.join(directory, 'recordings.jsonl'), encoding='utf-8') as f:
+            assert json.loads(f.readline())['user_input'] == 'user'
+        
+        with make_server(directory) as replayer:
+            assert make_client(replayer.api_base).chat_json('system', 'user') == {'sentiment_index': 66}
+            assert replayer.stats['replay'] == 1
+
+
+def test_fault_injection_is_deterministic():
+    """测试注入429和格式错误：客户端重试次数与服务器注入次数一致，两次运行结果相同"""
+    outcomes = []
+    
+    for _ in range(2):
+        with tempfile.TemporaryDirectory() as directory:
+            with make_server(directory, rate_429=0.3, rate_malformed=0.2, seed=7,
+                             fallback_content='[{"a": 1}, {"a": 2}]') as server:
+                client = make_client(server.api_base)
+                results = [client.chat_json('system', f'输入{i}', expect=list) for i in range(30)]
+                
+                assert client.stats['retry'] + client.stats['error'] == server.stats['429']
+                assert server.stats['429'] > 0 and server.stats['malformed'] > 0
+                assert sum(result is None for result in results) >= server.stats['malformed']
+                outcomes.append((dict(server.stats), [result is None for result in results]))
+    
+    assert outcomes[0] == outcomes[1]
+
+
+def test_analyzer_concurrency_against_server():
+    """测试DeepSeekAnalyzer并发模式经HTTP调用模拟服务器（含延迟）的耗时"""
+    with tempfile.TemporaryDirectory() as directory:
+        reply = '[{"stock_name": "山东黄金", "sentiment_score": 0.5, "key_logic": "测试", "confidence_level": 0.8}]'
+        with make_server(directory, latency=0.2, fallback_content=reply) as server:
+            analyzer = DeepSeekAnalyzer(api_key='test')
+            analyzer.deepseek = make_client(server.api_base)
+            
+            posts = pd.DataFrame({'标题': [f'帖子{i}' for i in range(10)], '内容': ['内容'] * 10})
+            
+            start = time.perf_counter()
+            result = analyzer.analyze_posts(posts, concurrency=5, requests_per_minute=6000)
+            elapsed = time.perf_counter() - start
+            
+            print(f"10条帖子经模拟服务器并发分析耗时: {elapsed:.2f}秒")
+            assert len(result) == 10
+            assert server.stats['request'] == 10
+            assert elapsed < 1.5
+
+
+def test_api_base_override():
+    """测试进程内覆盖后所有模块的客户端都指向模拟服务器"""
+    try:
+        set_api_base_override('http://127.0.0.1:8765/v1/')
+        assert get_deepseek_client('test', 'https://api.deepseek.com/v1').api_base == 'http://127.0.0.1:8765/v1'
+        assert DeepSeekAnalyzer(api_key='test').deepseek.api_base == 'http://127.0.0.1:8765/v1'
+    finally:
+        set_api_base_override(None)
+    
+    assert get_deepseek_client('test', 'https://api.deepseek.com/v1').api_base == 'https://api.deepseek.com/v1'
+
+
+def test_response_cache_separated_by_api_base():
+    """测试模拟服务器的回复不会写入真实API的缓存键，真实回复的缓存也不会拦下发往模拟服务器的请求"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = LLMResponseCache(db_path=os.path.join(directory, 'llm_responses.db'))
+        
+        with make_server(directory, fallback_content='[]') as server:
+            mock_client = make_client(server.api_base)
+            mock_client.cache = cache
+            real_client = make_client('https://api.deepseek.com/v1')
+            real_client.cache = cache
+            
+            cache.put(real_client._cache_key('system', 'user', 0.3), '{"real": true}')
+            
+            assert mock_client.chat('system', 'user', temperature=0.3) == '[]'
+            assert server.stats['request'] == 1
+            assert mock_client.chat('system', 'user', temperature=0.3) == '[]'
+            assert server.stats['request'] == 1
+            
+            assert real_client.chat('system', 'user', temperature=0.3) == '{"real": true}'
+
+
+if __name__ == "__main__":
+    test_replay_and_stream()
+    test_record_then_replay()
+    test_fault_injection_is_deterministic()
+    test_analyzer_concurrency_against_server()
+    test_api_base_override()
+    test_response_cache_separated_by_api_base()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多模式匹配与舆情碰撞测试脚本
+与原逐股票×逐舆情匹配逻辑对照，无需联网
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from multi_pattern_matcher import AhoCorasick
+from Quant_Picker import QuantPicker
+
+
+def reference_match(picker, stock_name, stock_code, sentiment_data):
+    """原_match_sentiment的逐条匹配逻辑"""
+    max_score = 0
+    best_source = '无'
+    best_keywords = ''
+    max_weight = 1
+    
+    for item in sentiment_data:
+        text = item['text']
+        followers = item.get('followers', 1000)
+        
+        if stock_name in text or stock_code in text:
+            if followers >= 1000000:
+                weight = 10
+            elif followers >= 100000:
+                weight = 3
+            else:
+                weight = 1
+            
+            score = 50
+            matched_kw = []
+            for tier, bonus in [('high_priority', 30), ('medium_priority', 20), ('low_priority', 10)]:
+                for kw in picker.sentiment_keywords[tier]:
+                    if kw in text:
+                        score += bonus
+                        matched_kw.append(kw)
+                        break
+                if matched_kw:
+                    break
+            
+            if score * weight > max_score:
+                max_score = score * weight
+                best_source = item['source']
+                best_keywords = ','.join(matched_kw)
+                max_weight = weight
+    
+    return min(100, max_score / 10), best_source, best_keywords, max_weight
+
+
+def make_corpus(n_stocks, n_texts, seed=0):
+    """构造随机候选股票和舆情文本"""
+    rng = np.random.default_rng(seed)
+    
+    df_stocks = pd.DataFrame({
+        '代码': [f"{600000 + i:06d}" for i in range(n_stocks)],
+        '名称': [f"测试{i}号" for i in range(n_stocks)]
+    })
+    
+    words = ['今天', '重组', '回购', '看好', '业绩', '突破', '关注', '大盘', '行情']
+    sentiment_data = []
+    for i in range(n_texts):
+        parts = list(rng.choice(words, 3))
+        for j in rng.integers(0, n_stocks, rng.integers(0, 3)):
+            parts.append(df_stocks['名称'][j] if rng.random() > 0.3 else df_stocks['代码'][j])
+        rng.shuffle(parts)
+        sentiment_data.append({
+            'text': ''.join(parts),
+            'source': '微博' if i % 2 else '全网雷达',
+            'followers': int(rng.choice([500, 200000, 2000000])),
+            'platform': '微博'
+        })
+    
+    return df_stocks, sentiment_data
+
+
+def test_automaton_overlapping_matches():
+    """测试重叠命中和后缀命中"""
+    matcher = AhoCorasick()
+    for pattern in ['中金', '中金黄金', '黄金', '600489']:
+        matcher.add(pattern)
+    matcher.build()
+    
+    hits = sorted(matcher.iter_matches('中金黄金(600489)'))
+    assert hits == [(0, 2, '中金'), (0, 4, '中金黄金'), (2, 4, '黄金'), (5, 11, '600489')]
+    assert matcher.find_values('无关文本') == set()
+
+
+def test_match_sentiment_matches_reference():
+    """测试自动机舆情碰撞与原逐条匹配结果一致"""
+    print("测试舆情碰撞一致性...")
+    
+    picker = QuantPicker(api_key='test')
+    df_stocks, sentiment_data = make_corpus(50, 2000)
+    
+    matcher = picker._build_sentiment_matcher(df_stocks)
+    matches = picker._match_sentiment(df_stocks, sentiment_data, matcher)
+    
+    for code, name in zip(df_stocks['代码'], df_stocks['名称']):
+        expected = reference_match(picker, name, code, sentiment_data)
+        if code in matches.index:
+            row = matches.loc[code]
+            actual = (row['舆情评分'], row['舆情来源'], row['匹配关键词'], row['博主影响力'])
+        else:
+            actual = (0, '无', '', 1)
+        assert actual == expected, (code, actual, expected)
+    
+    print(f"✓ {len(matches)} 只被提及股票的匹配结果与原逻辑一致")
+
+
+def test_influence_weights():
+    """测试粉丝数分档权重（含缺失和非数值）"""
+    picker = QuantPicker(api_key='test')
+    followers = pd.Series([0, 99999, 100000, 999999, 1000000, None, '未知'])
+    
+    weights = picker._influence_weights(followers)
+    assert list(weights) == [1, 1, 3, 3, 10, 1, 1]
+
+
+def test_match_sentiment_speed():
+    """测试1000只候选股票 × 20000条舆情的碰撞耗时"""
+    picker = QuantPicker(api_key='test')
+    df_stocks, sentiment_data = make_corpus(1000, 20000, seed=1)
+    
+    start = time.perf_counter()
+    matcher = picker._build_sentiment_matcher(df_stocks)
+    picker._match_sentiment(df_stocks, sentiment_data, matcher)
+    elapsed = time.perf_counter() - start
+    
+    print(f"1000只股票 × 20000条舆情碰撞耗时: {elapsed:.2f}秒")
+    assert elapsed < 10
+
+
+if __name__ == "__main__":
+    test_automaton_overlapping_matches()
+    test_match_sentiment_matches_reference()
+    test_influence_weights()
+    test_match_sentiment_speed()
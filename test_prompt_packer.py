@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词token预算打包测试脚本
+测试token估算、近似重复去除、预算填充、分片，以及微博情绪分析的选帖和map-reduce，无需联网
+"""
+
+import hashlib
+import threading
+import time
+
+import pandas as pd
+
+from prompt_packer import PromptPacker, estimate_tokens
+from weibo_sentiment_weighted import WeiboSentimentWeightedAnalyzer
+
+
+def test_estimate_tokens():
+    """测试中英文token估算"""
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('黄金') == 2
+    assert estimate_tokens('山东黄金600547') == 5
+    assert estimate_tokens('gold' * 10) == 12
+
+
+def test_pack_fills_budget_and_dedups():
+    """测试按顺序填满预算、跳过近似重复、最后一条截断补齐"""
+    texts = [
+        '山东黄金突破60日均线，主力资金大幅流入！',
+        '山东黄金突破60日均线,主力资金大幅流入 http://t.cn/abc',
+        '紫金矿业业绩预告超预期，社保基金增持明显。' * 5,
+        '中金黄金放量突破'
+    ]
+    
+    packer = PromptPacker(budget_tokens=60)
+    result = packer.pack(texts, lambda position, index, text: f"{position}. {text}")
+    
+    print(PromptPacker.describe(result))
+    assert result['indices'] == [0, 2]
+    assert result['duplicates'] == 1
+    assert result['truncated']
+    assert result['skipped'] == 1
+    assert result['text'].startswith('1. 山东黄金') and '\n2. 紫金矿业' in result['text']
+    assert result['tokens'] <= 60
+    assert result['tokens'] >= 60 - 1
+    assert estimate_tokens(result['text']) <= result['tokens']
+    
+    # 剩余预算不足min_item_tokens时不截断，继续放入更短的条目
+    packer = PromptPacker(budget_tokens=40, min_item_tokens=30)
+    result = packer.pack(texts)
+    assert result['indices'] == [0, 3]
+    assert not result['truncated']
+
+
+def test_weibo_posts_packed_by_influence():
+    """测试微博情绪分析按影响力排序、在预算内选帖并去除搬运"""
+    analyzer = WeiboSentimentWeightedAnalyzer(api_key='test')
+    analyzer.prompt_packer = PromptPacker(budget_tokens=120, separator="\n\n---\n\n")
+    
+    df = pd.DataFrame({
+        '博文内容': ['普通用户看好黄金', '大V：黄金牛市开启，金价将创新高', '大V：黄金牛市开启，金价将创新高！',
+                 '中V：央行持续增持黄金储备'],
+        '粉丝数': [500, 2000000, 1500000, 200000],
+        '影响力权重': [1, 10, 10, 3],
+        '关键词加成': [False, True, True, False],
+        '点赞数': [1, 500, 300, 50],
+        '转发数': [0, 100, 80, 10]
+    })
+    
+    sent = []
+    
+    def fake_api(text):
+        sent.append(text)
+        return {'sentiment_index': 70}
+    
+    analyzer._call_deepseek_api = fake_api
+    result = analyzer.analyze_sentiment_with_ai_weighted(df)
+    
+    assert result['ai_base_score'] == 70
+    assert sent[0].startswith('【微博1】(粉丝:2000000, 权重:10, 关键词:是)')
+    assert '【微博2】(粉丝:200000' in sent[0]
+    assert '【微博3】(粉丝:500' in sent[0]
+    assert '1500000' not in sent[0]
+    assert estimate_tokens(sent[0]) <= 120
+
+
+def test_shard_covers_all_posts():
+    """测试分片覆盖全部非重复文本且每片不超预算"""
+    texts = [f"第{i}条微博：黄金走势{hashlib.md5(str(i).encode()).hexdigest()[:16]}" for i in range(200)]
+    texts.insert(50, texts[10] + '！')
+    
+    packer = PromptPacker(budget_tokens=100)
+    shards = packer.shard(texts)
+    
+    indices = [index for shard in shards for index in shard['indices']]
+    assert indices == [i for i in range(len(texts)) if i != 50]
+    assert sum(shard['duplicates'] for shard in shards) == 1
+    assert all(estimate_tokens(shard['text']) <= shard['tokens'] <= 100 for shard in shards)
+    
+    limited = packer.shard(texts, max_shards=3)
+    assert len(limited) == 3
+    assert limited[-1]['skipped'] > 0
+
+
+def test_weibo_map_reduce():
+    """测试map-reduce：分片并发分析，按影响力加权合并情绪指数和观点"""
+    analyzer = WeiboSentimentWeightedAnalyzer(api_key='test')
+    analyzer.prompt_packer = PromptPacker(budget_tokens=60, separator="\n\n---\n\n")
+    
+    n = 12
+    df = pd.DataFrame({
+        '博文内容': [f"{'大V' if i < 4 else '散户'}{i}号：黄金后市{'看涨' if i < 4 else '看跌'}，理由编号{i}" for i in range(n)],
+        '粉丝数': [2000000 if i < 4 else 500 for i in range(n)],
+        '影响力权重': [10 if i < 4 else 1 for i in range(n)],
+        '关键词加成': [False] * n,
+        '点赞数': list(range(n, 0, -1)),
+        '转发数': [0] * n
+    })
+    
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'max_in_flight': 0, 'calls': 0}
+    
+    def fake_api(text):
+        with lock:
+            state['calls'] += 1
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        time.sleep(0.05)
+        with lock:
+            state['in_flight'] -= 1
+        
+        bullish = '大V' in text
+        return {
+            'sentiment_index': 80 if bullish else 30,
+            'risk_points': ['美联储加息'] if not bullish else ['未提及'],
+            'opportunity_points': ['避险需求', '央行购金'] if bullish else ['央行购金'],
+            'summary': '大V看涨' if bullish else '散户看跌'
+        }
+    
+    analyzer._call_deepseek_api = fake_api
+    result = analyzer.analyze_sentiment_map_reduce(df, concurrency=4)
+    
+    stats = result['map_reduce']
+    print(f"分片数: {stats['shards']}, 最大并发: {state['max_in_flight']}")
+    assert stats['shards'] == state['calls'] > 2
+    assert stats['posts'] == n
+    assert state['max_in_flight'] > 1
+    
+    # 大V分片(权重40)看涨80，散户分片(权重8)看跌30 → 加权指数 = (80*40 + 30*8) / 48
+    assert result['sentiment_index'] == round((80 * 40 + 30 * 8) / 48, 1)
+    assert result['sentiment_label'] == '乐观'
+    assert result['summary'] == '大V看涨'
+    assert result['opportunity_points'][0] == '央行购金'
+    assert result['risk_points'] == ['美联储加息']
+    assert 0 < result['weighted_sentiment_index'] <= 100
+
+
+if __name__ == "__main__":
+    test_estimate_tokens()
+    test_pack_fills_budget_and_dedups()
+    test_weibo_posts_packed_by_influence()
+    test_shard_covers_all_posts()
+    test_weibo_map_reduce()
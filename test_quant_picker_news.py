@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量化选股器新闻并发获取测试脚本
+模拟ak.stock_news_em，使用临时缓存文件，无需联网
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+import Quant_Picker
+from Quant_Picker import QuantPicker
+from fetch_executor import FetchExecutor
+from stock_data_cache import StockDataCache
+
+
+def make_picker(cache_dir):
+    """构造使用临时缓存、不限流的选股器"""
+    picker = QuantPicker(api_key='test')
+    picker.fetcher = FetchExecutor(max_workers=8, rate_limits={'stock_news_em': 1000}, retry_base_delay=0)
+    picker.data_cache = StockDataCache(db_path=os.path.join(cache_dir, 'stock_data.db'))
+    return picker
+
+
+def test_fetch_news_concurrent_and_cached():
+    """测试新闻并发获取、结果顺序以及第二次运行命中缓存"""
+    print("测试新闻并发获取...")
+    
+    calls = []
+    lock = threading.Lock()
+    
+    def fake_news(symbol):
+        with lock:
+            calls.append(symbol)
+        time.sleep(0.2)
+        if symbol == '000003':
+            raise ConnectionError('模拟网络错误')
+        return pd.DataFrame({'新闻标题': [f'{symbol}新闻{i}' for i in range(5)],
+                             '发布时间': ['2026-10-18 09:30:00'] * 5})
+    
+    original = Quant_Picker.ak.stock_news_em
+    Quant_Picker.ak.stock_news_em = fake_news
+    
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            picker = make_picker(cache_dir)
+            df_stocks = pd.DataFrame({'代码': [f'{i:06d}' for i in range(1, 9)]})
+            
+            start = time.perf_counter()
+            result = picker._fetch_stock_news(df_stocks.copy())
+            elapsed = time.perf_counter() - start
+            
+            print(f"8只股票新闻获取耗时: {elapsed:.2f}秒")
+            assert elapsed < 1.0
+            assert result['最新新闻'][0] == '000001新闻0; 000001新闻1; 000001新闻2'
+            assert result['最新新闻'][2] == '暂无最新新闻'
+            
+            # 第二次获取：成功的股票命中缓存，失败的股票重新请求
+            fetched = len(calls)
+            result = picker._fetch_stock_news(df_stocks.copy())
+            assert calls[fetched:] == ['000003'] * (len(calls) - fetched)
+            assert result['最新新闻'][7] == '000008新闻0; 000008新闻1; 000008新闻2'
+    finally:
+        Quant_Picker.ak.stock_news_em = original
+
+
+def test_prefetch_news():
+    """测试预取后Step 3直接取结果，不重复请求"""
+    calls = []
+    
+    def fake_news(symbol):
+        calls.append(symbol)
+        return pd.DataFrame({'新闻标题': [f'{symbol}快讯']})
+    
+    original = Quant_Picker.ak.stock_news_em
+    Quant_Picker.ak.stock_news_em = fake_news
+    
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            picker = make_picker(cache_dir)
+            picker.prefetch_news(['600547', '600489'])
+            picker.prefetch_news(['600547'])
+            
+            result = picker._fetch_stock_news(pd.DataFrame({'代码': ['600489', '600547']}))
+            assert list(result['最新新闻']) == ['600489快讯', '600547快讯']
+            assert sorted(calls) == ['600489', '600547']
+            
+            # 未进入TOP N的预取任务在Step 3后被丢弃，close()关闭线程池
+            picker.prefetch_news(['600001', '600002'])
+            picker._fetch_stock_news(pd.DataFrame({'代码': ['600547']}))
+            assert picker._news_futures == {}
+            
+            picker.close()
+            assert picker._news_pool is None
+    finally:
+        Quant_Picker.ak.stock_news_em = original
+
+
+if __name__ == "__main__":
+    test_fetch_news_concurrent_and_cached()
+    test_prefetch_news()
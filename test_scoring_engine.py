@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量化评分引擎测试脚本
+与原逐只评分逻辑对照，无需联网
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from scoring_engine import score_candidates, STOCK_SCORE_RULES
+from gold_stock_screener import GoldStockScreener
+
+
+def reference_score(row):
+    """原calculate_stock_score中的逐只评分逻辑"""
+    total_shares = row['总股本(亿股)']
+    
+    shares_score = 0
+    if 8 <= total_shares <= 12:
+        shares_score = 25
+    elif 12 < total_shares <= 15:
+        shares_score = 20
+    
+    official_score = 30 if row['官方背书'] else 0
+    buyback_score = 20 if row['增持动向'] else 0
+    keyword_score = min(row['题材类别数'] * 3, 15)
+    
+    rate = row['平均股息率']
+    if rate <= 0:
+        dividend_score = 0
+    elif rate >= 0.04 or rate > 0.03:
+        dividend_score = 10
+    elif rate > 0.02:
+        dividend_score = 5
+    else:
+        dividend_score = 2
+    
+    return shares_score + official_score + buyback_score + keyword_score + dividend_score
+
+
+def make_features(n, seed=0):
+    """构造随机候选股票特征"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '股票代码': [f"{i:06d}" for i in range(n)],
+        '股票名称': [f"股票{i}" for i in range(n)],
+        '总股本(亿股)': rng.choice([7.9, 8, 10, 12, 12.01, 15, 15.5], n),
+        '流通市值(亿元)': rng.uniform(50, 250, n),
+        '官方背书': rng.random(n) > 0.5,
+        '增持动向': rng.random(n) > 0.7,
+        '题材类别数': rng.integers(0, 7, n),
+        '平均股息率': rng.choice([0, 0.01, 0.02, 0.025, 0.03, 0.035, 0.05], n)
+    })
+
+
+def test_matches_reference():
+    """测试向量化评分与原逐只评分一致"""
+    print("测试向量化评分一致性...")
+    
+    features = make_features(2000)
+    scored = score_candidates(features, STOCK_SCORE_RULES)
+    expected = features.apply(reference_score, axis=1)
+    
+    assert (scored['总分'] == expected).all()
+    assert scored.loc[features['总股本(亿股)'] == 12, '股本匹配分'].eq(25).all()
+    assert scored.loc[features['总股本(亿股)'] == 12.01, '股本匹配分'].eq(20).all()
+    
+    print("✓ 向量化评分与原逻辑一致")
+
+
+def test_missing_features_score_zero():
+    """测试缺失特征列按0分处理"""
+    features = pd.DataFrame({'总股本(亿股)': [10.0, 20.0], '官方背书': [True, False]})
+    scored = score_candidates(features, STOCK_SCORE_RULES)
+    
+    assert scored['总分'].tolist() == [55, 0]
+
+
+def test_gold_scoring():
+    """测试黄金股票评分与符合条件数"""
+    screener = GoldStockScreener()
+    features = pd.DataFrame([{
+        '股票代码': '600547', '股票名称': '山东黄金', '所属行业': '贵金属',
+        '总股本(亿股)': 10.0, '流通市值(亿元)': 150.0, '当前价格': 30.0,
+        '市值匹配': True, '官方背书': True, '增持动向': False,
+        '题材类别数': 2, '平均股息率': 0.025
+    }])
+    
+    result = screener.score_gold_features(features).iloc[0]
+    
+    # 25(股本) + 5(市值) + 30(官方) + 6(题材) + 5(分红) + 15(黄金行业)
+    assert result['股本匹配分'] == 30
+    assert result['总分'] == 86
+    assert result['符合条件数'] == 6
+
+
+def test_scoring_speed():
+    """测试5000只股票评分耗时"""
+    features = make_features(5000, seed=1)
+    
+    start = time.perf_counter()
+    score_candidates(features, STOCK_SCORE_RULES)
+    elapsed = time.perf_counter() - start
+    
+    print(f"5000只股票评分耗时: {elapsed * 1000:.1f} 毫秒")
+    assert elapsed < 1
+
+
+if __name__ == "__main__":
+    test_matches_reference()
+    test_missing_features_score_zero()
+    test_gold_scoring()
+    test_scoring_speed()
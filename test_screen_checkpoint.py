@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选断点续跑测试脚本
+使用临时目录和模拟任务，无需联网
+"""
+
+import tempfile
+
+import numpy as np
+
+from fetch_executor import FetchExecutor
+from screen_checkpoint import ScreenCheckpoint, StockFetchError
+
+
+def test_resume_skips_finished_stocks():
+    """测试中断后续跑只处理未完成的股票"""
+    print("测试断点续跑...")
+    
+    stocks = [(f"{i:06d}", f"股票{i}") for i in range(10)]
+    fetcher = FetchExecutor(max_workers=4, default_rate=1000)
+    
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        # 第一次运行：第6只股票之后"崩溃"
+        def crashing(code, name):
+            if int(code) >= 6:
+                raise ConnectionError("网络中断")
+            if int(code) % 2:
+                return None  # 未入选
+            return {'股票代码': code, '股票名称': name, '官方背书': np.bool_(True), '总股本(亿股)': np.float64(10)}
+        
+        checkpoint = ScreenCheckpoint('test', checkpoint_dir=checkpoint_dir)
+        checkpoint.map(fetcher, crashing, stocks, resume=False)
+        
+        # 第二次运行：只处理剩余4只
+        calls = []
+        
+        def working(code, name):
+            calls.append(code)
+            return {'股票代码': code, '股票名称': name}
+        
+        checkpoint = ScreenCheckpoint('test', checkpoint_dir=checkpoint_dir)
+        results = checkpoint.map(fetcher, working, stocks, resume=True)
+        
+        assert sorted(calls) == ['000006', '000007', '000008', '000009']
+        assert [r['股票代码'] if r else None for r in results] == [
+            '000000', None, '000002', None, '000004', None, '000006', '000007', '000008', '000009'
+        ]
+        assert results[0]['官方背书'] is True
+        
+        # 非续跑模式从头开始
+        calls.clear()
+        checkpoint.map(fetcher, working, stocks, resume=False)
+        assert len(calls) == 10
+        
+        print("✓ 断点续跑测试通过")
+
+
+def test_truncated_line_ignored():
+    """测试被终止时写了一半的最后一行被忽略"""
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        checkpoint = ScreenCheckpoint('test', date='20260101', checkpoint_dir=checkpoint_dir)
+        checkpoint.reset()
+        checkpoint.append('600547', {'股票代码': '600547'})
+        
+        with open(checkpoint.path, 'a', encoding='utf-8') as f:
+            f.write('{"code": "600489", "resu')
+        
+        assert list(checkpoint.load()) == ['600547']
+        
+        # 续跑时追加的记录另起一行，不与残行一起丢失
+        checkpoint.append('600489', None)
+        assert checkpoint.load() == {'600547': {'股票代码': '600547'}, '600489': None}
+
+
+def test_fetch_failure_not_checkpointed():
+    """测试获取数据失败的股票不写入检查点，续跑时重试；未入选的股票不重试"""
+    stocks = [(f"{i:06d}", f"股票{i}") for i in range(4)]
+    fetcher = FetchExecutor(max_workers=2, default_rate=1000)
+    
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        def flaky(code, name):
+            if code == '000001':
+                raise StockFetchError(f"无法获取 {code} 基本信息")
+            return None if code == '000002' else {'股票代码': code}
+        
+        checkpoint = ScreenCheckpoint('test', checkpoint_dir=checkpoint_dir)
+        results = checkpoint.map(fetcher, flaky, stocks, resume=False)
+        assert [bool(r) for r in results] == [True, False, False, True]
+        assert sorted(checkpoint.load()) == ['000000', '000002', '000003']
+        
+        calls = []
+        
+        def working(code, name):
+            calls.append(code)
+            return {'股票代码': code}
+        
+        results = checkpoint.map(fetcher, working, stocks, resume=True)
+        assert calls == ['000001']
+        assert results[1] == {'股票代码': '000001'}
+
+
+if __name__ == "__main__":
+    test_resume_skips_finished_stocks()
+    test_truncated_line_ignored()
+    test_fetch_failure_not_checkpointed()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+舆情倒排索引测试脚本
+使用临时SQLite文件和模拟舆情，无需联网
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+
+from sentiment_index import SentimentIndex, weibo_posts
+from stock_names import StockNameDictionary
+
+
+STOCK_NAMES = {'山东黄金': '600547', '中金黄金': '600489', '中金公司': '601995'}
+
+POSTS = [
+    {'text': '山东黄金重组落地，明天看涨停', 'source': '微博', 'platform': '微博', 'followers': 2000000},
+    {'text': '600547今天放量，继续关注', 'source': '微博', 'platform': '微博', 'followers': 500},
+    {'text': '中金黄金和山东黄金都在突破', 'source': '全网雷达', 'platform': '小红书+微博', 'followers': 10000},
+    {'text': '大盘今天震荡', 'source': '全网雷达', 'platform': '小红书+微博', 'followers': 10000}
+]
+
+
+def test_incremental_add():
+    """测试增量写入：重复保存的帖子不会重复索引"""
+    print("测试舆情索引增量写入...")
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        db_path = os.path.join(cache_dir, 'sentiment_index.db')
+        
+        index = SentimentIndex(db_path=db_path, stock_names=STOCK_NAMES)
+        assert index.add_posts(POSTS[:2]) == 2
+        
+        # 新实例（模拟下一次保存）只写入新帖子
+        index = SentimentIndex(db_path=db_path, stock_names=STOCK_NAMES)
+        assert index.add_posts(POSTS) == 2
+        assert index.add_posts(POSTS) == 0
+        
+        assert index.count() == 4
+        assert index.count('600547') == 3
+        print(index.summary())
+
+
+def test_lookup():
+    """测试按代码/简称查询以及与关键词求交集"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        index = SentimentIndex(db_path=os.path.join(cache_dir, 'sentiment_index.db'),
+                               stock_names=STOCK_NAMES)
+        index.add_posts(POSTS)
+        
+        by_code = index.lookup('600547')
+        by_name = index.lookup('山东黄金')
+        assert list(by_code['post_id']) == list(by_name['post_id'])
+        assert list(by_code['followers']) == [2000000, 10000, 500]
+        
+        # 高优先级关键词 × 股票
+        hits = index.lookup('600547', keywords='high_priority')
+        assert len(hits) == 2
+        texts = index.get_posts(hits['post_id'])['text'].tolist()
+        assert texts == [POSTS[0]['text'], POSTS[2]['text']]
+        
+        assert index.count('600547', keywords='high_priority', min_followers=1000000) == 1
+        assert index.count('600547', platform='小红书+微博') == 1
+        assert index.count(keywords=['关注']) == 1
+        
+        # 中金黄金不误识别为中金公司，未知简称返回空结果
+        assert index.count('中金黄金') == 1
+        assert index.count('中金公司') == 0
+        assert index.lookup('不存在的股票').empty
+        assert index.count('不存在的股票') == 0
+        
+        # count直接在索引上计数，与lookup的结果条数一致
+        for query in [{}, {'stock': '600547'}, {'keywords': 'high_priority'},
+                      {'stock': '600547', 'keywords': ['重组', '回购'], 'min_followers': 1000}]:
+            assert index.count(**query) == len(index.lookup(**query)), query
+
+
+def test_weibo_posts():
+    """测试微博清洗数据转换为索引帖子"""
+    df_weibo = pd.DataFrame({'博文内容': ['山东黄金回购'], '粉丝数': [150000]})
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        index = SentimentIndex(db_path=os.path.join(cache_dir, 'sentiment_index.db'),
+                               stock_names=STOCK_NAMES)
+        assert index.add_posts(weibo_posts(df_weibo)) == 1
+        
+        hits = index.lookup('600547', keywords='medium_priority')
+        assert hits.iloc[0]['followers'] == 150000
+        assert hits.iloc[0]['platform'] == '微博'
+
+
+def test_ambiguous_names():
+    """测试简称识别与股票简称字典一致：歧义简称需同时出现代码，去掉XD等前缀的简称可识别"""
+    dictionary = StockNameDictionary(
+        [('000876', '新希望'), ('601899', 'XD紫金矿')],
+        ambiguous_names=['新希望']
+    )
+    posts = [
+        {'text': '春天是新的希望，新希望就在眼前，利好不断', 'platform': '微博', 'followers': 100},
+        {'text': '新希望(000876)公告回购', 'platform': '微博', 'followers': 100},
+        {'text': '紫金矿今天涨停', 'platform': '微博', 'followers': 100}
+    ]
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        index = SentimentIndex(db_path=os.path.join(cache_dir, 'sentiment_index.db'),
+                               stock_names=dictionary)
+        index.add_posts(posts)
+        
+        assert index.get_posts(index.lookup('新希望')['post_id'])['text'].tolist() == [posts[1]['text']]
+        assert index.count('000876', keywords='high_priority') == 0
+        assert index.count('紫金矿') == 1
+        assert index.count('601899') == 1
+        
+        # {简称: 代码}参数按配置的歧义简称处理
+        index = SentimentIndex(db_path=os.path.join(cache_dir, 'plain.db'), stock_names={'新希望': '000876'})
+        index.add_posts(posts[:1])
+        assert index.count('000876') == 0
+
+
+if __name__ == "__main__":
+    test_incremental_add()
+    test_lookup()
+    test_weibo_posts()
+    test_ambiguous_names()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+慢变数据磁盘缓存测试脚本
+使用临时SQLite文件和模拟数据，无需联网
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from stock_data_cache import StockDataCache, latest_quarter_end
+
+
+def make_holders(date='2025-09-30'):
+    """构造模拟的股东户数数据"""
+    return pd.DataFrame({'股东名称': ['中央汇金'], '股东户数统计截止日': [date]})
+
+
+def test_cache_hit_across_instances():
+    """测试缓存落盘，新实例（模拟第二天运行）直接命中"""
+    print("测试慢变数据缓存命中...")
+    
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        return make_holders()
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        db_path = os.path.join(cache_dir, 'stock_data.db')
+        datasets = {'stock_zh_a_gdhs': {'period': None}}
+        
+        cache = StockDataCache(db_path=db_path, datasets=datasets)
+        df1 = cache.get_or_fetch('stock_zh_a_gdhs', '600547', fetch)
+        
+        cache = StockDataCache(db_path=db_path, datasets=datasets)
+        df2 = cache.get_or_fetch('stock_zh_a_gdhs', '600547', fetch)
+        
+        assert len(calls) == 1
+        assert df2.equals(df1)
+        assert cache.stats['hit'] == 1
+        print(cache.summary())
+
+
+def test_stale_while_revalidate():
+    """测试过期数据先返回旧值并在后台刷新"""
+    versions = ['2025-06-30', '2025-09-30']
+    
+    def fetch():
+        return make_holders(versions.pop(0))
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = StockDataCache(
+            db_path=os.path.join(cache_dir, 'stock_data.db'),
+            datasets={'stock_zh_a_gdhs': {'ttl': 0.1, 'stale_ttl': 60, 'period': None}}
+        )
+        
+        cache.get_or_fetch('stock_zh_a_gdhs', '600547', fetch)
+        time.sleep(0.2)
+        
+        # 过期：立即返回旧值，后台刷新
+        stale = cache.get_or_fetch('stock_zh_a_gdhs', '600547', fetch)
+        assert stale['股东户数统计截止日'].iloc[0] == '2025-06-30'
+        assert cache.stats['stale'] == 1
+        
+        cache.wait_for_refresh()
+        fresh = cache.get_or_fetch('stock_zh_a_gdhs', '600547', fetch)
+        assert fresh['股东户数统计截止日'].iloc[0] == '2025-09-30'
+        assert cache.stats['hit'] == 1
+
+
+def test_fetch_failure_falls_back_to_cache():
+    """测试下载失败时使用过期缓存，无缓存时抛出异常"""
+    def failing_fetch():
+        raise ConnectionError("网络错误")
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = StockDataCache(
+            db_path=os.path.join(cache_dir, 'stock_data.db'),
+            datasets={'stock_zh_a_dividend': {'ttl': 0, 'stale_ttl': 0, 'period': None}}
+        )
+        
+        cache.get_or_fetch('stock_zh_a_dividend', '600547', lambda: pd.DataFrame({'公告日期': ['2025-04-01']}))
+        df = cache.get_or_fetch('stock_zh_a_dividend', '600547', failing_fetch)
+        assert len(df) == 1
+        
+        try:
+            cache.get_or_fetch('stock_zh_a_dividend', '600489', failing_fetch)
+            assert False, "应抛出异常"
+        except ConnectionError:
+            pass
+
+
+def test_invalidate_by_report_date():
+    """测试按报告期失效"""
+    assert latest_quarter_end(datetime(2025, 11, 5)) == datetime(2025, 9, 30)
+    assert latest_quarter_end(datetime(2026, 2, 1)) == datetime(2025, 12, 31)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = StockDataCache(
+            db_path=os.path.join(cache_dir, 'stock_data.db'),
+            datasets={'stock_zh_a_gdhs': {'period': None}}
+        )
+        
+        cache.get_or_fetch('stock_zh_a_gdhs', '600547', lambda: make_holders('2025-06-30'))
+        cache.get_or_fetch('stock_zh_a_gdhs', '600489', lambda: make_holders('2025-09-30'))
+        
+        removed = cache.invalidate_before('stock_zh_a_gdhs', '2025-09-30')
+        assert removed == 1
+        
+        calls = []
+        cache.get_or_fetch('stock_zh_a_gdhs', '600489', lambda: calls.append(1))
+        cache.get_or_fetch('stock_zh_a_gdhs', '600547', lambda: calls.append(1))
+        assert len(calls) == 1
+
+
+def test_close_cancels_pending_refresh():
+    """测试后台刷新排队上限，close()丢弃排队中的刷新且不阻塞"""
+    started = threading.Event()
+    release = threading.Event()
+    refreshed = []
+    
+    def slow_fetch(code):
+        def fetch():
+            started.set()
+            release.wait(5)
+            refreshed.append(code)
+            return make_holders('2025-09-30')
+        return fetch
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = StockDataCache(
+            db_path=os.path.join(cache_dir, 'stock_data.db'),
+            datasets={'stock_zh_a_gdhs': {'ttl': 0.1, 'stale_ttl': 60, 'period': None}},
+            background_workers=1,
+            max_pending_refresh=2
+        )
+        
+        codes = ['600547', '600489', '601899', '000975']
+        for code in codes:
+            cache.get_or_fetch('stock_zh_a_gdhs', code, lambda: make_holders('2025-06-30'))
+        time.sleep(0.2)
+        
+        # 4只过期股票只排入2个刷新，第1个占住唯一的工作线程
+        for code in codes:
+            cache.get_or_fetch('stock_zh_a_gdhs', code, slow_fetch(code))
+        assert started.wait(5)
+        assert len(cache._refreshing) == 2
+        
+        start = time.perf_counter()
+        cache.close()
+        assert time.perf_counter() - start < 1, "close()不应等待正在执行的刷新"
+        assert not cache._refreshing
+        
+        release.set()
+        time.sleep(0.2)
+        assert refreshed == ['600547'], "排队中的刷新应被取消"
+        
+        # 关闭后再次过期命中时重新创建线程池
+        cache.get_or_fetch('stock_zh_a_gdhs', '600489', lambda: make_holders('2025-12-31'))
+        cache.wait_for_refresh()
+        df = cache.get_or_fetch('stock_zh_a_gdhs', '600489', lambda: make_holders('2026-03-31'))
+        assert df['股东户数统计截止日'].iloc[0] == '2025-12-31'
+
+
+if __name__ == "__main__":
+    test_cache_hit_across_instances()
+    test_stale_while_revalidate()
+    test_fetch_failure_falls_back_to_cache()
+    test_invalidate_by_report_date()
+    test_close_cancels_pending_refresh()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量基本面数据测试脚本
+使用模拟行情快照，无需联网
+"""
+
+import pandas as pd
+
+import stock_fundamentals
+from stock_fundamentals import FundamentalsProvider
+
+
+class MockSnapshot:
+    """模拟行情快照"""
+    
+    def __init__(self):
+        self.df = pd.DataFrame({
+            '代码': ['600547', '600489', '000975'],
+            '名称': ['山东黄金', '中金黄金', '银泰黄金'],
+            '最新价': [30.0, 12.0, None],  # 银泰黄金停牌，无最新价
+            '总市值': [3.0e10, 6.0e10, 4.4e10],
+            '流通市值': [1.5e10, 4.8e10, 4.3e10]
+        })
+    
+    def get_stocks(self, stock_codes):
+        return self.df[self.df['代码'].isin(stock_codes)].copy()
+
+
+def test_fundamentals_from_snapshot():
+    """测试从快照批量推导基本面字段"""
+    print("测试批量基本面数据...")
+    
+    calls = []
+    original = stock_fundamentals.ak.stock_individual_info_em
+    
+    def mock_individual(symbol):
+        calls.append(symbol)
+        return pd.DataFrame({
+            'item': ['股票代码', '股票简称', '最新', '总股本', '流通股'],
+            'value': [symbol, '银泰黄金', 15.8, 2.77e9, 2.7e9]
+        })
+    
+    stock_fundamentals.ak.stock_individual_info_em = mock_individual
+    
+    try:
+        provider = FundamentalsProvider(snapshot=MockSnapshot())
+        
+        df = provider.get_fundamentals(['600547', '600489', '000975'])
+        
+        # 股本由市值/价格推导，单位为股
+        assert df.loc['600547', '总股本'] == 1e9
+        assert df.loc['600489', '流通股'] == 4e9
+        
+        # 只有缺失字段的股票回退到单只查询，且只补空值
+        assert calls == ['000975']
+        assert df.loc['000975', '最新'] == 15.8
+        assert df.loc['000975', '流通市值'] == 4.3e10
+        
+        # 再次查询命中缓存
+        info = provider.get_basic_info('600547')
+        assert calls == ['000975']
+        assert info['股票简称'] == '山东黄金'
+        assert info['最新'] == 30.0
+        
+        print("✓ 批量基本面数据测试通过")
+    finally:
+        stock_fundamentals.ak.stock_individual_info_em = original
+
+
+def test_prefilter():
+    """测试快照预筛（单位: 亿股/亿元），无法判断的股票保留"""
+    provider = FundamentalsProvider(snapshot=MockSnapshot())
+    
+    # 山东黄金: 10亿股/150亿元; 中金黄金: 50亿股/480亿元;
+    # 银泰黄金: 无价格无法推导股本，但流通市值430亿元已不符合; 688001: 快照中没有，保留
+    survivors = provider.prefilter(['000975', '600489', '600547', '688001'])
+    
+    assert survivors == ['600547', '688001']
+    assert provider.fallback_count == 0
+
+
+if __name__ == "__main__":
+    test_fundamentals_from_snapshot()
+    test_prefilter()
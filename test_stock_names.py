@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场股票简称字典测试脚本
+测试简称规范化、最左最长匹配、每日刷新的磁盘缓存，以及情报分析中的股票识别，无需联网
+"""
+
+import tempfile
+import time
+
+from intelligence_analyzer import IntelligenceAnalyzer
+from stock_names import StockNameDictionary, load_stock_name_dictionary, name_variants
+
+
+STOCKS = [
+    ['600547', '山东黄金'], ['600489', '中金黄金'], ['601995', '中金公司'],
+    ['000002', '万  科Ａ'], ['600234', '*ST科新'], ['688256', '寒武纪-U'],
+    ['603259', '药明康德'], ['300015', '爱尔眼科']
+]
+
+
+def test_name_variants():
+    """测试全角/空白规范化和ST、-U等标记的去除"""
+    assert name_variants('万  科Ａ') == ['万科A']
+    assert name_variants('*ST科新') == ['*ST科新', '科新']
+    assert name_variants('寒武纪-U') == ['寒武纪-U', '寒武纪']
+    assert name_variants('山东黄金') == ['山东黄金']
+
+
+def test_longest_match():
+    """测试重叠命中取最长的简称"""
+    dictionary = StockNameDictionary(STOCKS, aliases={'中金': '601995'})
+    
+    assert dictionary.identify('中金黄金放量') == ['中金黄金(600489)']
+    assert dictionary.identify('中金看好黄金，中金黄金和山东黄金跟涨') == \
+        ['中金公司(601995)', '中金黄金(600489)', '山东黄金(600547)']
+    assert dictionary.identify('寒武纪今天大涨，万科A企稳') == ['寒武纪-U(688256)', '万科A(000002)']
+    
+    # 去掉ST后只剩两个字的简称不参与识别，避免误判
+    assert dictionary.identify('科新能源') == []
+    assert dictionary.identify('*ST科新摘帽') == ['*ST科新(600234)']
+    
+    assert dictionary.name_of('600547') == '山东黄金'
+    
+    # 合并手工映射时不覆盖已有的简称
+    merged = dictionary.merged({'山东黄金': '000000', '五粮液': '000858'})
+    assert merged.identify('山东黄金和五粮液') == ['山东黄金(600547)', '五粮液(000858)']
+    assert '五粮液' not in dictionary.names
+
+
+def test_ambiguous_names():
+    """测试与常用词相同的简称只有同时出现代码时才算提及，别名不受限制"""
+    stocks = STOCKS + [['300024', '机器人'], ['000591', '太阳能']]
+    dictionary = StockNameDictionary(stocks, ambiguous_names=['机器人', '太阳能'])
+    
+    assert dictionary.identify('人形机器人板块爆发，山东黄金跟涨') == ['山东黄金(600547)']
+    assert dictionary.identify('机器人(300024)放量') == ['机器人(300024)']
+    assert dictionary.merged({'五粮液': '000858'}).identify('光伏太阳能') == []
+    
+    aliased = StockNameDictionary(stocks, aliases={'机器人': '300024'}, ambiguous_names=['机器人'])
+    assert aliased.identify('机器人涨停') == ['机器人(300024)']
+
+
+def test_daily_cache_refresh():
+    """测试当天只下载一次，跨天刷新，下载失败时使用旧缓存"""
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        return STOCKS
+    
+    def broken_fetch():
+        raise ConnectionError('offline')
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dictionary = load_stock_name_dictionary(cache_dir, fetch, today='2025-01-02')
+        assert len(calls) == 1
+        assert dictionary.identify('药明康德') == ['药明康德(603259)']
+        
+        load_stock_name_dictionary(cache_dir, fetch, today='2025-01-02')
+        assert len(calls) == 1
+        
+        load_stock_name_dictionary(cache_dir, fetch, today='2025-01-03')
+        assert len(calls) == 2
+        
+        stale = load_stock_name_dictionary(cache_dir, broken_fetch, today='2025-01-04')
+        assert stale.identify('爱尔眼科') == ['爱尔眼科(300015)']
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        empty = load_stock_name_dictionary(cache_dir, broken_fetch, today='2025-01-04')
+        assert empty.identify('爱尔眼科') == []
+
+
+def test_intelligence_identifies_full_market():
+    """测试情报分析识别手工映射之外的股票，且每条帖子的耗时不随简称数量增长"""
+    stocks = STOCKS + [[f"{900000 + i}", f"测试股份{i:04d}号"] for i in range(5000)]
+    analyzer = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary(stocks))
+    
+    assert analyzer._identify_stocks('药明康德放量突破，中金黄金跟涨') == ['药明康德(603259)', '中金黄金(600489)']
+    assert analyzer._identify_stocks('贵州茅台创新高') == ['贵州茅台(600519)']
+    
+    # 简称与关键词在同一次扫描中命中
+    text = '药明康德放量突破，中金黄金主力资金净流入'
+    hits = analyzer._get_rule_engine().scan(text)
+    assert {'放量', '突破', '主力'} <= set(hits)
+    assert analyzer._identify_stocks(text, hits) == ['药明康德(603259)', '中金黄金(600489)']
+    
+    small = IntelligenceAnalyzer(stock_dictionary=StockNameDictionary())
+    text = '药明康德放量突破60日均线，主力资金净流入，测试股份0042号跟涨。' * 5
+    
+    timings = []
+    for target in (small, analyzer):
+        target._get_rule_engine()
+        start = time.time()
+        for _ in range(2000):
+            target._identify_stocks(text)
+        timings.append(time.time() - start)
+    
+    print(f"30个简称: {timings[0]:.3f}秒, 5000+个简称: {timings[1]:.3f}秒")
+    assert timings[1] < timings[0] * 3 + 0.5
+
+
+if __name__ == "__main__":
+    test_name_variants()
+    test_longest_match()
+    test_ambiguous_names()
+    test_daily_cache_refresh()
+    test_intelligence_identifies_full_market()
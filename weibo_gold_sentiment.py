@@ -8,12 +8,12 @@
 import pandas as pd
 import random
 import time
-import json
-import requests
 from datetime import datetime
 from playwright.sync_api import sync_playwright
 import re
 
+from deepseek_client import get_deepseek_client
+
 
 class WeiboGoldSentimentAnalyzer:
     """微博黄金情绪分析器"""
@@ -39,6 +39,9 @@ class WeiboGoldSentimentAnalyzer:
             self.api_key = api_key
             self.api_base = "https://api.deepseek.com/v1"
         
+        # 共享连接池的DeepSeek客户端
+        self.deepseek = get_deepseek_client(self.api_key, self.api_base)
+        
         # 营销广告关键词（用于过滤）
         self.spam_keywords = [
             '抽奖', '转运珠', '代购', '微商', '加微信', '扫码',
@@ -355,53 +358,12 @@ class WeiboGoldSentimentAnalyzer:
         返回:
             dict: 分析结果
         """
-        url = f"{self.api_base}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": f"请分析以下微博内容：\n\n{text}"}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 1000
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0]['message']['content']
-                
-                # 尝试解析JSON
-                try:
-                    # 提取JSON部分（可能包含在markdown代码块中）
-                    json_match = re.search(r'\{[\s\S]*\}', content)
-                    if json_match:
-                        json_str = json_match.group()
-                        analysis_result = json.loads(json_str)
-                        return analysis_result
-                    else:
-                        print("  警告: 无法从响应中提取JSON")
-                        return None
-                except json.JSONDecodeError:
-                    print(f"  警告: JSON解析失败")
-                    print(f"  原始响应: {content[:200]}...")
-                    return None
-            
-            return None
-            
-        except Exception as e:
-            print(f"  API调用失败: {e}")
-            return None
+        return self.deepseek.chat_json(
+            self.system_prompt, f"请分析以下微博内容：\n\n{text}",
+            temperature=0.3,
+            max_tokens=1000,
+            timeout=self.deepseek.report_timeout
+        )
     
     def generate_report(self, df, analysis_result):
         """
@@ -9,12 +9,15 @@
 import pandas as pd
 import random
 import time
-import json
-import requests
 from datetime import datetime
 from playwright.sync_api import sync_playwright
 import re
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from sentiment_index import get_sentiment_index, weibo_posts
+from deepseek_client import get_deepseek_client
+from prompt_packer import PromptPacker, load_prompt_budget_config
 
 
 class WeiboSentimentWeightedAnalyzer:
@@ -41,6 +44,19 @@ class WeiboSentimentWeightedAnalyzer:
             self.api_key = api_key
             self.api_base = "https://api.deepseek.com/v1"
         
+        # 共享连接池的DeepSeek客户端
+        self.deepseek = get_deepseek_client(self.api_key, self.api_base)
+        
+        # 按token预算打包待分析的微博
+        budget_config = load_prompt_budget_config()
+        self.prompt_packer = PromptPacker(
+            budget_config['weibo_sentiment_tokens'],
+            separator="\n\n---\n\n",
+            dedup_threshold=budget_config['near_duplicate_threshold'],
+            min_item_tokens=budget_config['min_item_tokens']
+        )
+        self.max_shards = budget_config['weibo_max_shards']
+        
         # 营销广告关键词（用于过滤）
         self.spam_keywords = [
             '抽奖', '转运珠', '代购', '微商', '加微信', '扫码',
@@ -451,22 +467,24 @@ class WeiboSentimentWeightedAnalyzer:
             print("× 没有数据可供分析")
             return None
         
-        # 1. 按影响力权重排序，优先分析高影响力博主的内容
+        # 1. 按影响力权重和互动量排序，优先分析高影响力博主的内容
         print(f"\n准备分析 {len(df)} 条微博...")
         df_sorted = df.sort_values(by=['影响力权重', '点赞数', '转发数'], ascending=False)
         
-        # 取前50条或全部
-        top_posts = df_sorted.head(50)
+        # 按token预算选取（去除近似重复的转发/搬运，标注影响力和关键词）
+        rows = df_sorted.to_dict('records')
         
-        # 合并内容（标注影响力和关键词）
-        combined_text = "\n\n---\n\n".join([
-            f"【微博{i+1}】(粉丝:{row['粉丝数']}, 权重:{row['影响力权重']}, "
-            f"关键词:{'是' if row['关键词加成'] else '否'})\n{row['博文内容']}"
-            for i, (_, row) in enumerate(top_posts.iterrows())
-        ])
+        def format_post(position, index, text):
+            row = rows[index]
+            return (f"【微博{position}】(粉丝:{row['粉丝数']}, 权重:{row['影响力权重']}, "
+                    f"关键词:{'是' if row['关键词加成'] else '否'})\n{text}")
+        
+        packed = self.prompt_packer.pack(df_sorted['博文内容'].astype(str).tolist(), format_post)
+        top_posts = df_sorted.iloc[packed['indices']]
+        combined_text = packed['text']
         
         print(f"选取 {len(top_posts)} 条代表性微博进行分析")
-        print(f"总字数: {len(combined_text)} 字")
+        print(f"  {PromptPacker.describe(packed)}")
         
         # 2. 调用DeepSeek API获取基础情绪分数
         print("\n正在调用DeepSeek API...")
@@ -479,6 +497,188 @@ class WeiboSentimentWeightedAnalyzer:
         print("✓ AI基础分析完成")
         
         # 3. 计算加权情绪分数
+        ai_base_score = ai_result.get('sentiment_index', 50)
+        
+        return self._apply_weighting(ai_result, top_posts, [ai_base_score] * len(top_posts))
+    
+    def analyze_sentiment_map_reduce(self, df, concurrency=4):
+        """
+        使用DeepSeek AI分析情绪（map-reduce版本，适用于大量微博）
+        
+        map: 按影响力排序后把全部微博切分为不超过token预算的分片，并发分析每个分片
+        reduce: 以分片内博主影响力权重之和为权重，合并各分片的情绪指数和风险点/机会点
+        
+        参数:
+            df: 清洗后的数据DataFrame
+            concurrency: 同时分析的分片数
+            
+        返回:
+            dict: AI分析结果（字段与analyze_sentiment_with_ai_weighted一致，另含map_reduce统计）
+        """
+        print("\n" + "=" * 60)
+        print("开始AI情绪分析（map-reduce版）")
+        print("=" * 60)
+        
+        if df.empty:
+            print("× 没有数据可供分析")
+            return None
+        
+        # 1. 按影响力权重和互动量排序后切分
+        print(f"\n准备分析 {len(df)} 条微博...")
+        df_sorted = df.sort_values(by=['影响力权重', '点赞数', '转发数'], ascending=False)
+        rows = df_sorted.to_dict('records')
+        
+        def format_post(position, index, text):
+            row = rows[index]
+            return (f"【微博{position}】(粉丝:{row['粉丝数']}, 权重:{row['影响力权重']}, "
+                    f"关键词:{'是' if row['关键词加成'] else '否'})\n{text}")
+        
+        shards = self.prompt_packer.shard(
+            df_sorted['博文内容'].astype(str).tolist(), format_post, max_shards=self.max_shards
+        )
+        
+        if not shards:
+            print("× 没有可分析的微博")
+            return None
+        
+        duplicates = sum(shard['duplicates'] for shard in shards)
+        skipped = sum(shard['skipped'] for shard in shards)
+        print(f"切分为 {len(shards)} 个分片（近似重复 {duplicates} 条，超出分片上限 {skipped} 条）")
+        
+        # 2. map: 并发分析各分片
+        print(f"\n正在并发调用DeepSeek API（并发数: {concurrency}）...")
+        
+        def analyze_shard(shard_no, shard):
+            try:
+                result = self._call_deepseek_api(shard['text'])
+            except Exception as e:
+                print(f"  × 分片 {shard_no} 分析失败: {e}")
+                return None
+            
+            if not result:
+                print(f"  × 分片 {shard_no} 分析失败")
+                return None
+            
+            print(f"  ✓ 分片 {shard_no}/{len(shards)}: {len(shard['indices'])} 条, "
+                  f"情绪指数 {result.get('sentiment_index', 50)}")
+            return result
+        
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            shard_results = list(executor.map(analyze_shard, range(1, len(shards) + 1), shards))
+        
+        # 3. reduce: 按影响力加权合并
+        weights = df_sorted['影响力权重'].to_numpy(dtype=float)
+        
+        mapped = []
+        for shard, result in zip(shards, shard_results):
+            if result:
+                mapped.append((shard, result, float(weights[shard['indices']].sum())))
+        
+        if not mapped:
+            print("× AI分析失败")
+            return None
+        
+        print(f"✓ AI分片分析完成（成功 {len(mapped)}/{len(shards)}）")
+        
+        ai_result = self._reduce_shard_results(mapped)
+        ai_result['map_reduce'] = {
+            'shards': len(shards),
+            'failed_shards': len(shards) - len(mapped),
+            'posts': sum(len(shard['indices']) for shard, _, _ in mapped),
+            'duplicates': duplicates,
+            'skipped': skipped
+        }
+        
+        # 4. 每条微博使用所在分片的情绪指数计算加权分数
+        positions = []
+        post_scores = []
+        for shard, result, _ in mapped:
+            positions.extend(shard['indices'])
+            post_scores.extend([self._sentiment_value(result)] * len(shard['indices']))
+        
+        return self._apply_weighting(ai_result, df_sorted.iloc[positions], post_scores)
+    
+    def _sentiment_value(self, result):
+        """分片结果中的情绪指数（缺失或非数值时按中性50处理）"""
+        try:
+            return float(result.get('sentiment_index', 50))
+        except (TypeError, ValueError):
+            return 50.0
+    
+    def _reduce_shard_results(self, mapped):
+        """
+        按影响力权重合并各分片的分析结果
+        
+        参数:
+            mapped: [(分片, AI结果, 分片影响力权重之和), ...]
+            
+        返回:
+            dict: 合并后的AI结果
+        """
+        total_weight = sum(weight for _, _, weight in mapped) or len(mapped)
+        sentiment_index = sum(
+            self._sentiment_value(result) * (weight or 1) for _, result, weight in mapped
+        ) / total_weight
+        sentiment_index = round(sentiment_index, 1)
+        
+        # 风险点/机会点：同一观点在多个分片出现时累加权重，取前3
+        def top_points(field):
+            scores = {}
+            labels = {}
+            for _, result, weight in mapped:
+                for point in result.get(field) or []:
+                    point = str(point).strip()
+                    if not point or '未提及' in point:
+                        continue
+                    key = re.sub(r'[\W_]+', '', point)
+                    scores[key] = scores.get(key, 0) + (weight or 1)
+                    labels.setdefault(key, point)
+            ranked = sorted(scores, key=lambda key: -scores[key])
+            return [labels[key] for key in ranked[:3]] or ['未提及']
+        
+        # 一句话总结取影响力最大的分片
+        heaviest = max(mapped, key=lambda item: item[2])[1]
+        
+        notes = []
+        for _, result, _ in mapped:
+            note = str(result.get('data_quality_note') or '').strip()
+            if note and note not in notes:
+                notes.append(note)
+        
+        return {
+            'sentiment_index': sentiment_index,
+            'sentiment_label': self._sentiment_label(sentiment_index),
+            'risk_points': top_points('risk_points'),
+            'opportunity_points': top_points('opportunity_points'),
+            'summary': heaviest.get('summary', ''),
+            'data_quality_note': '；'.join(notes)
+        }
+    
+    def _sentiment_label(self, sentiment_index):
+        """情绪指数对应的标签（与系统提示词中的分档一致）"""
+        if sentiment_index <= 20:
+            return '极度悲观'
+        elif sentiment_index <= 40:
+            return '悲观'
+        elif sentiment_index <= 60:
+            return '中性'
+        elif sentiment_index <= 80:
+            return '乐观'
+        else:
+            return '极度乐观'
+    
+    def _apply_weighting(self, ai_result, posts, ai_scores):
+        """
+        计算每条微博的加权分数并整合到AI结果中
+        
+        参数:
+            ai_result: AI分析结果
+            posts: 参与分析的微博DataFrame
+            ai_scores: 每条微博对应的AI基础分数
+            
+        返回:
+            dict: 加入ai_base_score、weighted_sentiment_index、score_details的AI结果
+        """
         print("\n正在计算加权情绪分数...")
         
         ai_base_score = ai_result.get('sentiment_index', 50)
@@ -486,9 +686,9 @@ class WeiboSentimentWeightedAnalyzer:
         # 计算每条微博的加权分数
         weighted_scores = []
         
-        for _, row in top_posts.iterrows():
+        for ai_score, (_, row) in zip(ai_scores, posts.iterrows()):
             score_detail = self.calculate_weighted_sentiment(
-                ai_score=ai_base_score,
+                ai_score=ai_score,
                 has_boost=row['关键词加成'],
                 influence_weight=row['影响力权重']
             )
@@ -497,7 +697,7 @@ class WeiboSentimentWeightedAnalyzer:
         # 计算平均加权分数
         avg_weighted_score = np.mean(weighted_scores)
         
-        # 4. 整合结果
+        # 整合结果
         ai_result['ai_base_score'] = ai_base_score
         ai_result['weighted_sentiment_index'] = round(avg_weighted_score, 2)
         ai_result['score_details'] = {
@@ -523,50 +723,12 @@ class WeiboSentimentWeightedAnalyzer:
         返回:
             dict: 分析结果
         """
-        url = f"{self.api_base}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": f"请分析以下微博内容：\n\n{text}"}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 1000
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0]['message']['content']
-                
-                try:
-                    json_match = re.search(r'\{[\s\S]*\}', content)
-                    if json_match:
-                        json_str = json_match.group()
-                        analysis_result = json.loads(json_str)
-                        return analysis_result
-                    else:
-                        print("  警告: 无法从响应中提取JSON")
-                        return None
-                except json.JSONDecodeError:
-                    print(f"  警告: JSON解析失败")
-                    return None
-            
-            return None
-            
-        except Exception as e:
-            print(f"  API调用失败: {e}")
-            return None
+        return self.deepseek.chat_json(
+            self.system_prompt, f"请分析以下微博内容：\n\n{text}",
+            temperature=0.3,
+            max_tokens=1000,
+            timeout=self.deepseek.report_timeout
+        )
 
     
     def generate_report(self, df, analysis_result):
@@ -655,6 +817,13 @@ class WeiboSentimentWeightedAnalyzer:
             report_lines.append(f"- 标准差: {score_details.get('std_score', 0)}")
             report_lines.append("")
             
+            # 分片统计（map-reduce模式）
+            map_reduce = analysis_result.get('map_reduce')
+            if map_reduce:
+                report_lines.append(f"**分片分析**: {map_reduce['shards']} 个分片，覆盖 {map_reduce['posts']} 条微博"
+                                    f"（失败分片 {map_reduce['failed_shards']} 个，近似重复 {map_reduce['duplicates']} 条）")
+                report_lines.append("")
+            
             # 情绪条形图
             bar_length = int(weighted_score / 5)
             bar = "🟩" * bar_length + "⬜" * (20 - bar_length)
@@ -777,13 +946,14 @@ class WeiboSentimentWeightedAnalyzer:
         
         return filename
     
-    def run(self, pages=3, headless=False):
+    def run(self, pages=3, headless=False, map_reduce=True):
         """
         运行完整的分析流程（加权优化版）
         
         参数:
             pages: 抓取页数
             headless: 是否无头模式
+            map_reduce: 是否分片并发分析全部微博（False时只分析预算内的代表性微博）
         """
         print("=" * 60)
         print("微博黄金情绪自动分析系统（加权优化版）")
@@ -814,8 +984,18 @@ class WeiboSentimentWeightedAnalyzer:
         df_clean.to_csv(clean_filename, index=False, encoding='utf-8-sig')
         print(f"清洗数据已保存: {clean_filename}")
         
+        # 增量写入舆情索引
+        try:
+            added = get_sentiment_index().add_posts(weibo_posts(df_clean))
+            print(f"舆情索引新增 {added} 条")
+        except Exception as e:
+            print(f"⚠️  写入舆情索引失败: {e}")
+        
         # 3. AI加权分析
-        analysis_result = self.analyze_sentiment_with_ai_weighted(df_clean)
+        if map_reduce:
+            analysis_result = self.analyze_sentiment_map_reduce(df_clean)
+        else:
+            analysis_result = self.analyze_sentiment_with_ai_weighted(df_clean)
         
         # 4. 生成报告
         report_file = self.generate_report(df_clean, analysis_result)